@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+استعلامات التوفر والسعة على بيانات الحجوزات (للقراءة فقط).
+
+تُبنى فهرسة مسبقة: لكل تاريخ قناع بتات للفتحات المحجوزة (نفس slot_allocator.py)،
+وتُحفظ بجانب مخزن الحجوزات (<store>.index.json) مع بصمة ملفات المخزن، فلا يُعاد
+بناؤها إلا إذا تغيرت الحجوزات. الاستعلامات نفسها تعمل على الفهرس في ميلي ثوانٍ:
+
+- free     : عدد الفتحات الحرة لكل يوم عمل في نطاق تواريخ.
+- earliest : أقرب تاريخ بداية تكون فيه ساعة معينة حرة في كل أيام العمل الـ30 التالية
+             (بدون --hour: الجواب لكل ساعة).
+- heatmap  : نسبة الإشغال حسب يوم الأسبوع × الساعة في نطاق تواريخ.
+
+المخرجات JSON على stdout.
+
+الاستخدام:
+    python scripts/availability.py free --from 2025-10-01 --to 2025-10-31
+    python scripts/availability.py earliest --hour 09-10 --from 2025-10-01
+    python scripts/availability.py earliest --from 2025-10-01 --lessons 30
+    python scripts/availability.py heatmap --from 2025-09-01 --to 2025-12-31
+    python scripts/availability.py --reservations schedule_reservations.db free --from 2025-10-01 --to 2025-10-07
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from reservation_store import CLIENT_MEMORY_KEY, atomic_write_bytes, open_reservation_store, safe_print
+from slot_allocator import SlotAllocator
+from working_calendar import configure_holidays, get_calendar, parse_date as calendar_parse_date
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%m/%d/%Y', '%Y/%m/%d')
+INDEX_VERSION = 1
+
+# Working days scanned when looking for the earliest start
+EARLIEST_HORIZON_DAYS = 730
+
+
+def parse_date(value: str) -> Optional[date]:
+    return calendar_parse_date(value, DATE_FORMATS)
+
+
+class AvailabilityIndex:
+    """Occupancy bitmask per date (ordinal -> mask) over the working-hours slots."""
+
+    def __init__(self, masks: Dict[int, int], allocator: SlotAllocator = None):
+        self.allocator = allocator or SlotAllocator()
+        self.masks = masks
+        self.n_slots = len(self.allocator.labels)
+
+    @classmethod
+    def from_reservations(cls, reservations: Dict[str, Any], allocator: SlotAllocator = None) -> 'AvailabilityIndex':
+        allocator = allocator or SlotAllocator()
+        masks: Dict[int, int] = {}
+        for key, slots in reservations.items():
+            if key == CLIENT_MEMORY_KEY or not isinstance(slots, list):
+                continue
+            day = parse_date(key)
+            if day is not None:
+                masks[day.toordinal()] = masks.get(day.toordinal(), 0) | allocator.mask_of(slots)
+        return cls(masks, allocator)
+
+    def mask(self, day: date) -> int:
+        return self.masks.get(day.toordinal(), 0)
+
+    def is_free(self, day: date, bit: int) -> bool:
+        return not (self.mask(day) >> bit) & 1
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+
+    def free_slots(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """Free-slot count (and free labels) for every working day in [start, end]."""
+        days = []
+        for day in get_calendar().working_days_between(start, end):
+            mask = self.mask(day)
+            free = [self.allocator.label(b) for b in range(self.n_slots) if not (mask >> b) & 1]
+            days.append({
+                'date': day.strftime('%d/%m/%Y'),
+                'weekday': WEEKDAY_NAMES[day.weekday()],
+                'free': len(free),
+                'free_slots': free,
+            })
+        return days
+
+    def earliest_start(self, bit: int, start: date, lessons: int = 30,
+                       horizon_days: int = EARLIEST_HORIZON_DAYS) -> Optional[date]:
+        """First working day >= start from which `bit` is free on the next `lessons` working days."""
+        run_start = None
+        run = 0
+        last = start + timedelta(days=horizon_days)
+        for day in get_calendar().iter_working_days(start):
+            if day > last:
+                break
+            if self.is_free(day, bit):
+                if run == 0:
+                    run_start = day
+                run += 1
+                if run >= lessons:
+                    return run_start
+            else:
+                run = 0
+        return None
+
+    def heatmap(self, start: date, end: date) -> Dict[str, Any]:
+        """Booked slots per weekday x hour over the working days in [start, end], with the share booked."""
+        counts = [[0] * self.n_slots for _ in range(7)]
+        days_per_weekday = [0] * 7
+        for day in get_calendar().working_days_between(start, end):
+            weekday = day.weekday()
+            days_per_weekday[weekday] += 1
+            mask = self.mask(day)
+            row = counts[weekday]
+            for b in range(self.n_slots):
+                if (mask >> b) & 1:
+                    row[b] += 1
+
+        rows = []
+        for weekday in range(7):
+            n = days_per_weekday[weekday]
+            if not n:
+                continue
+            rows.append({
+                'weekday': WEEKDAY_NAMES[weekday],
+                'days': n,
+                'booked': counts[weekday],
+                'occupancy': [round(c / n, 3) for c in counts[weekday]],
+            })
+        return {'hours': list(self.allocator.labels), 'rows': rows}
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+
+    def to_json(self, signature) -> bytes:
+        return json.dumps({'version': INDEX_VERSION, 'signature': signature,
+                           'masks': {str(k): v for k, v in self.masks.items()}}).encode('utf-8')
+
+
+def store_signature(store_path: Path) -> List[Any]:
+    """Stat of the store file and its sidecars (journal / WAL): changes whenever reservations change."""
+    signature = []
+    for suffix in ('', '.journal', '-wal'):
+        path = Path(str(store_path) + suffix)
+        try:
+            st = path.stat()
+            signature.append([suffix, st.st_mtime_ns, st.st_size])
+        except FileNotFoundError:
+            signature.append([suffix, None, None])
+    return signature
+
+
+def index_path_for(store_path: Path) -> Path:
+    return Path(str(store_path) + '.index.json')
+
+
+def load_index(store_path=None, rebuild: bool = False) -> AvailabilityIndex:
+    """Availability index for a reservation store, rebuilt only when the store changed."""
+    store_path = Path(store_path or os.environ.get('HYPERDRIVE_RESERVATIONS') or 'schedule_reservations.json')
+    index_path = index_path_for(store_path)
+    signature = store_signature(store_path)
+
+    if not rebuild and index_path.exists():
+        try:
+            cached = json.loads(index_path.read_bytes())
+            if cached.get('version') == INDEX_VERSION and cached.get('signature') == signature:
+                return AvailabilityIndex({int(k): v for k, v in cached['masks'].items()})
+        except (ValueError, KeyError):
+            pass
+
+    index = AvailabilityIndex.from_reservations(open_reservation_store(store_path).load_all())
+    try:
+        atomic_write_bytes(index_path, index.to_json(signature))
+    except OSError as e:
+        safe_print(f"[WARN] Could not write availability index: {e}", file=sys.stderr)
+    return index
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Read-only availability queries over the reservations.')
+    p.add_argument('--reservations', help='مخزن الحجوزات (JSON أو .db). افتراضي schedule_reservations.json.')
+    p.add_argument('--rebuild', action='store_true', help='إعادة بناء الفهرس حتى لو لم تتغير الحجوزات.')
+    p.add_argument('--holidays', help='ملف JSON للعطل الرسمية (أيام غير متاحة). افتراضي holidays.json إن وجد.')
+    sub = p.add_subparsers(dest='command', required=True)
+
+    free = sub.add_parser('free', help='عدد الفتحات الحرة لكل يوم عمل في نطاق تواريخ.')
+    free.add_argument('--from', dest='start', required=True, help='من تاريخ (YYYY-MM-DD أو DD/MM/YYYY).')
+    free.add_argument('--to', dest='end', required=True, help='إلى تاريخ (ضمنه).')
+
+    earliest = sub.add_parser('earliest', help='أقرب تاريخ بداية تكون فيه الساعة حرة في كل الحصص.')
+    earliest.add_argument('--hour', help='الساعة بصيغة XX-XX (مثل 09-10). بدونها: لكل الساعات.')
+    earliest.add_argument('--from', dest='start', default=None, help='لا قبل هذا التاريخ (افتراضي اليوم).')
+    earliest.add_argument('--lessons', type=int, default=30, help='عدد أيام العمل المطلوبة (افتراضي 30).')
+
+    heatmap = sub.add_parser('heatmap', help='نسبة الإشغال حسب يوم الأسبوع × الساعة.')
+    heatmap.add_argument('--from', dest='start', required=True)
+    heatmap.add_argument('--to', dest='end', required=True)
+    return p.parse_args(argv)
+
+
+def require_date(value: str, name: str) -> date:
+    day = parse_date(value)
+    if day is None:
+        print(f"[ERROR] Invalid {name} date: {value}", file=sys.stderr)
+        sys.exit(2)
+    return day
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        configure_holidays(args.holidays)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Cannot load the holidays file: {e}", file=sys.stderr)
+        sys.exit(1)
+    t = time.perf_counter()
+    index = load_index(args.reservations, rebuild=args.rebuild)
+    index_ms = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    if args.command == 'free':
+        result: Dict[str, Any] = {'days': index.free_slots(require_date(args.start, '--from'), require_date(args.end, '--to'))}
+    elif args.command == 'earliest':
+        start = require_date(args.start, '--from') if args.start else date.today()
+        if args.hour:
+            if args.hour not in index.allocator.bits:
+                print(f"[ERROR] Unknown hour {args.hour}; expected one of {', '.join(index.allocator.labels)}", file=sys.stderr)
+                sys.exit(2)
+            hours = [args.hour]
+        else:
+            hours = list(index.allocator.labels)
+        earliest = {}
+        for label in hours:
+            day = index.earliest_start(index.allocator.bits[label], start, args.lessons)
+            earliest[label] = day.strftime('%d/%m/%Y') if day else None
+        result = {'from': start.strftime('%d/%m/%Y'), 'lessons': args.lessons, 'earliest': earliest}
+    else:
+        result = index.heatmap(require_date(args.start, '--from'), require_date(args.end, '--to'))
+
+    result['timings'] = {'index_ms': round(index_ms, 2), 'query_ms': round((time.perf_counter() - t) * 1000, 2)}
+    print(json.dumps(result, ensure_ascii=False))
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+قياس أداء استبدال المتغيرات: الطريقة القديمة (ثلاث مرات مرور) مقابل placeholder_engine.py.
+
+يحمّل قالب بطاقة المتابعة مرة واحدة، ويحضّر N نسخة منه لكل طريقة، ثم يقيس زمن
+الاستبدال وحده. يتحقق من أن نص كل فقرة بعد الاستبدال متطابق بين الطريقتين، ويفشل
+إذا كان التسريع أقل من --min-speedup (افتراضي 5).
+
+الاستخدام:
+    python scripts/bench_placeholders.py --runs 200
+    python scripts/bench_placeholders.py --template "resources/templates/بطاقة خاصة بدروس قانون المرور .docx"
+"""
+from __future__ import annotations
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from placeholder_engine import W_P, W_T, expand_aliases, replace_placeholders  # noqa: E402
+from template_cache import get_document  # noqa: E402
+
+DEFAULT_TEMPLATE = Path(__file__).resolve().parent.parent / 'resources' / 'templates' / 'بطاقة المتابعة للمترشح.docx'
+
+SAMPLE_DATA = {
+    'category': 'B',
+    'fullName': 'محمد بن علي',
+    'birthDate': '01/01/1990',
+    'birthPlace': 'الجزائر',
+    'address': 'حي 100 مسكن',
+    'phoneNumber': '0555000000',
+    'schoolSubmissionDate': '20/09/2025',
+    'registrationDate': '2025/09/20',
+    'vers': 'ver',
+}
+
+
+def _replace_text(text: str, data: Dict[str, str]) -> str:
+    for key in re.findall(r'{{(\w+)\}?\}?', text):
+        if key in data:
+            value = data[key]
+            for pattern in ('{{' + key + '}}', '{{' + key + '}', '{{' + key + '}}}'):
+                if pattern in text:
+                    text = text.replace(pattern, value)
+                    break
+            else:
+                text = re.sub('{{' + key + r'\}?\}?', value, text)
+    return text
+
+
+def legacy_replace(doc, data: Dict[str, str]):
+    """The three-pass replacement as it was before placeholder_engine.py (reference)."""
+    data = expand_aliases(data)
+    for para in doc.paragraphs:
+        if '{{' in para.text:
+            new_text = _replace_text(para.text, data)
+            if new_text != para.text:
+                para.clear()
+                para.add_run(new_text)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for para in cell.paragraphs:
+                    if '{{' in para.text:
+                        new_text = _replace_text(para.text, data)
+                        if new_text != para.text:
+                            para.clear()
+                            para.add_run(new_text)
+    for elem in doc._element.iter():
+        if hasattr(elem, 'text') and elem.text and '{{' in elem.text:
+            try:
+                new_text = _replace_text(elem.text, data)
+                if new_text != elem.text:
+                    elem.text = new_text
+            except Exception:
+                pass
+
+
+def paragraph_texts(doc) -> List[str]:
+    return [''.join(t.text or '' for t in p.iter(W_T)) for p in doc.element.iter(W_P)]
+
+
+def timed(fn, docs) -> float:
+    t = time.perf_counter()
+    for doc in docs:
+        fn(doc)
+    return (time.perf_counter() - t) * 1000 / len(docs)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Legacy vs single-pass placeholder replacement.')
+    p.add_argument('--template', default=str(DEFAULT_TEMPLATE))
+    p.add_argument('--runs', type=int, default=200, help='عدد المستندات لكل طريقة.')
+    p.add_argument('--min-speedup', type=float, default=5.0)
+    args = p.parse_args(argv)
+
+    legacy_docs = [get_document(args.template) for _ in range(args.runs)]
+    engine_docs = [get_document(args.template) for _ in range(args.runs)]
+
+    legacy_ms = timed(lambda doc: legacy_replace(doc, SAMPLE_DATA), legacy_docs)
+    engine_ms = timed(lambda doc: replace_placeholders(doc.element, SAMPLE_DATA), engine_docs)
+
+    result = {
+        'template': Path(args.template).name,
+        'runs': args.runs,
+        'legacy_ms_per_doc': round(legacy_ms, 3),
+        'engine_ms_per_doc': round(engine_ms, 3),
+        'speedup': round(legacy_ms / engine_ms, 1) if engine_ms else None,
+        'same_text': paragraph_texts(legacy_docs[0]) == paragraph_texts(engine_docs[0]),
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if not result['same_text']:
+        print('[ERROR] The engine produced different text from the legacy replacement', file=sys.stderr)
+        sys.exit(1)
+    if result['speedup'] is not None and result['speedup'] < args.min_speedup:
+        print(f"[ERROR] Speedup {result['speedup']}x is below {args.min_speedup}x", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+قياس أداء التوليد مرحلة بمرحلة للسكربتات الثلاثة (بطاقة المتابعة، بطاقة قانون المرور، ملف الإيداع).
+
+يولّد سجلات عملاء وهمية بنفس شكل test_client_debug.json، ثم يولّد لكل سكربت 1 و 50 و 1000
+مستند (--docs) ويقيس كل مرحلة على حدة:
+
+- template_load: قراءة القالب (نسخة من template_cache، أو الأثر المُترجم compiled)؛
+- reservations: تواريخ الحصص وتخصيص الساعات في ملف حجوزات مؤقت (بطاقة المتابعة)؛
+- dates: تواريخ الحصص (بطاقة قانون المرور)؛ context: سياق المرشحين (ملف الإيداع)؛
+- placeholders: استبدال الحقول (docxtpl render لملف الإيداع)؛
+- table_fill: تعبئة جداول الحصص؛
+- fill: الحقول والجداول معاً من القالب المُترجم (مسار compiled)؛
+- save: كتابة DOCX (docx_writer.save_docx)؛
+- pdf: التحويل إلى PDF إن توفر محرك (أول --pdf-docs مستندات فقط في كل قياس).
+
+البطاقتان تُقاسان بمسارين: docx (python-docx) و compiled (compiled_template.py). كل قياس
+يبدأ بنسخة جديدة من القالب وملف حجوزات فارغ، فأول مستند يدفع ثمن التحميل البارد كما في
+الاستخدام الحقيقي.
+
+النتيجة JSON (--output). مع --baseline يُقارن وسيط (p50) كل مرحلة بنتيجة سابقة، ويفشل
+السكربت (رمز 1) إذا تباطأت مرحلة بأكثر من --threshold (نسبياً) و --min-delta-ms (مطلقاً).
+
+الاستخدام:
+    python scripts/bench_render.py --output bench_render.json
+    python scripts/bench_render.py --docs 1 50 --generators follow_up traffic
+    python scripts/bench_render.py --docs 50 --baseline bench_render.json --threshold 0.25
+    python scripts/bench_render.py --docs 50 --records-out clients.jsonl   # السجلات لـ --batch
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fill_candidate_follow_up_card as follow_up  # noqa: E402
+import fill_traffic_law_lessons_card as traffic  # noqa: E402
+import generate_deposit_docx as deposit  # noqa: E402
+from docx_writer import save_docx  # noqa: E402
+from pdf_backend import PDF_BACKENDS, get_backend  # noqa: E402
+from placeholder_engine import expand_aliases  # noqa: E402
+from template_cache import get_docx_template, get_document  # noqa: E402
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / 'resources' / 'templates'
+TEMPLATES = {
+    'follow_up': TEMPLATES_DIR / 'بطاقة المتابعة للمترشح.docx',
+    'traffic': TEMPLATES_DIR / 'بطاقة خاصة بدروس قانون المرور .docx',
+    'deposit': TEMPLATES_DIR / 'ملف الإيداع.docx',
+}
+# Pipelines measured per generator (the deposit file has no compiled template)
+PIPELINES = {'follow_up': ('docx', 'compiled'), 'traffic': ('docx', 'compiled'), 'deposit': ('docx',)}
+
+FIRST_NAMES = ('محمد', 'أحمد', 'يوسف', 'عبد الرحمن', 'فاطمة', 'أمينة', 'ليلى', 'سارة', 'خالد', 'مريم')
+LAST_NAMES = ('بن صالح', 'مرابط', 'قريشي', 'بوزيد', 'حمدي', 'عمراني', 'بلقاسم', 'زروقي', 'سعيدي', 'شريف')
+PLACES = (('المسيلة', 'المسيلة'), ('بوسعادة', 'المسيلة'), ('الجزائر', 'الجزائر'), ('سطيف', 'سطيف'))
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+
+def synthetic_client(i: int, rng: random.Random) -> Dict[str, Any]:
+    """A raw client record shaped like test_client_debug.json, plus client_id and start_date."""
+    birth = date(1970, 1, 1) + timedelta(days=rng.randrange(365 * 35))
+    municipality, state = rng.choice(PLACES)
+    return {
+        'client_id': f'bench_{i}',
+        'start_date': (date(2025, 10, 1) + timedelta(days=rng.randrange(120))).isoformat(),
+        'first_name_ar': rng.choice(FIRST_NAMES),
+        'last_name_ar': rng.choice(LAST_NAMES),
+        'birth_date': birth.strftime('%Y/%m/%d'),
+        'birth_municipality': municipality,
+        'birth_state': state,
+        'current_address': f'حي {rng.randrange(1, 500)} مسكن',
+        'current_municipality': municipality,
+        'current_state': state,
+        'phone_number': f'0{rng.choice("567")}{rng.randrange(10 ** 7, 10 ** 8)}',
+        'register_date': (date(2025, 1, 1) + timedelta(days=rng.randrange(270))).strftime('%Y/%m/%d'),
+        'subPrice': rng.choice((6000, 6500, 7000)),
+        'tests': {'trafficLawTest': {'passed': rng.random() < 0.8}},
+    }
+
+
+def synthetic_clients(count: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [synthetic_client(i, rng) for i in range(count)]
+
+
+# -----------------------------
+# Stage timing
+# -----------------------------
+
+class StageTimes:
+    """Per-stage lists of per-document milliseconds."""
+
+    def __init__(self):
+        self.ms: Dict[str, List[float]] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ms.setdefault(name, []).append((time.perf_counter() - t) * 1000)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, values in self.ms.items():
+            ordered = sorted(values)
+            result[name] = {
+                'count': len(values),
+                'mean_ms': round(statistics.fmean(values), 3),
+                'p50_ms': round(ordered[len(ordered) // 2], 3),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                'max_ms': round(ordered[-1], 3),
+                'total_ms': round(sum(values), 3),
+            }
+        return result
+
+
+# -----------------------------
+# One document per generator (each stage timed separately)
+# -----------------------------
+
+def render_follow_up(ctx: Dict[str, Any], client: Dict[str, Any], out: Path, times: StageTimes):
+    data, passed = follow_up.client_record_to_placeholders(client)
+    with times.stage('reservations'):
+        plan = follow_up.plan_candidate_tables(client['start_date'], 30, 30, '%d/%m/%Y',
+                                               client['client_id'], passed)
+    if ctx['pipeline'] == 'compiled':
+        with times.stage('template_load'):
+            compiled = follow_up.load_compiled_card(ctx['template'])
+        with times.stage('fill'):
+            doc = compiled.render_document(expand_aliases(data, follow_up.PLACEHOLDER_MAPPING),
+                                           follow_up.compiled_cells(plan, passed))
+        if doc is None:
+            raise RuntimeError('The compiled template could not render a synthetic card')
+    else:
+        with times.stage('template_load'):
+            doc = get_document(ctx['template'])
+        with times.stage('placeholders'):
+            follow_up.replace_paragraph_placeholders(doc, data)
+        with times.stage('table_fill'):
+            follow_up.apply_candidate_tables(doc, plan, 30, 30, passed)
+    with times.stage('save'):
+        save_docx(doc, str(out), ctx['template'])
+
+
+def render_traffic(ctx: Dict[str, Any], client: Dict[str, Any], out: Path, times: StageTimes):
+    args = ctx['args']
+    data = {
+        'fullName': f"{client['first_name_ar']} {client['last_name_ar']}",
+        'birthDate': client['birth_date'],
+        'birthPlace': f"{client['birth_municipality']} {client['birth_state']}",
+        'address': f"{client['current_address']} {client['current_municipality']}",
+        'registrationDate': client['register_date'],
+    }
+    with times.stage('dates'):
+        dates = traffic.generate_dates(client['start_date'], args.sessions, args.date_format)
+    if ctx['pipeline'] == 'compiled':
+        with times.stage('template_load'):
+            compiled = traffic.load_compiled(ctx['template'], traffic.COMPILED_KIND,
+                                             traffic.compiled_layout(args), traffic.COMPILED_SOURCES)
+        with times.stage('fill'):
+            start_index = 1 if args.has_header else 0
+            doc = compiled.render_document(expand_aliases(data), {
+                str(start_index + i): traffic.clean_text(d) for i, d in enumerate(dates)})
+        if doc is None:
+            raise RuntimeError('The compiled template could not render a synthetic card')
+    else:
+        with times.stage('template_load'):
+            doc = get_document(ctx['template'])
+        with times.stage('placeholders'):
+            traffic.replace_paragraph_placeholders(doc, data)
+        with times.stage('table_fill'):
+            traffic.fill_table_dates(doc, dates, args.has_header, args.table_index, args.date_column)
+    with times.stage('save'):
+        save_docx(doc, str(out), ctx['template'])
+
+
+def render_deposit(ctx: Dict[str, Any], clients: List[Dict[str, Any]], out: Path, times: StageTimes):
+    candidates = [{'fullName': f"{c['first_name_ar']} {c['last_name_ar']}"} for c in clients]
+    with times.stage('context'):
+        context = deposit.build_context(candidates, deposit.DEFAULT_WIDTH, 'block')
+    with times.stage('template_load'):
+        doc = get_docx_template(ctx['template'])
+    with times.stage('placeholders'):
+        doc.render(context)
+    with times.stage('save'):
+        doc.pre_processing()
+        save_docx(doc.docx, str(out), ctx['template'])
+        doc.post_processing(str(out))
+
+
+# -----------------------------
+# Runs
+# -----------------------------
+
+def prepare(generator: str, pipeline: str, template: Path, workdir: Path) -> Dict[str, Any]:
+    """Fresh copy of the template (cold caches) and reservations file for one measured run."""
+    copy = workdir / f'{generator}_{pipeline}{template.suffix}'
+    shutil.copyfile(template, copy)
+    ctx: Dict[str, Any] = {'pipeline': pipeline, 'template': copy}
+    if generator == 'follow_up':
+        follow_up._reservations_path = workdir / f'{generator}_{pipeline}_reservations.json'
+        if pipeline == 'compiled':
+            follow_up.compile_card_template(copy)
+    elif generator == 'traffic':
+        ctx['args'] = traffic.parse_args(['--input', str(copy), '--start-date', '2025-10-01', '--docx-only'])
+        if pipeline == 'compiled':
+            traffic.compile_card_template(ctx['args'])
+    return ctx
+
+
+def run(generator: str, pipeline: str, docs: int, clients: List[Dict[str, Any]], args,
+        backend, workdir: Path) -> Dict[str, Any]:
+    run_dir = workdir / f'{generator}_{pipeline}_{docs}'
+    run_dir.mkdir()
+    ctx = prepare(generator, pipeline, Path(args.templates[generator]), run_dir)
+    times = StageTimes()
+    started = time.perf_counter()
+    for i in range(docs):
+        out = run_dir / f'doc_{i}.docx'
+        t = time.perf_counter()
+        if generator == 'follow_up':
+            render_follow_up(ctx, clients[i], out, times)
+        elif generator == 'traffic':
+            render_traffic(ctx, clients[i], out, times)
+        else:
+            # Deposit files list --candidates clients each, taken round-robin from the records
+            batch = [clients[(i * args.candidates + k) % len(clients)] for k in range(args.candidates)]
+            render_deposit(ctx, batch, out, times)
+        if backend is not None and i < args.pdf_docs:
+            with times.stage('pdf'):
+                backend.convert(out, out.with_suffix('.pdf'), timeout=args.pdf_timeout)
+        times.ms.setdefault('document', []).append((time.perf_counter() - t) * 1000)
+        out.unlink()
+        out.with_suffix('.pdf').unlink(missing_ok=True)
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return {
+        'generator': generator,
+        'pipeline': pipeline,
+        'docs': docs,
+        'total_ms': round(elapsed * 1000, 1),
+        'docs_per_s': round(docs / elapsed, 1) if elapsed else None,
+        'stages': times.summary(),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float,
+            min_delta_ms: float) -> List[Dict[str, Any]]:
+    """Stages whose median per document got slower than the baseline beyond both limits
+    (the median: one slow document, e.g. a GC pause, must not fail the run)."""
+    previous = {(r['generator'], r['pipeline'], r['docs']): r['stages'] for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        stages = previous.get((result['generator'], result['pipeline'], result['docs']))
+        if stages is None:
+            continue
+        for stage, now in result['stages'].items():
+            before = stages.get(stage)
+            if before is None:
+                continue
+            delta = now['p50_ms'] - before['p50_ms']
+            if delta > min_delta_ms and now['p50_ms'] > before['p50_ms'] * (1 + threshold):
+                regressions.append({
+                    'generator': result['generator'], 'pipeline': result['pipeline'],
+                    'docs': result['docs'], 'stage': stage,
+                    'baseline_ms': before['p50_ms'], 'p50_ms': now['p50_ms'],
+                    'change': round(now['p50_ms'] / before['p50_ms'] - 1, 3) if before['p50_ms'] else None,
+                })
+    return regressions
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Per-stage rendering benchmark of the three generators.')
+    p.add_argument('--docs', type=int, nargs='+', default=[1, 50, 1000], help='عدد المستندات لكل قياس.')
+    p.add_argument('--generators', nargs='+', choices=sorted(PIPELINES), default=['follow_up', 'traffic', 'deposit'])
+    p.add_argument('--pipelines', nargs='+', choices=('docx', 'compiled'), default=['docx', 'compiled'],
+                   help='مسارات البطاقتين: python-docx و/أو القالب المُترجم.')
+    p.add_argument('--candidates', type=int, default=30, help='عدد المرشحين في كل ملف إيداع.')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--pdf-backend', choices=PDF_BACKENDS + ('none',), default='auto',
+                   help='محرك PDF لمرحلة pdf (none لتخطيها).')
+    p.add_argument('--pdf-docs', type=int, default=3, help='عدد المستندات المحولة إلى PDF في كل قياس.')
+    p.add_argument('--pdf-timeout', type=float, default=120)
+    p.add_argument('--output', help='ملف JSON للنتائج (يصلح كـ --baseline لاحقاً).')
+    p.add_argument('--baseline', help='نتيجة سابقة للمقارنة.')
+    p.add_argument('--threshold', type=float, default=0.25, help='أقصى تباطؤ نسبي مسموح لكل مرحلة (0.25 = 25%%).')
+    p.add_argument('--min-delta-ms', type=float, default=1.0, help='فروق أصغر من هذا (ms/مستند) تُعد ضجيجاً.')
+    p.add_argument('--records-out', help='اكتب السجلات الوهمية (JSONL) ثم تابع.')
+    for generator, template in TEMPLATES.items():
+        p.add_argument(f'--{generator.replace("_", "-")}-template', dest=f'{generator}_template', default=str(template))
+    args = p.parse_args(argv)
+    args.templates = {g: getattr(args, f'{g}_template') for g in TEMPLATES}
+
+    clients = synthetic_clients(max(args.docs), args.seed)
+    if args.records_out:
+        with open(args.records_out, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(c, ensure_ascii=False) + '\n' for c in clients)
+
+    backend = None if args.pdf_backend == 'none' else get_backend(args.pdf_backend)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench_render_') as tmp:
+        for generator in args.generators:
+            for pipeline in PIPELINES[generator]:
+                if pipeline not in args.pipelines:
+                    continue
+                for docs in args.docs:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        result = run(generator, pipeline, docs, clients, args, backend, Path(tmp))
+                    results.append(result)
+                    print(f"[INFO] {generator}/{pipeline} x{docs}: {result['total_ms']} ms "
+                          f"({result['docs_per_s']} docs/s)", file=sys.stderr)
+
+    report: Dict[str, Any] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pdf_backend': backend.name if backend is not None else None,
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f), args.threshold, args.min_delta_ms)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    print(text)
+
+    for reg in report.get('regressions', ()):
+        print(f"[ERROR] {reg['generator']}/{reg['pipeline']} x{reg['docs']} {reg['stage']}: "
+              f"{reg['baseline_ms']} -> {reg['p50_ms']} ms per document (p50)", file=sys.stderr)
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
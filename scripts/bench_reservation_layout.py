@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+قياس حجم ملف الحجوزات وزمن تحميله: الشكل القديم مقابل الشكل المضغوط (client_runs.py).
+
+يخصص الساعات لـ N عميل (افتراضي 5000) عبر reserve_hours_for_dates الحقيقية، لكل منهم
+30 يوم عمل من تاريخ بداية عشوائي (~5% منهم بكتلة ثانية، كإعادة تسجيل). نطاق تواريخ البداية
+يتسع مع عدد العملاء (10 فتحات في اليوم) حتى لا تصبح كل الساعات FULL. ثم يكتب نفس
+البيانات بالشكلين ويقيس لكل شكل:
+- bytes: حجم اللقطة على القرص؛
+- parse_ms: json.loads فقط؛
+- open_ms: أول جلسة لمخزن جديد تقرأ عميلاً واحداً (ما يدفعه توليد بطاقة)؛
+- load_all_ms: تحميل كل الحجوزات بالشكل القديم (export، availability)؛
+- holders_ms: أول holders() لمخزن جديد (فتح + بناء الفهرس العكسي مرة لكل تحميل)؛
+- release_ms: release() لعميل واحد في مخزن مفتوح (جلسة تجريبية لا تُحفظ)، O(عدد الحصص).
+
+يفشل (رمز 1) إذا لم يُعِد الشكل المضغوط نفس البيانات تماماً.
+
+الاستخدام:
+    python scripts/bench_reservation_layout.py --clients 5000
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fill_candidate_follow_up_card as card  # noqa: E402
+from client_runs import decode_reservations, encode_reservations  # noqa: E402
+from reservation_store import CLIENT_MEMORY_KEY, JsonReservationStore, dump_reservations  # noqa: E402
+from slot_allocator import FULL_MARKER  # noqa: E402
+from working_calendar import get_calendar  # noqa: E402
+
+
+# Calendar days of start dates per client: 30 lessons over 10 slots a day, 5 working days a week
+WINDOW_DAYS_PER_CLIENT = 5
+
+
+def simulated_dates(rng: random.Random, window: int, count: int = 30) -> List[str]:
+    calendar = get_calendar()
+    start = date(2025, 1, 1) + timedelta(days=rng.randrange(window))
+    return calendar.format_days(calendar.working_days(start, count), '%d/%m/%Y')
+
+
+def build_reservations(clients: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    window = max(365, clients * WINDOW_DAYS_PER_CLIENT)
+    reservations: Dict[str, Any] = {CLIENT_MEMORY_KEY: {}}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(clients):
+            card.reserve_hours_for_dates(simulated_dates(rng, window), f'client_{i}', reservations)
+            if rng.random() < 0.05:
+                card.reserve_hours_for_dates(simulated_dates(rng, window), f'client_{i}', reservations)
+    return reservations
+
+
+def timed(fn, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return round(statistics.median(times), 1)
+
+
+def measure(path: Path, probe_client: str, probe_date: str, runs: int) -> Dict[str, Any]:
+    raw = path.read_bytes()
+    warm = JsonReservationStore(path)
+    warm.holders(probe_date)
+
+    def open_session():
+        store = JsonReservationStore(path)
+        with store.session(commit=False) as reservations:
+            reservations[CLIENT_MEMORY_KEY].get(probe_client)
+
+    def release_probe():
+        with warm.session(commit=False) as reservations:
+            reservations.release(probe_client)
+
+    return {
+        'bytes': len(raw),
+        'parse_ms': timed(lambda: json.loads(raw), runs),
+        'open_ms': timed(open_session, runs),
+        'load_all_ms': timed(lambda: JsonReservationStore(path).load_all(), runs),
+        'holders_ms': timed(lambda: JsonReservationStore(path).holders(probe_date), runs),
+        'release_ms': timed(release_probe, runs),
+    }
+
+
+def run(clients: int, seed: int, runs: int) -> Dict[str, Any]:
+    reservations = build_reservations(clients, seed)
+    memory = reservations[CLIENT_MEMORY_KEY]
+    probe_client = f'client_{clients // 2}'
+    probe_date = next(iter(memory[probe_client]))
+
+    with tempfile.TemporaryDirectory(prefix='reservation_layout_') as tmp:
+        legacy_path = Path(tmp) / 'legacy.json'
+        runs_path = Path(tmp) / 'runs.json'
+        legacy_path.write_bytes(dump_reservations(reservations))
+        t = time.perf_counter()
+        encoded = encode_reservations(reservations)
+        encode_ms = (time.perf_counter() - t) * 1000
+        runs_path.write_bytes(dump_reservations(encoded, indent=None))
+
+        legacy = measure(legacy_path, probe_client, probe_date, runs)
+        compact = measure(runs_path, probe_client, probe_date, runs)
+        lossless = (decode_reservations(json.loads(runs_path.read_bytes())) == reservations
+                    and JsonReservationStore(runs_path).load_all() == reservations)
+
+    header = encoded['_client_runs']
+    return {
+        'clients': clients,
+        'lessons': sum(len(hours) for hours in memory.values()),
+        'full': sum(list(hours.values()).count(FULL_MARKER) for hours in memory.values()),
+        'runs': sum(len(client_runs) for client_runs in header['clients'].values()),
+        'explicit_dates': len(encoded) - 1,
+        'encode_ms': round(encode_ms, 1),
+        'legacy': legacy,
+        'runs_layout': compact,
+        'size_ratio': round(legacy['bytes'] / compact['bytes'], 1),
+        'lossless': lossless,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Size and load time of the legacy vs run-length reservation layout.')
+    p.add_argument('--clients', type=int, default=5000)
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--runs', type=int, default=5, help='عدد التشغيلات لكل قياس (يؤخذ الوسيط).')
+    args = p.parse_args(argv)
+
+    result = run(args.clients, args.seed, args.runs)
+    print(json.dumps(result, indent=2))
+    if not result['lossless']:
+        print('[ERROR] The run-length layout did not round-trip to the same reservations', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+مقارنة التخصيص الجشع (عميلاً بعد عميل) مع مُحسِّن الدفعة (schedule_optimizer.py).
+
+يولّد دفعة من N عميل (افتراضي 100) بتواريخ بداية متقاربة (تزاحم حقيقي)، ويخطط
+ساعات الدروس التطبيقية بالطريقتين على نسختين من نفس الحجوزات، ثم يطبع:
+عدد العملاء بساعة ثابتة، المختلطين، عدد دروس FULL، والزمن. يفشل إذا أُعطيت فتحة
+مرتين أو تجاوز المحسن ثانية واحدة.
+
+الاستخدام:
+    python scripts/bench_schedule_optimizer.py --clients 100 --window 120
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fill_candidate_follow_up_card as card  # noqa: E402
+from schedule_optimizer import schedule_stats  # noqa: E402
+from slot_allocator import FULL_MARKER  # noqa: E402
+
+
+def build_cohort(clients: int, lessons: int, window: int, seed: int):
+    rng = random.Random(seed)
+    cohort = []
+    for i in range(clients):
+        start = (date(2025, 10, 1) + timedelta(days=rng.randrange(window))).strftime('%Y-%m-%d')
+        cohort.append((f'client_{i}', card.generate_dates(start, lessons, '%d/%m/%Y')))
+    return cohort
+
+
+def double_bookings(reservations: Dict[str, Any]) -> int:
+    seen = set()
+    clashes = 0
+    for hours in reservations.get('_client_memory', {}).values():
+        for date_str, hour in hours.items():
+            if hour == FULL_MARKER:
+                continue
+            if (date_str, hour) in seen:
+                clashes += 1
+            seen.add((date_str, hour))
+    return clashes
+
+
+def run(clients: int, lessons: int, window: int, seed: int) -> Dict[str, Any]:
+    cohort = build_cohort(clients, lessons, window, seed)
+
+    greedy_state: Dict[str, Any] = {}
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        greedy = {cid: card.reserve_hours_for_dates(dates, cid, greedy_state) for cid, dates in cohort}
+    greedy_ms = (time.perf_counter() - t) * 1000
+
+    cohort_state: Dict[str, Any] = {}
+    t = time.perf_counter()
+    planned: List[List[str]] = card.plan_cohort_hours(cohort, cohort_state)
+    cohort_ms = (time.perf_counter() - t) * 1000
+    optimised = {cid: hours for (cid, _), hours in zip(cohort, planned)}
+
+    return {
+        'clients': clients,
+        'lessons': lessons,
+        'window_days': window,
+        'greedy': {**schedule_stats(greedy), 'ms': round(greedy_ms, 1), 'double_booked': double_bookings(greedy_state)},
+        'cohort': {**schedule_stats(optimised), 'ms': round(cohort_ms, 1), 'double_booked': double_bookings(cohort_state)},
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Greedy vs cohort hour allocation.')
+    p.add_argument('--clients', type=int, default=100)
+    p.add_argument('--lessons', type=int, default=30)
+    p.add_argument('--window', type=int, default=120, help='نطاق تواريخ البداية بالأيام.')
+    p.add_argument('--seed', type=int, default=1)
+    args = p.parse_args(argv)
+
+    result = run(args.clients, args.lessons, args.window, args.seed)
+    print(json.dumps(result, indent=2))
+    if result['cohort']['double_booked'] or result['greedy']['double_booked']:
+        print('[ERROR] A slot was given out twice', file=sys.stderr)
+        sys.exit(1)
+    if args.clients <= 100 and result['cohort']['ms'] > 1000:
+        print('[ERROR] Cohort planning took more than a second', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+قياس أداء مخصِّص الساعات: منطق القوائم القديم مقابل أقنعة البتات (slot_allocator.py).
+
+يستدعي reserve_hours_for_dates الحقيقية من fill_candidate_follow_up_card.py.
+يحاكي N عميل (افتراضي 10000)، لكل منهم 30 تاريخ عمل متتالي من تاريخ بداية عشوائي،
+ويخصص الساعات بالطريقتين على نسختين مستقلتين من نفس البيانات، ثم يتحقق من أن
+الساعات المعطاة وبيانات الحجز الناتجة متطابقة تماماً.
+
+الاستخدام:
+    python scripts/bench_slot_allocator.py --clients 10000 --seed 1
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fill_candidate_follow_up_card as card  # noqa: E402
+from working_calendar import get_calendar  # noqa: E402
+
+WORKING_HOURS = {'start': 7, 'end': 17, 'format_template': '{start:02d}-{end:02d}'}
+LEGACY_MARKERS = ['من', 'إلى', 'ىلإ', 'الى', ':00', 'h']
+
+
+def simulated_dates(rng: random.Random, count: int = 30) -> List[str]:
+    calendar = get_calendar()
+    start = date(2025, 1, 1) + timedelta(days=rng.randrange(365))
+    return calendar.format_days(calendar.working_days(start, count), '%d/%m/%Y')
+
+
+def legacy_allocate(reservations: Dict[str, Any], dates: List[str], client_id: str) -> List[str]:
+    """The list-scanning allocation as it was before the bitmask allocator (reference)."""
+    def first_free(date_str):
+        date_reservations = reservations.get(date_str, [])
+        assigned = None
+        for hour in range(WORKING_HOURS['start'], WORKING_HOURS['end']):
+            slot = WORKING_HOURS['format_template'].format(start=hour, end=hour + 1)
+            if slot not in date_reservations:
+                date_reservations.append(slot)
+                assigned = slot
+                break
+        if assigned is None:
+            assigned = 'FULL'
+        reservations[date_str] = date_reservations
+        return assigned
+
+    client_memory = reservations.setdefault('_client_memory', {})
+    if client_id in client_memory:
+        stored = client_memory[client_id]
+        cleaned = {}
+        for date_str, old_hour in stored.items():
+            if any(p in str(old_hour) for p in LEGACY_MARKERS):
+                cleaned[date_str] = first_free(date_str)
+            else:
+                cleaned[date_str] = old_hour
+        stored = client_memory[client_id] = cleaned
+        hours = []
+        for date_str in dates:
+            if date_str in stored:
+                hours.append(stored[date_str])
+            else:
+                assigned = first_free(date_str)
+                hours.append(assigned)
+                stored[date_str] = assigned
+        return hours
+
+    hours = []
+    client_hours = {}
+    for date_str in dates:
+        assigned = first_free(date_str)
+        hours.append(assigned)
+        client_hours[date_str] = assigned
+    client_memory[client_id] = client_hours
+    return hours
+
+
+def build_workload(clients: int, seed: int):
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(clients):
+        # ~5% of jobs re-print an existing client's card
+        client_id = f'client_{rng.randrange(i)}' if i and rng.random() < 0.05 else f'client_{i}'
+        jobs.append((client_id, simulated_dates(rng)))
+    # Seed data with a legacy-format client and a legacy slot string
+    initial = {
+        '_client_memory': {'client_0': {jobs[0][1][0]: 'من07:00إلى08:00h'}},
+        jobs[0][1][0]: ['07:00-08:00'],
+    }
+    return jobs, initial
+
+
+def run(clients: int, seed: int) -> Dict[str, Any]:
+    jobs, initial = build_workload(clients, seed)
+
+    legacy_state = json.loads(json.dumps(initial))
+    t = time.perf_counter()
+    legacy_hours = [legacy_allocate(legacy_state, dates, cid) for cid, dates in jobs]
+    legacy_s = time.perf_counter() - t
+
+    bitmask_state = json.loads(json.dumps(initial))
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bitmask_hours = [card.reserve_hours_for_dates(dates, cid, bitmask_state) for cid, dates in jobs]
+    bitmask_s = time.perf_counter() - t
+
+    identical = legacy_hours == bitmask_hours and legacy_state == bitmask_state
+    full = sum(h.count('FULL') for h in bitmask_hours)
+    return {
+        'clients': clients,
+        'lessons': clients * 30,
+        'full_slots': full,
+        'legacy_ms': round(legacy_s * 1000, 1),
+        'bitmask_ms': round(bitmask_s * 1000, 1),
+        'speedup': round(legacy_s / bitmask_s, 2) if bitmask_s else None,
+        'identical': identical,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Benchmark legacy vs bitmask hour allocation.')
+    p.add_argument('--clients', type=int, default=10000)
+    p.add_argument('--seed', type=int, default=1)
+    args = p.parse_args(argv)
+
+    result = run(args.clients, args.seed)
+    print(json.dumps(result, indent=2))
+    if not result['identical']:
+        print('[ERROR] Bitmask allocator diverged from the legacy allocation', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
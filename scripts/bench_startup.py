@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+قياس زمن بدء تشغيل السكربتات الثلاثة (python -X importtime).
+
+كل أمر لا يولّد ملفاً (--help، خطأ في الوسائط، --placeholders، --skip-if-exists، ملف من
+ذاكرة التوليد) يدفع ثمن استيراد السكربت كاملاً. لكل سكربت:
+- import_ms: الزمن التراكمي لاستيراد الوحدة كما يطبعه -X importtime (وسيط عدة تشغيلات)؛
+- packages: أثقل الحزم المستوردة (مجموع self لكل حزمة عليا)؛
+- heavy: المكتبات الثقيلة (python-docx، lxml، docxtpl، numpy، PDF...) التي حُمّلت
+  عند الاستيراد. يجب أن تكون فارغة: هذه المكتبات تُستورد عند أول توليد فقط؛
+- commands: زمن أوامر لا تولّد ملفاً من البداية إلى النهاية (عملية Python كاملة).
+
+يفشل (رمز 1) إذا حُمّلت مكتبة ثقيلة عند الاستيراد، أو تجاوز استيراد سكربت --max-import-ms.
+
+الاستخدام:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 10 --max-import-ms 150
+"""
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+SCRIPTS = ('fill_candidate_follow_up_card', 'fill_traffic_law_lessons_card', 'generate_deposit_docx')
+
+# Libraries that must only be imported once a render actually happens
+HEAVY_PACKAGES = ('docx', 'lxml', 'docxtpl', 'jinja2', 'docx2pdf', 'numpy',
+                  'pypdf', 'reportlab', 'arabic_reshaper', 'bidi', 'uno')
+
+# Commands that never render: (script, argv)
+COMMANDS = (
+    ('fill_candidate_follow_up_card', ['--help']),
+    ('fill_traffic_law_lessons_card', ['--help']),
+    ('fill_traffic_law_lessons_card', ['--placeholders']),
+    ('generate_deposit_docx', ['--help']),
+    ('generate_deposit_docx', ['--placeholders']),
+)
+
+
+def import_profile(module: str) -> Tuple[float, Dict[str, float]]:
+    """(cumulative import ms of `module`, self ms per top-level package) from one -X importtime run."""
+    code = f'import sys; sys.path.insert(0, {str(SCRIPTS_DIR)!r}); import {module}'
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, cwd=str(SCRIPTS_DIR))
+    if proc.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{proc.stderr[-2000:]}')
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        top = name.split('.')[0]
+        packages[top] = packages.get(top, 0.0) + int(self_us) / 1000
+        if name == module:
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def command_ms(script: str, argv: List[str]) -> float:
+    t = time.perf_counter()
+    proc = subprocess.run([sys.executable, str(SCRIPTS_DIR / f'{script}.py'), *argv],
+                          capture_output=True, cwd=str(SCRIPTS_DIR))
+    elapsed = (time.perf_counter() - t) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f'{script} {" ".join(argv)} exited with {proc.returncode}')
+    return elapsed
+
+
+def bench_script(module: str, runs: int, top: int) -> dict:
+    totals = []
+    packages: Dict[str, float] = {}
+    for _ in range(runs):
+        total, packages = import_profile(module)
+        totals.append(total)
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return {
+        'script': module,
+        'import_ms': round(statistics.median(totals), 1),
+        'packages': {name: round(ms, 1) for name, ms in heaviest},
+        'heavy': sorted(name for name in packages if name in HEAVY_PACKAGES),
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Import cost of the generator scripts (python -X importtime).')
+    p.add_argument('--runs', type=int, default=5, help='عدد التشغيلات لكل قياس (يؤخذ الوسيط).')
+    p.add_argument('--top', type=int, default=8, help='عدد الحزم المعروضة لكل سكربت.')
+    p.add_argument('--max-import-ms', type=float, default=None,
+                   help='الحد الأقصى لزمن استيراد أي سكربت (بدون حد افتراضياً، الأجهزة تختلف).')
+    args = p.parse_args(argv)
+
+    # One untimed import per script: warms the OS file cache and writes the .pyc files
+    for module in SCRIPTS:
+        import_profile(module)
+
+    results = [bench_script(module, args.runs, args.top) for module in SCRIPTS]
+    commands = []
+    for script, command in COMMANDS:
+        times = [command_ms(script, command) for _ in range(args.runs)]
+        commands.append({'script': script, 'argv': ' '.join(command),
+                         'wall_ms': round(statistics.median(times), 1)})
+    print(json.dumps({'scripts': results, 'commands': commands}, indent=2, ensure_ascii=False))
+
+    failed = False
+    for result in results:
+        if result['heavy']:
+            print(f"[ERROR] {result['script']} imports {', '.join(result['heavy'])} at startup", file=sys.stderr)
+            failed = True
+        if args.max_import_ms is not None and result['import_ms'] > args.max_import_ms:
+            print(f"[ERROR] {result['script']} takes {result['import_ms']} ms to import "
+                  f"(limit {args.max_import_ms} ms)", file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+قياس أداء تعبئة جداول الحصص: الوصول القديم عبر table.rows[i].cells[j] مقابل table_fill.py.
+
+يأخذ جدول الحصص التطبيقية (الجدول 3) من قالب بطاقة المتابعة، ويوسعه بنسخ آخر صف
+حتى يحتوي على 30 و 120 و 500 صف حصة، ويحفظ كل نسخة كقالب مؤقت. ثم لكل حجم:
+- access: تحديد خلايا التاريخ والساعة فقط (بدون كتابة)؛
+- fill: تعبئة التواريخ والساعات (format_cell).
+يتحقق من أن document.xml الناتج متطابق بين الطريقتين.
+
+الاستخدام:
+    python scripts/bench_table_fill.py
+    python scripts/bench_table_fill.py --rows 30 120 500 --runs 20
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import copy
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from docx import Document  # noqa: E402
+from docx.opc.oxml import serialize_part_xml  # noqa: E402
+from fill_candidate_follow_up_card import (  # noqa: E402
+    TABLES_CONFIG, LESSON_CELL, fill_table_dates_and_hours, format_cell)
+from table_fill import table_cells  # noqa: E402
+from template_cache import get_document  # noqa: E402
+
+DEFAULT_TEMPLATE = Path(__file__).resolve().parent.parent / 'resources' / 'templates' / 'بطاقة المتابعة للمترشح.docx'
+CONFIG = TABLES_CONFIG['lessons_table2']
+
+
+def grown_template(template: str, lesson_rows: int, directory: Path) -> Path:
+    """Copy of `template` whose practical lessons table has `lesson_rows` rows after the header."""
+    doc = Document(template)
+    tbl = doc.tables[CONFIG['index']]._tbl
+    trs = tbl.tr_lst
+    wanted = CONFIG['start_row'] + lesson_rows
+    for tr in trs[wanted:]:
+        tbl.remove(tr)
+    while len(tbl.tr_lst) < wanted:
+        tbl.append(copy.deepcopy(trs[-1]))
+    path = directory / f'table_{lesson_rows}.docx'
+    doc.save(str(path))
+    return path
+
+
+def legacy_access(doc, count: int) -> List:
+    table = doc.tables[CONFIG['index']]
+    return [(table.rows[r].cells[CONFIG['date_col']], table.rows[r].cells[CONFIG['hour_col']])
+            for r in range(CONFIG['start_row'], CONFIG['start_row'] + count)]
+
+
+def table_fill_access(doc, count: int) -> List:
+    cells = table_cells(doc, CONFIG['index'])
+    return [(cells.tc(r, CONFIG['date_col']), cells.tc(r, CONFIG['hour_col']))
+            for r in range(CONFIG['start_row'], CONFIG['start_row'] + count)]
+
+
+def legacy_fill(doc, dates: List[str], hours: List[str]):
+    """The row.cells loop as it was before table_fill.py (reference)."""
+    LESSON_CELL.ensure_style(doc)
+    table = doc.tables[CONFIG['index']]
+    for i in range(min(len(dates), len(hours))):
+        row_idx = CONFIG['start_row'] + i
+        if row_idx >= len(table.rows):
+            break
+        row = table.rows[row_idx]
+        format_cell(row.cells[CONFIG['date_col']], dates[i])
+        format_cell(row.cells[CONFIG['hour_col']], hours[i])
+
+
+def table_fill_fill(doc, dates: List[str], hours: List[str]):
+    LESSON_CELL.ensure_style(doc)
+    fill_table_dates_and_hours(table_cells(doc, CONFIG['index']), dates, hours,
+                               CONFIG['start_row'], CONFIG['date_col'], CONFIG['hour_col'])
+
+
+def timed(fn, docs) -> float:
+    t = time.perf_counter()
+    for doc in docs:
+        fn(doc)
+    return (time.perf_counter() - t) * 1000 / len(docs)
+
+
+def bench_size(template: Path, lesson_rows: int, runs: int) -> dict:
+    dates = [f'{(i % 28) + 1:02d}/10/2025' for i in range(lesson_rows)]
+    hours = [f'{7 + i % 10:02d}-{8 + i % 10:02d}' for i in range(lesson_rows)]
+    get_document(template)  # parse (and cache the table layout) outside the timings
+    table_cells(get_document(template), CONFIG['index'])
+
+    result = {'rows': lesson_rows}
+    for stage, legacy, fast, args in (('access', legacy_access, table_fill_access, (lesson_rows,)),
+                                      ('fill', legacy_fill, table_fill_fill, (dates, hours))):
+        # Documents from the cache are only valid until the next checkout: time one at a time
+        legacy_ms = fast_ms = 0.0
+        for _ in range(runs):
+            legacy_ms += timed(lambda doc: legacy(doc, *args), [get_document(template)])
+            fast_ms += timed(lambda doc: fast(doc, *args), [get_document(template)])
+        result[f'{stage}_legacy_ms'] = round(legacy_ms / runs, 3)
+        result[f'{stage}_table_fill_ms'] = round(fast_ms / runs, 3)
+        result[f'{stage}_speedup'] = round(legacy_ms / fast_ms, 1) if fast_ms else None
+
+    doc = get_document(template)
+    legacy_fill(doc, dates, hours)
+    legacy_xml = serialize_part_xml(doc.element)
+    doc = get_document(template)
+    table_fill_fill(doc, dates, hours)
+    result['same_xml'] = legacy_xml == serialize_part_xml(doc.element)
+    return result
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Lesson table fill: row.cells vs table_fill.')
+    p.add_argument('--template', default=str(DEFAULT_TEMPLATE))
+    p.add_argument('--rows', type=int, nargs='+', default=[30, 120, 500], help='عدد صفوف الحصص في الجدول.')
+    p.add_argument('--runs', type=int, default=10, help='عدد المستندات لكل طريقة وحجم.')
+    args = p.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        for rows in args.rows:
+            results.append(bench_size(grown_template(args.template, rows, Path(tmp)), rows, args.runs))
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if not all(r['same_xml'] for r in results):
+        print('[ERROR] table_fill produced a different document from the row.cells loop', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
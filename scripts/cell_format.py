@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+تنسيق خلايا الحصص عبر نمط (style) واحد بدل إعادة بناء خصائص كل run وكل خلية.
+
+كانت كل خلية تاريخ/ساعة تبني فقرة و run بخصائص مباشرة (الخط، الحجم، الغامق، المحاذاة،
+التباعد) وعنصر w:tcMar جديداً، ثم تمر بطاقة المتابعة على كل run في كل الجداول لتعيد
+ضبط الخط. هنا يُعرَّف شكل خلية الحصة مرة واحدة:
+
+- نمط فقرة في styles.xml (Arial، غامق، الحجم، توسيط، بدون تباعد) مبني على نمط
+  الفقرة الافتراضي للقالب. يضاف للمستند مرة واحدة (ensure_style).
+- فقرة جاهزة تشير إلى النمط بمعرّفه، وعنصرا w:tcMar (هوامش صفر) و w:vAlign (توسيط
+  عمودي) جاهزان. كل خلية تأخذ نسخة رخيصة (deepcopy) منها في مكانها الصحيح داخل tcPr.
+- العناصر الجاهزة تُبنى عند أول استخدام، فتعريف CellFormat في رأس السكربت لا يستورد
+  python-docx.
+
+الاستخدام من الكود:
+    from cell_format import CellFormat
+    LESSON_CELL = CellFormat('LessonCell', 'Lesson Cell', size_pt=10)
+    LESSON_CELL.ensure_style(doc)
+    LESSON_CELL.apply(tc, '2025/09/21')
+"""
+from __future__ import annotations
+import copy
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+# tcPr children that must follow w:tcMar / w:vAlign (CT_TcPr sequence)
+_AFTER_VALIGN = ('w:hideMark', 'w:headers', 'w:cellIns', 'w:cellDel', 'w:cellMerge', 'w:tcPrChange')
+_AFTER_TCMAR = ('w:textDirection', 'w:tcFitText', 'w:vAlign') + _AFTER_VALIGN
+_REPLACED_TCPR = (f'{{{W_NS}}}tcMar', f'{{{W_NS}}}vAlign')
+
+
+class CellFormat:
+    """A lesson-cell look: paragraph style + prebuilt paragraph and cell-property fragments."""
+
+    def __init__(self, style_id: str, name: str, font: str = 'Arial', size_pt: float = 12, bold: bool = True):
+        self.style_id = style_id
+        half_points = int(round(size_pt * 2))
+        self._style_xml = (
+            f'<w:style xmlns:w="{W_NS}" w:type="paragraph" w:customStyle="1" w:styleId="{style_id}">'
+            f'<w:name w:val="{name}"/>{{based_on}}<w:qFormat/>'
+            '<w:pPr><w:spacing w:before="0" w:after="0" w:line="240" w:lineRule="auto"/><w:jc w:val="center"/></w:pPr>'
+            f'<w:rPr><w:rFonts w:ascii="{font}" w:hAnsi="{font}"/>{"<w:b/>" if bold else ""}<w:sz w:val="{half_points}"/></w:rPr>'
+            '</w:style>'
+        )
+        self._paragraph = self._margins = self._valign = None  # built by _build() on first use
+
+    def _build(self):
+        from docx.oxml import parse_xml
+        from docx.oxml.ns import nsdecls
+
+        self._paragraph = parse_xml(
+            f'<w:p {nsdecls("w")}><w:pPr><w:pStyle w:val="{self.style_id}"/></w:pPr><w:r><w:t/></w:r></w:p>')
+        self._margins = parse_xml(
+            f'<w:tcMar {nsdecls("w")}>'
+            + ''.join(f'<w:{side} w:w="0" w:type="dxa"/>' for side in ('top', 'start', 'bottom', 'end'))
+            + '</w:tcMar>')
+        self._valign = parse_xml(f'<w:vAlign {nsdecls("w")} w:val="center"/>')
+
+    def ensure_style(self, doc):
+        """Add the paragraph style to `doc` unless it is already there."""
+        from docx.enum.style import WD_STYLE_TYPE
+        from docx.oxml import parse_xml
+
+        styles = doc.styles
+        if styles.element.get_by_id(self.style_id) is not None:
+            return
+        default = styles.default(WD_STYLE_TYPE.PARAGRAPH)
+        based_on = '' if default is None else f'<w:basedOn w:val="{default.style_id}"/>'
+        styles.element.append(parse_xml(self._style_xml.replace('{based_on}', based_on)))
+
+    def apply(self, tc, text: str):
+        """Replace the content of cell `tc` with one styled paragraph holding `text`."""
+        if self._paragraph is None:
+            self._build()
+        tc.clear_content()
+        p = copy.deepcopy(self._paragraph)
+        run = p[-1]
+        if text:
+            run[0].text = text
+        else:
+            run.remove(run[0])
+        tc.append(p)
+
+        tcPr = tc.get_or_add_tcPr()
+        for child in list(tcPr):
+            if child.tag in _REPLACED_TCPR:
+                tcPr.remove(child)
+        tcPr.insert_element_before(copy.deepcopy(self._margins), *_AFTER_TCMAR)
+        tcPr.insert_element_before(copy.deepcopy(self._valign), *_AFTER_VALIGN)
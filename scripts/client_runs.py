@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+تمثيل مضغوط لذاكرة العملاء (_client_memory) بترميز طول التتابع (run-length).
+
+في الشكل القديم لكل حصة زوج "dd/mm/yyyy": "HH-HH"، أي 30 زوجاً متشابهاً لكل عميل.
+هنا تُخزَّن ساعات كل عميل كتتابعات [رقم يوم العمل الأول، العدد، الساعة]: كتلة الحصص
+التطبيقية (30 يوم عمل متتالي بنفس الساعة) تصبح تتابعاً واحداً.
+- رقم يوم العمل: فهرس أيام الأسبوع بدون عطلة نهاية الأسبوع (الجمعة والسبت) وبدون العطل
+  الرسمية، حتى لا يتغير معنى الملف إذا تغيّر holidays.json. العطلة داخل كتلة تقسمها
+  إلى تتابعين فقط.
+- الاستثناءات (تاريخ بصيغة أخرى أو في عطلة نهاية الأسبوع) تُحفظ كما هي في "other".
+- قوائم الفتحات لكل تاريخ تُشتق من ذاكرة العملاء (بترتيب العملاء)؛ تُحفظ صراحة فقط
+  القوائم التي تختلف عن المشتقة، و "absent" للتواريخ المشتقة التي لا قائمة لها.
+
+التحويل بين الشكلين بلا فقد (النتيجة تساوي الأصل كـ dict):
+    data = encode_reservations(reservations)   # الشكل القديم -> المضغوط
+    reservations = decode_reservations(data)   # المضغوط -> الشكل القديم
+
+الشكل المضغوط في الملف:
+    {
+      "_client_runs": {
+        "version": 1, "weekend": [4, 5],
+        "clients": {"<client_id>": [[<يوم العمل>, 30, "07-08"], ...], ...},
+        "other": {"<client_id>": {"<تاريخ>": "07-08"}},
+        "absent": ["dd/mm/yyyy", ...]
+      },
+      "dd/mm/yyyy": ["08-09", "07-08"],   # قائمة تختلف عن المشتقة فقط
+      ...
+    }
+
+load_runs_layout() يعيد الشكل القديم مع ذاكرة عملاء كسولة (RunLengthMemory): ساعات
+العميل تُفك عند أول وصول إليها فقط.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from collections.abc import MutableMapping
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from slot_allocator import FULL_MARKER
+from working_calendar import WEEKEND_DAYS
+
+CLIENT_MEMORY_KEY = '_client_memory'
+RUNS_KEY = '_client_runs'
+RUNS_VERSION = 1
+
+# Run = [first weekday index, number of consecutive weekdays, hour]
+Run = List[Any]
+
+
+def format_key(day: date) -> str:
+    """dd/mm/yyyy, as strftime('%d/%m/%Y') writes the _client_memory keys (a few times faster)."""
+    return f'{day.day:02d}/{day.month:02d}/{day.year:04d}'
+
+
+class WeekdayIndex:
+    """Consecutive numbering of the non-weekend days (holidays are ordinary days here).
+
+    Dates are keys in the dd/mm/yyyy layout of _client_memory; anything else has no index."""
+
+    def __init__(self, weekend: Iterable[int] = WEEKEND_DAYS):
+        self.weekend = sorted(set(weekend))
+        # date.fromordinal(1) is a Monday: weekday == (ordinal - 1) % 7
+        self.positions = [d for d in range(7) if d not in self.weekend]
+        self.per_week = len(self.positions)
+        self.rank = {d: i for i, d in enumerate(self.positions)}
+        self._labels: Dict[int, str] = {}
+        self._indexes: Dict[str, Optional[int]] = {}
+
+    def index_of(self, date_str: str) -> Optional[int]:
+        """Weekday index of a canonical 'dd/mm/yyyy' key, or None (other format, weekend day)."""
+        try:
+            return self._indexes[date_str]
+        except KeyError:
+            pass
+        index = self._parse(date_str)
+        self._indexes[date_str] = index
+        return index
+
+    def _parse(self, date_str: str) -> Optional[int]:
+        if not isinstance(date_str, str) or len(date_str) != 10 or date_str[2] != '/' or date_str[5] != '/':
+            return None
+        try:
+            day = date(int(date_str[6:]), int(date_str[3:5]), int(date_str[:2]))
+        except ValueError:
+            return None
+        if format_key(day) != date_str:  # e.g. ' 1/02/2025', '+1/02/2025'
+            return None
+        week, weekday = divmod(day.toordinal() - 1, 7)
+        rank = self.rank.get(weekday)
+        if rank is None:
+            return None
+        return week * self.per_week + rank
+
+    def label(self, index: int) -> str:
+        """The 'dd/mm/yyyy' key of a weekday index (cached)."""
+        text = self._labels.get(index)
+        if text is None:
+            week, rank = divmod(index, self.per_week)
+            text = format_key(date.fromordinal(week * 7 + self.positions[rank] + 1))
+            self._labels[index] = text
+        return text
+
+
+# -----------------------------
+# One client
+# -----------------------------
+
+def encode_client(hours: Dict[str, str], index: WeekdayIndex) -> Tuple[List[Run], Dict[str, str]]:
+    """(runs, exceptions) of one client's {date: hour} mapping."""
+    runs: List[Run] = []
+    other: Dict[str, str] = {}
+    for date_str, hour in hours.items():
+        i = index.index_of(date_str)
+        if i is None:
+            other[date_str] = hour
+            continue
+        if runs:
+            last = runs[-1]
+            if last[2] == hour and last[0] + last[1] == i:
+                last[1] += 1
+                continue
+        runs.append([i, 1, hour])
+    return runs, other
+
+
+def decode_client(runs: List[Run], other: Optional[Dict[str, str]], index: WeekdayIndex) -> Dict[str, str]:
+    """{date: hour} of one client: the runs in order, then the exceptions."""
+    label = index.label
+    hours = {label(i): hour for start, count, hour in runs for i in range(start, start + count)}
+    if other:
+        hours.update(other)
+    return hours
+
+
+class RunLengthMemory(MutableMapping):
+    """`_client_memory` over encoded clients; a client's hours are decoded on first access.
+
+    Assigned clients are kept as plain dicts and only encoded again by encoded()."""
+
+    def __init__(self, index: WeekdayIndex, clients: Optional[Dict[str, List[Run]]] = None,
+                 other: Optional[Dict[str, Dict[str, str]]] = None):
+        self.index = index
+        self._other = other or {}
+        # client_id -> hours dict once decoded/assigned, or its runs list while still encoded
+        self._items: Dict[str, Any] = dict(clients or {})
+        self._encoded = set(self._items)
+
+    def __getitem__(self, client_id):
+        value = self._items[client_id]
+        if client_id in self._encoded:
+            value = decode_client(value, self._other.get(client_id), self.index)
+            self._items[client_id] = value
+            self._encoded.discard(client_id)
+        return value
+
+    def __setitem__(self, client_id, hours):
+        self._items[client_id] = hours
+        self._encoded.discard(client_id)
+
+    def __delitem__(self, client_id):
+        del self._items[client_id]
+        self._encoded.discard(client_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, client_id):
+        return client_id in self._items
+
+    def distinct_hours(self) -> set:
+        """Every hour value held, without decoding the encoded clients."""
+        hours = set()
+        for client_id, value in self._items.items():
+            if client_id in self._encoded:
+                hours.update(run[2] for run in value)
+                hours.update(self._other.get(client_id, {}).values())
+            else:
+                hours.update(value.values())
+        return hours
+
+    def claims(self) -> Iterator[Tuple[str, str, str]]:
+        """(client_id, date, hour) of every stored hour; encoded clients are not cached decoded."""
+        label = self.index.label
+        for client_id, value in self._items.items():
+            if client_id in self._encoded:
+                for start, count, hour in value:
+                    for i in range(start, start + count):
+                        yield client_id, label(i), hour
+                value = self._other.get(client_id, {})
+            for date_str, hour in value.items():
+                yield client_id, date_str, hour
+
+    def encoded(self) -> Tuple[Dict[str, List[Run]], Dict[str, Dict[str, str]]]:
+        """(clients, other) for the file; clients never decoded are passed through as read."""
+        clients: Dict[str, List[Run]] = {}
+        other: Dict[str, Dict[str, str]] = {}
+        for client_id, value in self._items.items():
+            if client_id in self._encoded:
+                runs, exceptions = value, self._other.get(client_id)
+            else:
+                runs, exceptions = encode_client(value, self.index)
+            clients[client_id] = runs
+            if exceptions:
+                other[client_id] = exceptions
+        return clients, other
+
+    def date_slots(self) -> Dict[str, List[str]]:
+        """Per-date slot lists derived from every client (FULL markers hold no slot).
+
+        Each list follows the client order. Weekday dates are collected by index and
+        labelled once at the end; a key is either always indexed or never, so the
+        two groups cannot interleave within one date."""
+        by_index: Dict[int, List[str]] = defaultdict(list)
+        slots: Dict[str, List[str]] = {}
+        index_of = self.index.index_of
+        for client_id, value in self._items.items():
+            if client_id in self._encoded:
+                for start, count, hour in value:
+                    if hour == FULL_MARKER:
+                        continue
+                    for i in range(start, start + count):
+                        by_index[i].append(hour)
+                items = self._other.get(client_id, {}).items()
+            else:
+                items = value.items()
+            for date_str, hour in items:
+                if hour == FULL_MARKER:
+                    continue
+                i = index_of(date_str)
+                if i is None:
+                    slots.setdefault(date_str, []).append(hour)
+                else:
+                    by_index[i].append(hour)
+        label = self.index.label
+        for i, hours in by_index.items():
+            slots[label(i)] = hours
+        return slots
+
+
+# -----------------------------
+# Whole store
+# -----------------------------
+
+def is_runs_layout(data: Dict[str, Any]) -> bool:
+    return RUNS_KEY in data
+
+
+def encode_reservations(reservations: Dict[str, Any], weekend: Iterable[int] = WEEKEND_DAYS) -> Dict[str, Any]:
+    """Legacy layout (or a state holding a RunLengthMemory) -> compact layout, JSON-ready."""
+    memory = reservations.get(CLIENT_MEMORY_KEY)
+    header: Dict[str, Any] = {'version': RUNS_VERSION, 'weekend': sorted(set(weekend))}
+    derived: Dict[str, List[str]] = {}
+    if memory is not None:
+        if not isinstance(memory, RunLengthMemory) or memory.index.weekend != header['weekend']:
+            memory = _as_run_memory(memory, WeekdayIndex(weekend))
+        clients, other = memory.encoded()
+        header['clients'] = clients
+        if other:
+            header['other'] = other
+        derived = memory.date_slots()
+
+    data: Dict[str, Any] = {RUNS_KEY: header}
+    for key, value in reservations.items():
+        if key == CLIENT_MEMORY_KEY:
+            continue
+        if isinstance(value, list) and derived.get(key) == value:
+            continue  # rebuilt from the client runs on load
+        data[key] = value
+    absent = [d for d in derived if d not in reservations]
+    if absent:
+        header['absent'] = absent
+    return data
+
+
+def _as_run_memory(memory, index: WeekdayIndex) -> RunLengthMemory:
+    run_memory = RunLengthMemory(index)
+    for client_id, hours in memory.items():
+        run_memory[client_id] = hours
+    return run_memory
+
+
+def load_runs_layout(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact layout -> legacy layout with a lazy RunLengthMemory as `_client_memory`."""
+    header = data[RUNS_KEY]
+    if header.get('version') != RUNS_VERSION:
+        raise ValueError(f"Unsupported {RUNS_KEY} version: {header.get('version')}")
+    state: Dict[str, Any] = {}
+    derived: Dict[str, List[str]] = {}
+    if 'clients' in header:
+        memory = RunLengthMemory(WeekdayIndex(header['weekend']), header['clients'], header.get('other'))
+        state[CLIENT_MEMORY_KEY] = memory
+        derived = memory.date_slots()
+    for key, value in data.items():
+        if key != RUNS_KEY:
+            state[key] = value
+    absent = set(header.get('absent', ()))
+    for key, slots in derived.items():
+        if key not in state and key not in absent:
+            state[key] = slots
+    return state
+
+
+def decode_reservations(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact layout -> plain legacy-layout dict (every client decoded)."""
+    state = load_runs_layout(data)
+    memory = state.get(CLIENT_MEMORY_KEY)
+    if memory is not None:
+        state[CLIENT_MEMORY_KEY] = {client_id: dict(hours) for client_id, hours in memory.items()}
+    return state
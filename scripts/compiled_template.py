@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+قوالب مُترجمة مسبقاً (compiled templates): توليد word/document.xml بوصل أجزاء بايتات.
+
+القوالب لا تتغير إلا نادراً، بينما كل توليد يبني شجرة python-docx كاملة ويبحث فيها
+ثم يعيد تسلسلها. خطوة "الترجمة" تحلل القالب مرة واحدة:
+
+1. يُشغَّل مسار التوليد الحقيقي للبطاقة (نفس الدوال) مرتين على القالب:
+   - مع قيم علامة (sentinel) مكان كل متغير {{key}} وكل خلية قابلة للملء.
+   - مع نفس المتغيرات ولكن بدون ملء الخلايا.
+2. تُحاط كل منطقة قابلة للملء (خلية w:tc أو صف w:tr) بتعليقين، ويُسلسل المستند.
+3. يجب أن يتطابق كل ما هو خارج المناطق بين التشغيلين، فيُقسَّم XML إلى أجزاء ثابتة
+   ومواضع (متغير / منطقة بشكليها: مملوءة حول قيم الخلايا، أو فارغة كما في القالب).
+4. أجزاء الحزمة الأخرى التي تغيرها خطوات التوليد (مثل نمط مضاف إلى word/styles.xml)
+   يجب أن تتطابق بين التشغيلين، وتُحفظ كاملة.
+
+النتيجة تُحفظ بجانب القالب: <template>.compiled.json مع بصمة SHA-256 للقالب،
+بصمة ملفات الكود التي أنتجتها، وإعدادات الجداول (layout). التوليد بعد ذلك هو وصل
+الأجزاء مع القيم بعد تهريبها (escape) ثم كتابة ملف zip (docx_writer.py)، بدون python-docx.
+
+إذا لم يوجد ملف مُترجم، أو تغير القالب أو الكود أو الإعدادات، أو لم يمكن تمثيل قيمة
+بدقة (متغير غائب، قيمة خلية فارغة، محارف غير صالحة في XML): يعود render() بـ None
+ويستخدم السكربت المسار العادي عبر python-docx.
+
+الاستخدام:
+    python scripts/fill_candidate_follow_up_card.py --input "resources/templates/بطاقة المتابعة للمترشح.docx" --compile
+    python scripts/fill_traffic_law_lessons_card.py --input "resources/templates/بطاقة خاصة بدروس قانون المرور .docx" --compile
+"""
+from __future__ import annotations
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from docx_writer import copy_package, package_items
+from placeholder_engine import find_placeholders
+from reservation_store import atomic_write_bytes
+from template_cache import file_digest
+
+COMPILED_VERSION = 2
+COMPILED_SUFFIX = '.compiled.json'
+DOCUMENT_PART = 'word/document.xml'
+
+# Private-use code points never found in templates or client data
+SENTINEL_OPEN = '\ue000'
+SENTINEL_CLOSE = '\ue001'
+_SLOT_RE = re.compile(f'{SENTINEL_OPEN}([PC]):(.*?){SENTINEL_CLOSE}'.encode('utf-8'))
+_REGION_RE = re.compile(rb'<!--([SE]):(.*?)-->')
+
+# How lxml escapes element text; applied to every value spliced into the XML
+TEXT_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('\r', '&#13;'))
+# Values lxml would refuse (or that collide with the sentinels): render through python-docx instead
+_UNREPRESENTABLE_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff\ue000\ue001]')
+
+
+class CompileError(Exception):
+    """The template cannot be split into static fragments and fillable slots."""
+
+
+def placeholder_sentinel(key: str) -> str:
+    return f'{SENTINEL_OPEN}P:{key}{SENTINEL_CLOSE}'
+
+
+def cell_sentinel(name: str) -> str:
+    return f'{SENTINEL_OPEN}C:{name}{SENTINEL_CLOSE}'
+
+
+def compiled_path_for(template_path) -> Path:
+    return Path(str(template_path) + COMPILED_SUFFIX)
+
+
+def escape_text(value: str, escapes=TEXT_ESCAPES) -> str:
+    for char, entity in escapes:
+        if char in value:
+            value = value.replace(char, entity)
+    return value
+
+
+def _split_slots(data: bytes) -> List[Any]:
+    """Static bytes and {"key": ...} / {"cell": ...} slots, in document order."""
+    parts: List[Any] = []
+    pos = 0
+    for m in _SLOT_RE.finditer(data):
+        if m.start() > pos:
+            parts.append(data[pos:m.start()].decode('utf-8'))
+        kind, name = m.group(1), m.group(2).decode('utf-8')
+        parts.append({'key': name} if kind == b'P' else {'cell': name})
+        pos = m.end()
+    if pos < len(data):
+        parts.append(data[pos:].decode('utf-8'))
+    return parts
+
+
+def _split_regions(xml: bytes) -> Tuple[List[bytes], List[Tuple[str, bytes]]]:
+    """Outside fragments and (region id, inner bytes) from comment-delimited XML."""
+    pieces = _REGION_RE.split(xml)
+    outside = [pieces[0]]
+    regions = []
+    for i in range(1, len(pieces), 6):
+        start, rid, inner, end, end_rid, after = pieces[i:i + 6]
+        if start != b'S' or end != b'E' or rid != end_rid:
+            raise CompileError(f'Nested or unbalanced fillable region near {rid!r}')
+        regions.append((rid.decode('utf-8'), inner))
+        outside.append(after)
+    return outside, regions
+
+
+# -----------------------------
+# Compilation
+# -----------------------------
+
+def compile_template(template_path, kind: str, layout: Dict[str, Any], sources: Sequence,
+                     prepare: Callable) -> Dict[str, Any]:
+    """Compile a template with the card's own pipeline.
+
+    `prepare(doc, placeholders, fill)` runs the card's data-independent steps on a fresh
+    Document: placeholder replacement with `placeholders`, table fill with cell_sentinel()
+    values when `fill` is true, final formatting. It returns [(region_id, element), ...]:
+    the elements (w:tc / w:tr) whose content differs between filled and empty, with the
+    same ids in both runs. Other package parts the steps change (e.g. a style added to
+    word/styles.xml) must come out the same in both runs and are stored whole.
+    """
+    from docx import Document
+    from docx.opc.oxml import serialize_part_xml
+    from lxml import etree
+
+    template_path = Path(template_path)
+    pristine = package_items(Document(str(template_path)))
+    serialized = {}
+    package_parts = {}
+    tables = 0
+    for fill in (True, False):
+        doc = Document(str(template_path))
+        tables = len(doc.tables)
+        keys = find_placeholders(doc.element)
+        regions = prepare(doc, {key: placeholder_sentinel(key) for key in keys}, fill)
+        items = package_items(doc)
+        if items.keys() != pristine.keys():
+            raise CompileError('The render steps add or remove package parts')
+        package_parts[fill] = {name: blob for name, blob in items.items()
+                               if name != DOCUMENT_PART and blob != pristine[name]}
+        if len({id(el) for _, el in regions}) != len(regions):
+            raise CompileError('Two fillable regions resolve to the same element (merged cells?)')
+        for rid, el in regions:
+            el.insert(0, etree.Comment(f'S:{rid}'))
+            el.append(etree.Comment(f'E:{rid}'))
+        serialized[fill] = _split_regions(serialize_part_xml(doc.element))
+
+    filled_outside, filled_regions = serialized[True]
+    empty_outside, empty_regions = serialized[False]
+    if filled_outside != empty_outside or [r for r, _ in filled_regions] != [r for r, _ in empty_regions]:
+        raise CompileError('Filling the tables changes XML outside the fillable regions')
+    if package_parts[True] != package_parts[False]:
+        raise CompileError('Filling the tables changes package parts other than document.xml')
+
+    parts: List[Any] = _split_slots(filled_outside[0])
+    for (rid, filled), (_, empty), after in zip(filled_regions, empty_regions, filled_outside[1:]):
+        filled_parts = _split_slots(filled)
+        if not any(isinstance(p, dict) and 'cell' in p for p in filled_parts):
+            raise CompileError(f'Region {rid} has no cell value')
+        parts.append({'region': rid, 'filled': filled_parts, 'empty': _split_slots(empty)})
+        parts.extend(_split_slots(after))
+
+    return {
+        'version': COMPILED_VERSION,
+        'kind': kind,
+        'template': template_path.name,
+        'template_sha256': file_digest(template_path),
+        'pipeline': source_digest(sources),
+        'layout': layout,
+        'tables': tables,
+        'escapes': [list(pair) for pair in TEXT_ESCAPES],
+        'parts': parts,
+        'package_parts': {name: blob.decode('utf-8') for name, blob in sorted(package_parts[True].items())},
+    }
+
+
+def write_compiled(template_path, artefact: Dict[str, Any]) -> Path:
+    path = compiled_path_for(template_path)
+    atomic_write_bytes(path, json.dumps(artefact, ensure_ascii=False).encode('utf-8'))
+    return path
+
+
+# -----------------------------
+# Rendering
+# -----------------------------
+
+def _load_parts(parts: List[Any]) -> List[Any]:
+    """Artefact parts -> bytes / ('key', k) / ('cell', c) / ('region', cells, filled, empty)."""
+    loaded: List[Any] = []
+    for part in parts:
+        if isinstance(part, str):
+            loaded.append(part.encode('utf-8'))
+        elif 'key' in part:
+            loaded.append(('key', part['key']))
+        elif 'cell' in part:
+            loaded.append(('cell', part['cell']))
+        else:
+            filled = _load_parts(part['filled'])
+            cells = tuple(p[1] for p in filled if isinstance(p, tuple) and p[0] == 'cell')
+            loaded.append(('region', cells, filled, _load_parts(part['empty'])))
+    return loaded
+
+
+class CompiledTemplate:
+    """A compiled artefact: document.xml as static byte fragments and slots."""
+
+    def __init__(self, template_path: Path, artefact: Dict[str, Any]):
+        self.template_path = template_path
+        self.kind = artefact['kind']
+        self.layout = artefact['layout']
+        self.tables = artefact['tables']
+        self.escapes = tuple(tuple(pair) for pair in artefact['escapes'])
+        self.parts = _load_parts(artefact['parts'])
+        self.package_parts = {name: xml.encode('utf-8') for name, xml in artefact['package_parts'].items()}
+
+    def _emit(self, parts, values: Mapping[str, str], cells: Mapping[str, str], out: List[bytes]) -> bool:
+        for part in parts:
+            if isinstance(part, bytes):
+                out.append(part)
+                continue
+            kind = part[0]
+            if kind == 'region':
+                present = sum(1 for name in part[1] if name in cells)
+                if present == len(part[1]):
+                    branch = part[2]
+                elif present == 0:
+                    branch = part[3]
+                else:
+                    return False
+                if not self._emit(branch, values, cells, out):
+                    return False
+                continue
+            value = values.get(part[1]) if kind == 'key' else cells.get(part[1])
+            # python-docx writes no w:t for an empty cell value
+            if value is None or (kind == 'cell' and not value) or _UNREPRESENTABLE_RE.search(value):
+                return False
+            out.append(escape_text(value, self.escapes).encode('utf-8'))
+        return True
+
+    def render(self, values: Mapping[str, str], cells: Mapping[str, str]) -> Optional[bytes]:
+        """document.xml for these placeholder and cell values, or None to use python-docx."""
+        out: List[bytes] = []
+        if not self._emit(self.parts, values, cells, out):
+            return None
+        return b''.join(out)
+
+    def render_document(self, values: Mapping[str, str], cells: Mapping[str, str]) -> Optional['CompiledDocument']:
+        xml = self.render(values, cells)
+        return None if xml is None else CompiledDocument(self.template_path, xml, self.package_parts)
+
+
+class CompiledDocument:
+    """A rendered package with the same save() entry point as a python-docx Document."""
+
+    def __init__(self, template_path: Path, document_xml: bytes, package_parts: Optional[Mapping[str, bytes]] = None):
+        self.template_path = template_path
+        self.document_xml = document_xml
+        self.package_parts = dict(package_parts or {})
+
+    def save(self, target):
+        """Write the template package with the rendered document.xml (and the compiled
+        package parts) to a path or a binary stream."""
+        copy_package(self.template_path, target, {**self.package_parts, DOCUMENT_PART: self.document_xml})
+
+
+# -----------------------------
+# Artefact loading
+# -----------------------------
+
+_loaded: Dict[str, Tuple[Any, Optional[Dict[str, Any]], Optional[CompiledTemplate]]] = {}
+_digests: Dict[str, Tuple[Any, str]] = {}
+
+
+def _cached_digest(path: Path) -> str:
+    """SHA-256 of a file, recomputed only when its mtime/size changes."""
+    st = path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _digests.get(str(path))
+    if cached is None or cached[0] != key:
+        cached = (key, file_digest(path))
+        _digests[str(path)] = cached
+    return cached[1]
+
+
+def source_digest(paths: Sequence) -> str:
+    """Hash of the code that produced an artefact; any edit invalidates it."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(_cached_digest(Path(path).resolve()).encode('ascii'))
+    return h.hexdigest()
+
+
+def load_compiled(template_path, kind: str, layout: Dict[str, Any], sources: Sequence) -> Optional[CompiledTemplate]:
+    """The template's compiled artefact if it is current for this template, code and layout."""
+    template_path = Path(template_path).resolve()
+    path = compiled_path_for(template_path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _loaded.get(str(path))
+    if cached is None or cached[0] != key:
+        try:
+            artefact = json.loads(path.read_bytes())
+        except ValueError:
+            artefact = None
+        if not isinstance(artefact, dict) or artefact.get('version') != COMPILED_VERSION:
+            artefact = None
+        cached = (key, artefact, None)
+        _loaded[str(path)] = cached
+
+    artefact = cached[1]
+    if (artefact is None or artefact['kind'] != kind or artefact['layout'] != layout
+            or artefact['template_sha256'] != _cached_digest(template_path)
+            or artefact['pipeline'] != source_digest(sources)):
+        return None
+    if cached[2] is None:
+        cached = (key, artefact, CompiledTemplate(template_path, artefact))
+        _loaded[str(path)] = cached
+    return cached[2]
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+كاتب DOCX بدون إعادة ضغط: ينسخ أجزاء القالب غير المعدلة كما هي.
+
+doc.save() في python-docx يعيد تسلسل وضغط كل أجزاء الحزمة (الأنماط، السمة، الخطوط،
+الإعدادات...) مع أن word/document.xml وحده هو الذي يتغير عادة. هنا:
+
+- copy_package(): يقرأ الدليل المركزي لملف zip القالب مرة واحدة (مخزن مؤقتاً حسب
+  mtime/الحجم)، وينسخ البايتات المضغوطة لكل مدخل غير معدل كما هي (الرأس المحلي +
+  البيانات)، ولا يضغط إلا الأجزاء المستبدلة. ترتيب المدخلات وتواريخها من القالب،
+  فالناتج حتمي (نفس المدخلات = نفس البايتات).
+- save_docx(): بديل doc.save() لمستند python-docx مأخوذ من template_cache: يسلسل
+  أجزاء الحزمة كما يفعل python-docx ويقارنها بنسخة القالب الأصلية؛ المتطابق يُنسخ
+  من القالب، والمختلف فقط يُضغط. إذا تغيرت مجموعة الأجزاء (إضافة صورة مثلاً) يعود
+  إلى doc.save().
+- الهدف مسار ملف أو أي كائن يدعم write() (مثل io.BytesIO لمسار العامل/PDF).
+
+ملفات zip64 غير مدعومة للنسخ الخام: تُكتب عبر zipfile كالمعتاد.
+"""
+from __future__ import annotations
+import io
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+CONTENT_TYPES_PART = '[Content_Types].xml'
+
+_LOCAL = struct.Struct('<4s5H3L2H')          # local file header (30 bytes)
+_CENTRAL = struct.Struct('<4s6H3L5H2L')      # central directory record (46 bytes)
+_EOCD = struct.Struct('<4s4H2LH')            # end of central directory (22 bytes)
+_LOCAL_SIG = b'PK\x03\x04'
+_CENTRAL_SIG = b'PK\x01\x02'
+_EOCD_SIG = b'PK\x05\x06'
+_DESCRIPTOR_SIG = b'PK\x07\x08'
+_FLAG_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_OFFSET_FIELD = slice(42, 46)
+_DOS_DATE_1980 = (1 << 5) | 1  # 1980-01-01, for entries the template does not have
+
+
+class _Entry(NamedTuple):
+    name: str
+    central: bytes        # raw central directory record (with name/extra/comment)
+    start: int            # local header offset in the template
+    end: int              # end of data (and data descriptor)
+    flags: int
+    time: int
+    date: int
+    version_made: int
+    internal_attr: int
+    external_attr: int
+
+
+class _Package(NamedTuple):
+    data: bytes
+    entries: List[_Entry]
+    comment: bytes
+
+
+_packages: Dict[str, Tuple[Tuple[int, int], Optional[_Package]]] = {}
+
+
+def _parse_package(data: bytes) -> Optional[_Package]:
+    """Entries of a plain (non-zip64) zip, or None when it cannot be raw-copied."""
+    eocd_at = data.rfind(_EOCD_SIG, max(0, len(data) - 65557))
+    if eocd_at < 0:
+        return None
+    _, disk, cd_disk, n_disk, n_total, cd_size, cd_offset, comment_len = _EOCD.unpack_from(data, eocd_at)
+    if disk or cd_disk or n_disk != n_total or n_total == 0xFFFF or 0xFFFFFFFF in (cd_size, cd_offset):
+        return None
+
+    entries = []
+    pos = cd_offset
+    for _ in range(n_total):
+        (sig, version_made, _, flags, _, time, date, _, csize, _, nlen, elen, clen,
+         _, internal_attr, external_attr, offset) = _CENTRAL.unpack_from(data, pos)
+        if sig != _CENTRAL_SIG or 0xFFFFFFFF in (csize, offset):
+            return None
+        record_end = pos + _CENTRAL.size + nlen + elen + clen
+        raw_name = data[pos + _CENTRAL.size:pos + _CENTRAL.size + nlen]
+        name = raw_name.decode('utf-8' if flags & _FLAG_UTF8 else 'cp437')
+
+        local_nlen, local_elen = struct.unpack_from('<2H', data, offset + 26)
+        end = offset + _LOCAL.size + local_nlen + local_elen + csize
+        if flags & _FLAG_DESCRIPTOR:
+            end += 16 if data[end:end + 4] == _DESCRIPTOR_SIG else 12
+        entries.append(_Entry(name, data[pos:record_end], offset, end, flags, time, date,
+                              version_made, internal_attr, external_attr))
+        pos = record_end
+    return _Package(data, entries, data[eocd_at + _EOCD.size:eocd_at + _EOCD.size + comment_len])
+
+
+def _load_package(path: Path) -> Optional[_Package]:
+    st = path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _packages.get(str(path))
+    if cached is None or cached[0] != key:
+        try:
+            package = _parse_package(path.read_bytes())
+        except struct.error:
+            package = None
+        cached = (key, package)
+        _packages[str(path)] = cached
+    return cached[1]
+
+
+def _deflated_entry(name: str, data: bytes, offset: int, like: Optional[_Entry]) -> Tuple[bytes, bytes]:
+    """(local header + compressed data, central record) for a rewritten entry."""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    crc = zlib.crc32(data)
+    raw_name = name.encode('utf-8')
+    flags = _FLAG_UTF8 if not name.isascii() else 0
+    if like is not None:
+        time, date, version_made, internal_attr, external_attr = (
+            like.time, like.date, like.version_made, like.internal_attr, like.external_attr)
+    else:
+        time, date, version_made, internal_attr, external_attr = 0, _DOS_DATE_1980, 20, 0, 0
+    local = _LOCAL.pack(_LOCAL_SIG, 20, flags, zipfile.ZIP_DEFLATED, time, date,
+                        crc, len(compressed), len(data), len(raw_name), 0) + raw_name
+    central = _CENTRAL.pack(_CENTRAL_SIG, version_made, 20, flags, zipfile.ZIP_DEFLATED, time, date,
+                            crc, len(compressed), len(data), len(raw_name), 0, 0,
+                            0, internal_attr, external_attr, offset) + raw_name
+    return local + compressed, central
+
+
+def package_names(template_path) -> Optional[set]:
+    """Zip entry names of the template (None when it is not a plain zip)."""
+    package = _load_package(Path(template_path))
+    return None if package is None else {entry.name for entry in package.entries}
+
+
+def _write_with_zipfile(template_path: Path, out, replacements: Mapping[str, bytes]):
+    with zipfile.ZipFile(template_path) as src, zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as dst:
+        names = set()
+        for item in src.infolist():
+            names.add(item.filename)
+            data = replacements[item.filename] if item.filename in replacements else src.read(item)
+            dst.writestr(item, data, zipfile.ZIP_DEFLATED)
+        for name, data in replacements.items():
+            if name not in names:
+                dst.writestr(name, data)
+
+
+def _write_package(template_path: Path, out, replacements: Mapping[str, bytes]):
+    package = _load_package(template_path)
+    if package is None:
+        _write_with_zipfile(template_path, out, replacements)
+        return
+
+    data = memoryview(package.data)
+    central: List[bytes] = []
+    offset = 0
+    for entry in package.entries:
+        if entry.name in replacements:
+            chunk, record = _deflated_entry(entry.name, replacements[entry.name], offset, entry)
+        else:
+            chunk = data[entry.start:entry.end]
+            record = entry.central[:_OFFSET_FIELD.start] + struct.pack('<L', offset) + entry.central[_OFFSET_FIELD.stop:]
+        out.write(chunk)
+        central.append(record)
+        offset += len(chunk)
+    existing = {entry.name for entry in package.entries}
+    for name, blob in replacements.items():
+        if name not in existing:
+            chunk, record = _deflated_entry(name, blob, offset, None)
+            out.write(chunk)
+            central.append(record)
+            offset += len(chunk)
+
+    directory = b''.join(central)
+    out.write(directory)
+    out.write(_EOCD.pack(_EOCD_SIG, 0, 0, len(central), len(central), len(directory), offset,
+                         len(package.comment)) + package.comment)
+
+
+def copy_package(template_path, target, replacements: Mapping[str, bytes]):
+    """Write the template package to `target` (path or binary stream) with `replacements`
+    ({zip name: bytes}) swapped in; every other entry is copied without recompressing."""
+    template_path = Path(template_path)
+    if hasattr(target, 'write'):
+        _write_package(template_path, target, replacements)
+        return
+    buffer = io.BytesIO()
+    _write_package(template_path, buffer, replacements)
+    with open(target, 'wb') as f:
+        f.write(buffer.getbuffer())
+
+
+# -----------------------------
+# python-docx documents
+# -----------------------------
+
+def package_items(doc) -> Dict[str, bytes]:
+    """Every zip entry python-docx would write for `doc`, by zip name (see PackageWriter)."""
+    from docx.opc.pkgwriter import _ContentTypesItem
+
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+    items = {
+        CONTENT_TYPES_PART: _ContentTypesItem.from_parts(parts).blob,
+        '_rels/.rels': package.rels.xml,
+    }
+    for part in parts:
+        items[part.partname[1:]] = part.blob
+        if len(part.rels):
+            items[part.partname.rels_uri[1:]] = part.rels.xml
+    return items
+
+
+def save_docx(doc, target, template_path):
+    """doc.save() that copies the parts left unchanged from `template_path` as they are.
+
+    `doc` is a python-docx Document checked out from template_cache (or any object with
+    its own save(), e.g. a compiled render).
+    """
+    if not hasattr(doc, 'part'):
+        doc.save(target)
+        return
+    from template_cache import default_cache
+
+    pristine = default_cache.pristine_items(template_path)
+    current = package_items(doc)
+    names = package_names(template_path)
+    if current.keys() != pristine.keys() or names is None or not names.issuperset(current):
+        # Parts were added or dropped (or the template is zip64): let python-docx write it all
+        doc.save(target)
+        return
+    changed = {name: blob for name, blob in current.items() if blob != pristine[name]}
+    copy_package(template_path, target, changed)
@@ -34,15 +34,39 @@
 - يتم فحص البيانات الواردة للتحقق من حالة اختبار قانون المرور (tests.trafficLawTest.passed)
 - إذا كان الطالب قد اجتاز الاختبار: يتم ملء الجدول النظري (تواريخ فقط) + الجدول العملي (تواريخ + ساعات)
 - إذا لم يجتز الطالب الاختبار بعد: يتم ملء الجدول النظري (تواريخ فقط) وترك الجدول العملي فارغاً
+
+المُولِّد (--renderer):
+- docx (افتراضي): تعبئة قالب Word ثم تحويله إلى PDF عند الطلب (--pdf / --pdf-only)
+- pdf-overlay: رسم البيانات مباشرة على "ملف المتابعة.pdf" (pdf_overlay.py) بدون DOCX ولا تحويل؛
+  جدول الدروس التطبيقية في نموذج PDF يتسع لـ 25 حصة فقط: تُخطَّط وتُحجز 25 ساعة فقط
+  (استخدم --renderer docx لكل الحصص)
+
+المعاينة (--plan-only ثم --commit-plan):
+- --plan-only يطبع سطر PLAN= (JSON): تواريخ الدروس النظرية، بداية الدروس التطبيقية (+7 أيام)، تواريخها
+  والساعات التي سيعطيها التخصيص الآن، بدون توليد ولا حجز
+- --commit-plan يحجز ساعات تلك المعاينة كما هي (ثم تطبع البطاقة نفس الساعات)، أو يفشل مع PLAN_CONFLICTS=
+  إذا حُجزت فتحة منذ المعاينة
+
+نقل أو حذف عميل:
+- --reschedule مع تاريخ بداية جديد يحرر ساعات العميل السابقة ثم يخصص له من جديد (توليد، --plan-only،
+  --commit-plan أو --batch)؛ --release يحرر كل ساعاته فقط ويطبع سطر RELEASED=
+- التحرير يلمس تواريخ العميل فقط (فهرس عكسي للمخزن، انظر reservation_store.py) فلا تبقى ساعاته محجوزة
+
+القياس (render_metrics.py):
+- كل توليد يطبع سطر METRICS= (زمن وذاكرة كل مرحلة) بجانب PDF_PATH=، ومع --metrics-file يُلحق بملف JSONL
+- --profile يشغل التوليد تحت cProfile (و tracemalloc مع --profile-memory)، انظر render_profile.py
 """
 from __future__ import annotations
 import argparse
+import contextlib
+import importlib.util
 import json
+import os
 import sys
 import re
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
 def safe_print(*args, **kwargs):
     """Safe print function that handles Unicode encoding issues on Windows"""
@@ -58,98 +82,46 @@ def safe_print(*args, **kwargs):
                 safe_args.append(str(arg))
         print(*safe_args, **kwargs)
 
-try:
-    from docx import Document
-except ImportError:
+# python-docx / lxml, numpy and the PDF libraries are imported by the modules below on
+# first use, so --help, argument errors and render-cache hits do not load them
+if importlib.util.find_spec('docx') is None:
     print("[ERROR] Need to install python-docx library: pip install python-docx", file=sys.stderr)
     sys.exit(1)
 
-try:
-    from docx2pdf import convert
-except ImportError:
-    convert = None
-
-# Schedule reservations management
+from template_cache import get_document
+
+from reservation_store import open_reservation_store, clean_reservation_formats, is_legacy_hour
+from slot_allocator import FULL_MARKER, SlotAllocator, DateOccupancy
+from schedule_optimizer import plan_cohort, numpy_available
+from working_calendar import configure_holidays, get_calendar, parse_date
+from placeholder_engine import PLACEHOLDER_ALIASES, W_T, expand_aliases, replace_placeholders
+from compiled_template import CompileError, CompiledDocument, cell_sentinel, compile_template, load_compiled, write_compiled
+from docx_writer import save_docx
+from table_fill import table_cells
+from cell_format import CellFormat
+from pdf_backend import DEFAULT_TIMEOUT as PDF_TIMEOUT, PDF_BACKENDS, get_backend
+from pdf_overlay import RENDERERS, TEMPLATES_DIR, OverlayError, render_overlay
+from render_cache import normalise_data, open_render_cache, render_key
+from render_metrics import annotate, recording, stage
+from render_profile import DEFAULT_TOP as PROFILE_TOP, profiling
+
+# Schedule reservations management (backend chosen by file suffix, see reservation_store.py)
 RESERVATIONS_FILE = Path('schedule_reservations.json')
+_reservations_path = None  # --reservations override for the current run
+
+def get_reservation_store():
+    """Reservation backend for this run: --reservations, $HYPERDRIVE_RESERVATIONS or RESERVATIONS_FILE."""
+    return open_reservation_store(_reservations_path or os.environ.get('HYPERDRIVE_RESERVATIONS') or RESERVATIONS_FILE)
 
 def load_reservations():
-    """Load existing hour reservations from JSON file"""
-    if RESERVATIONS_FILE.exists():
-        try:
-            with open(RESERVATIONS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    """Load existing hour reservations (whole store, legacy layout)"""
+    return get_reservation_store().load_all()
 
 def save_reservations(reservations):
-    """Save hour reservations to JSON file with format validation"""
-    try:
-        # Validate and clean all hour formats before saving
-        cleaned_reservations = clean_reservation_formats(reservations)
-        with open(RESERVATIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cleaned_reservations, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"[WARN] Failed to save reservations: {e}")
-
-def clean_reservation_formats(reservations):
-    """Clean all hour formats in reservation data to ensure consistent XX-XX format"""
-    cleaned = {}
-
-    # Clean date-based reservations
-    for key, value in reservations.items():
-        if key == '_client_memory':
-            # Clean client memory
-            cleaned_client_memory = {}
-            for client_id, client_hours in value.items():
-                cleaned_client_hours = {}
-                for date_str, hour_str in client_hours.items():
-                    # Clean Arabic format and generate proper format
-                    if any(pattern in str(hour_str) for pattern in ['من', 'إلى', 'ىلإ', 'الى', ':00', 'h']):
-                        # Extract hour numbers if possible, otherwise use 07-08 as default
-                        import re
-                        hour_match = re.search(r'(\d{2})', str(hour_str))
-                        if hour_match:
-                            hour_num = int(hour_match.group(1))
-                            if 7 <= hour_num <= 16:
-                                clean_hour = f"{hour_num:02d}-{hour_num+1:02d}"
-                            else:
-                                clean_hour = "07-08"  # Default fallback
-                        else:
-                            clean_hour = "07-08"  # Default fallback
-                        cleaned_client_hours[date_str] = clean_hour
-                        safe_print(f"[INFO] 🧹 Cleaned hour format: '{hour_str}' -> '{clean_hour}'")
-                    else:
-                        cleaned_client_hours[date_str] = hour_str
-                cleaned_client_memory[client_id] = cleaned_client_hours
-            cleaned[key] = cleaned_client_memory
-        elif isinstance(value, list):
-            # Clean hour lists for date reservations
-            cleaned_hours = []
-            for hour_str in value:
-                if any(pattern in str(hour_str) for pattern in ['من', 'إلى', 'ىلإ', 'الى', ':00', 'h']):
-                    # Extract hour numbers if possible
-                    import re
-                    hour_match = re.search(r'(\d{2})', str(hour_str))
-                    if hour_match:
-                        hour_num = int(hour_match.group(1))
-                        if 7 <= hour_num <= 16:
-                            clean_hour = f"{hour_num:02d}-{hour_num+1:02d}"
-                        else:
-                            clean_hour = "07-08"  # Default fallback
-                    else:
-                        clean_hour = "07-08"  # Default fallback
-                    cleaned_hours.append(clean_hour)
-                    safe_print(f"[INFO] 🧹 Cleaned reservation hour: '{hour_str}' -> '{clean_hour}'")
-                else:
-                    cleaned_hours.append(hour_str)
-            cleaned[key] = cleaned_hours
-        else:
-            cleaned[key] = value
-
-    return cleaned
+    """Save hour reservations (whole store) with format validation"""
+    get_reservation_store().replace_all(reservations)
 
-def reserve_hours_for_dates(dates: List[str], client_id: str) -> List[str]:
+def reserve_hours_for_dates(dates: List[str], client_id: str, reservations: Dict[str, Any] = None) -> List[str]:
     """Reserve unique hours per date within 07-17 window.
 
     Per-date logic with CLIENT MEMORY (CLEANED FORMAT):
@@ -162,8 +134,15 @@ def reserve_hours_for_dates(dates: List[str], client_id: str) -> List[str]:
     - Different dates reset hour assignment (start from 07-08 again)
 
     If all 10 slots are taken for that day, assign 'FULL' marker.
+
+    When `reservations` is given (batch mode) the allocation is made in that mapping and
+    the caller owns the session; otherwise one store session (transaction) is opened here.
     """
-    reservations = load_reservations()
+    if reservations is None:
+        with get_reservation_store().session() as reservations:
+            return reserve_hours_for_dates(dates, client_id, reservations)
+
+    occupancy = DateOccupancy(SLOT_ALLOCATOR, reservations)
 
     # Check if this client already has hour assignments
     client_memory_key = f'_client_memory'
@@ -171,133 +150,48 @@ def reserve_hours_for_dates(dates: List[str], client_id: str) -> List[str]:
         reservations[client_memory_key] = {}
 
     client_memory = reservations[client_memory_key]
+    stored_hours = client_memory.get(client_id)
 
     # Clean up any old Arabic format entries for this client
-    if client_id in client_memory:
-        stored_hours = client_memory[client_id]
-        cleaned_hours = {}
-
+    if stored_hours is not None:
         for date_str, old_hour in stored_hours.items():
-            # Check if hour is in old Arabic format and needs cleaning
-            if any(pattern in str(old_hour) for pattern in ['من', 'إلى', 'ىلإ', 'الى', ':00', 'h']):
+            if is_legacy_hour(old_hour):
                 # Generate new clean format for this date
-                date_reservations = reservations.get(date_str, [])
-                start_h = WORKING_HOURS['start']
-                end_h = WORKING_HOURS['end']
-
-                # Find first available slot
-                assigned = None
-                for hour in range(start_h, end_h):
-                    slot = WORKING_HOURS['format_template'].format(start=hour, end=hour + 1)
-                    if slot not in date_reservations:
-                        date_reservations.append(slot)
-                        assigned = slot
-                        break
-
-                if assigned is None:
-                    assigned = 'FULL'
-
-                cleaned_hours[date_str] = assigned
-                reservations[date_str] = date_reservations
-                safe_print(f"[INFO] 🧹 Cleaned old hour format for {client_id} on {date_str}: '{old_hour}' -> '{assigned}'")
-            else:
-                # Keep existing clean format
-                cleaned_hours[date_str] = old_hour
-
-        client_memory[client_id] = cleaned_hours
-
-    # If client exists in memory, reuse their hours for matching dates
-    if client_id in client_memory:
-        stored_hours = client_memory[client_id]
-        hours = []
-
-        for date_str in dates:
-            if date_str in stored_hours:
-                # Ensure format is clean before reusing
-                stored_hour = stored_hours[date_str]
-                if any(pattern in str(stored_hour) for pattern in ['من', 'إلى', 'ىلإ', 'الى', ':00', 'h']):
-                    # Regenerate clean format
-                    date_reservations = reservations.get(date_str, [])
-                    start_h = WORKING_HOURS['start']
-                    end_h = WORKING_HOURS['end']
-
-                    assigned = None
-                    for hour in range(start_h, end_h):
-                        slot = WORKING_HOURS['format_template'].format(start=hour, end=hour + 1)
-                        if slot not in date_reservations:
-                            date_reservations.append(slot)
-                            assigned = slot
-                            break
-
-                    if assigned is None:
-                        assigned = 'FULL'
-
-                    hours.append(assigned)
-                    stored_hours[date_str] = assigned
-                    reservations[date_str] = date_reservations
-                    safe_print(f"[INFO] 🧹 Regenerated clean hour for {client_id} on {date_str}: '{assigned}'")
-                else:
-                    # Reuse existing clean hour format
-                    hours.append(stored_hour)
-            else:
-                # New date for existing client - assign next available hour
-                date_reservations = reservations.get(date_str, [])
-                assigned = None
-                start_h = WORKING_HOURS['start']
-                end_h = WORKING_HOURS['end']
-
-                for hour in range(start_h, end_h):
-                    slot = WORKING_HOURS['format_template'].format(start=hour, end=hour + 1)
-                    if slot not in date_reservations:
-                        date_reservations.append(slot)
-                        assigned = slot
-                        break
-
-                if assigned is None:
-                    assigned = 'FULL'
-
-                hours.append(assigned)
-                reservations[date_str] = date_reservations
+                assigned = occupancy.take_first_free(date_str)
                 stored_hours[date_str] = assigned
+                safe_print(f"[INFO] 🧹 Cleaned old hour format for {client_id} on {date_str}: '{old_hour}' -> '{assigned}'")
+    else:
+        # New client - assign hours and store in memory
+        stored_hours = {}
 
-        # Update memory
-        client_memory[client_id] = stored_hours
-        reservations[client_memory_key] = client_memory
-        save_reservations(reservations)
-        return hours
-
-    # New client - assign hours and store in memory
+    # Reuse the client's hours for known dates, first free slot for the others
     hours = []
-    client_hours = {}
-    start_h = WORKING_HOURS['start']
-    end_h = WORKING_HOURS['end']
-
     for date_str in dates:
-        date_reservations = reservations.get(date_str, [])
-        assigned = None
-
-        # Find first available hour slot for this specific date
-        for hour in range(start_h, end_h):
-            slot = WORKING_HOURS['format_template'].format(start=hour, end=hour + 1)
-            if slot not in date_reservations:
-                date_reservations.append(slot)
-                assigned = slot
-                break
-
-        if assigned is None:
-            assigned = 'FULL'
-
-        hours.append(assigned)
-        client_hours[date_str] = assigned
-        reservations[date_str] = date_reservations
+        if date_str in stored_hours:
+            hours.append(stored_hours[date_str])
+        else:
+            assigned = occupancy.take_first_free(date_str)
+            hours.append(assigned)
+            stored_hours[date_str] = assigned
 
     # Store client memory
-    client_memory[client_id] = client_hours
+    client_memory[client_id] = stored_hours
     reservations[client_memory_key] = client_memory
-    save_reservations(reservations)
     return hours
 
-def reserve_consistent_hour_for_dates(dates: List[str], client_id: str) -> List[str]:
+def release_hours(client_id: str, reservations: Dict[str, Any] = None) -> Dict[str, str]:
+    """Free every slot `client_id` holds and forget its hours (deleted, archived or moved clients).
+
+    Returns the released {date: hour}. Only the client's own dates are touched, using the
+    store's reverse index (date, slot) -> client. `reservations` must be a store session view;
+    without it one session is opened here, like reserve_hours_for_dates.
+    """
+    if reservations is None:
+        with get_reservation_store().session() as reservations:
+            return release_hours(client_id, reservations)
+    return reservations.release(client_id)
+
+def reserve_consistent_hour_for_dates(dates: List[str], client_id: str, reservations: Dict[str, Any] = None) -> List[str]:
     """Assign hours based on per-date availability (NEW LOGIC).
 
     Per-date assignment strategy:
@@ -311,7 +205,36 @@ def reserve_consistent_hour_for_dates(dates: List[str], client_id: str) -> List[
     but allows reuse of hours across different dates.
     """
     # Use the per-date logic directly (no global assignments)
-    return reserve_hours_for_dates(dates, client_id)
+    return reserve_hours_for_dates(dates, client_id, reservations)
+
+def plan_cohort_hours(cohort: List[Tuple[str, List[str]]], reservations: Dict[str, Any]) -> List[List[str]]:
+    """Reserve hours for a whole cohort of (client_id, dates) at once.
+
+    Clients already in client memory keep their stored hours (reserve_hours_for_dates);
+    new clients are packed together by schedule_optimizer so that as many as possible
+    keep one fixed hour. Repeated client ids reuse the hours of their first occurrence.
+    """
+    client_memory = reservations.get('_client_memory', {})
+    known = {client_id for client_id, _ in cohort if client_id in client_memory}
+    results: List[Any] = [None] * len(cohort)
+
+    for i, (client_id, dates) in enumerate(cohort):
+        if client_id in known:
+            results[i] = reserve_hours_for_dates(dates, client_id, reservations)
+
+    fresh: Dict[str, int] = {}
+    for i, (client_id, _) in enumerate(cohort):
+        if client_id not in known and client_id not in fresh:
+            fresh[client_id] = i
+    planned = plan_cohort([cohort[i] for i in fresh.values()], reservations, SLOT_ALLOCATOR)
+
+    for i, (client_id, dates) in enumerate(cohort):
+        if results[i] is None:
+            if fresh.get(client_id) == i:
+                results[i] = planned[client_id]
+            else:
+                results[i] = reserve_hours_for_dates(dates, client_id, reservations)
+    return results
 
 # Fixed placeholders for candidate follow-up card
 PLACEHOLDERS = [
@@ -319,14 +242,7 @@ PLACEHOLDERS = [
 ]
 
 # Mapping for misspelled placeholders in template
-PLACEHOLDER_MAPPING = {
-    'birtDate': 'birthDate',
-    'birtPlace': 'birthPlace',
-    'poneNumber': 'phoneNumber',
-    'scoolSubmissionDate': 'schoolSubmissionDate'
-}
-
-WEEKEND_DAYS = {4, 5}  # الجمعة=4, السبت=5
+PLACEHOLDER_MAPPING = PLACEHOLDER_ALIASES
 
 # Tables configuration based on analysis
 TABLES_CONFIG = {
@@ -336,6 +252,29 @@ TABLES_CONFIG = {
     'lessons_table2': {'index': 3, 'rows': 30, 'dates_and_hours': True, 'start_row': 2, 'date_col': 1, 'hour_col': 2}  # Practical lessons - dates + hours - only if traffic law passed
 }
 
+# Where --renderer pdf-overlay draws on "ملف المتابعة.pdf" (points from the bottom-left, see pdf_overlay.py).
+# Page 2 holds the theory table (right, 30 rows) and the practical table (left, 25 rows).
+PDF_OVERLAY_TEMPLATE = TEMPLATES_DIR / 'ملف المتابعة.pdf'
+PDF_OVERLAY_LAYOUT = {
+    'font': 'Amiri-Regular.ttf', 'size': 10, 'bold': True,
+    'fields': [
+        {'text': '{fullName}', 'page': 0, 'x': 228, 'y': 408.6, 'width': 190},
+        {'text': '{birthDate} - {birthPlace}', 'page': 0, 'x': 202, 'y': 393.7, 'width': 170},
+        {'text': '{address}', 'page': 0, 'x': 210, 'y': 369.3, 'width': 240},
+        {'text': '{phoneNumber}', 'page': 0, 'x': 199, 'y': 344.5, 'width': 240},
+        {'text': '{schoolSubmissionDate}', 'page': 0, 'x': 221, 'y': 319.8, 'width': 88},
+    ],
+    'tables': {
+        'lessons_table1': {'page': 1, 'first_y': 533.3, 'pitch': 12.96, 'rows': 30, 'size': 9, 'width': 58,
+                           'columns': {'date': 288.65}},
+        'lessons_table2': {'page': 1, 'first_y': 531.8, 'pitch': 14.025, 'rows': 25, 'size': 9, 'width': 48,
+                           'columns': {'date': 87.75, 'hour': 131.55}},
+    },
+}
+
+# Look of the filled date/hour cells: Arial 10 bold, centred, no spacing, zero cell margins
+LESSON_CELL = CellFormat('LessonCell', 'Lesson Cell', font='Arial', size_pt=10, bold=True)
+
 # Working hours configuration
 WORKING_HOURS = {
     'start': 7,   # 07:00
@@ -343,7 +282,10 @@ WORKING_HOURS = {
     'format_template': '{start:02d}-{end:02d}'
 }
 
-def parse_args():
+# Bitmask slot allocator over the working hours window
+SLOT_ALLOCATOR = SlotAllocator.from_working_hours(WORKING_HOURS)
+
+def parse_args(argv=None):
     p = argparse.ArgumentParser(description='Fill Candidate Follow-up Card (Arabic).')
     p.add_argument('--input', default='resources/templates/بطاقة المتابعة للمترشح.docx', help='ملف Word المصدر.')
     p.add_argument('--output', help='ملف الإخراج (مطلوب).')
@@ -351,6 +293,8 @@ def parse_args():
     p.add_argument('--client-data', dest='client_data', help='بيانات العميل كـ JSON string.')
     p.add_argument('--data', dest='data_path', help='ملف JSON للبيانات العامة.')
     p.add_argument('--client-id', dest='client_id', help='معرف العميل الفريد لتجنب تعارض الساعات.')
+    p.add_argument('--reservations', help='مخزن الحجوزات: ملف JSON أو قاعدة SQLite (.db). افتراضي schedule_reservations.json.')
+    p.add_argument('--holidays', help='ملف JSON للعطل الرسمية (لا تُحجز فيها دروس). افتراضي holidays.json إن وجد.')
 
     # Manual field overrides
     for ph in PLACEHOLDERS:
@@ -364,21 +308,99 @@ def parse_args():
     # PDF options
     p.add_argument('--pdf', action='store_true', help='إنشاء نسخة PDF بالإضافة إلى DOCX.')
     p.add_argument('--pdf-only', action='store_true', help='إنشاء PDF فقط وحذف DOCX.')
+    p.add_argument('--pdf-backend', choices=PDF_BACKENDS, default='auto',
+                   help='محرك التحويل إلى PDF: docx2pdf (Word) أو libreoffice (soffice بدون واجهة). افتراضي auto.')
+    p.add_argument('--pdf-timeout', type=float, default=PDF_TIMEOUT, help='مهلة تحويل الملف الواحد إلى PDF بالثواني.')
+    p.add_argument('--renderer', choices=RENDERERS, default='docx',
+                   help='docx: تعبئة قالب Word (ثم التحويل مع --pdf)؛ pdf-overlay: رسم البيانات مباشرة على قالب PDF بدون تحويل.')
+    p.add_argument('--pdf-template', default=str(PDF_OVERLAY_TEMPLATE), help='قالب PDF لـ --renderer pdf-overlay.')
+
+    # Render cache (render_cache.py)
+    p.add_argument('--no-cache', action='store_true', help='تجاهل ذاكرة الملفات المولَّدة (توليد كامل بدون قراءة أو تخزين).')
+    p.add_argument('--cache-dir', help='مجلد ذاكرة الملفات المولَّدة (افتراضي RENDER_CACHE_DIR أو .render_cache).')
+
+    # Per-stage metrics and profiling (render_metrics.py, render_profile.py)
+    p.add_argument('--metrics-file', help='ملف JSONL يُلحق به سجل METRICS لكل توليد (افتراضي HYPERDRIVE_METRICS_FILE).')
+    p.add_argument('--profile', nargs='?', const='', metavar='PSTATS',
+                   help='تشغيل التوليد تحت cProfile وكتابة ملف .pstats وملخص نصي (افتراضي بجانب ملف الإخراج).')
+    p.add_argument('--profile-top', type=int, default=PROFILE_TOP, help='عدد الدوال في ملخص --profile.')
+    p.add_argument('--profile-memory', action='store_true',
+                   help='لقطات tracemalloc بين تحميل القالب والحفظ (أبطأ بكثير)، مع --profile.')
+
+    # Batch mode
+    p.add_argument('--batch', help='ملف JSON (مصفوفة) أو JSONL لسجلات عملاء خام؛ --output يصبح مجلد الإخراج.')
+    p.add_argument('--workers', type=int, default=None, help='عدد العمليات المتوازية لتوليد DOCX في وضع --batch (افتراضي عدد الأنوية).')
+    p.add_argument('--manifest', help='مسار ملف manifest لوضع --batch (افتراضي OUTPUT/manifest.json).')
+    p.add_argument('--allocator', choices=['cohort', 'greedy'], default='cohort',
+                   help='تخصيص الساعات في وضع --batch: cohort يخطط الدفعة كاملة (NumPy) لساعة ثابتة لأكبر عدد، greedy عميلاً بعد عميل.')
+
+    # Schedule preview
+    p.add_argument('--plan-only', action='store_true',
+                   help='معاينة: تواريخ الدروس والساعات التي سيعطيها التخصيص كسطر PLAN= (JSON) بدون توليد ولا حجز.')
+    p.add_argument('--commit-plan', metavar='PLAN',
+                   help='حجز ساعات معاينة --plan-only كما هي (ملف JSON أو نص JSON)؛ يفشل إذا حُجزت فتحة منذ المعاينة.')
+
+    # Moving or removing a client
+    p.add_argument('--reschedule', action='store_true',
+                   help='تحرير ساعات العميل السابقة قبل التخصيص (تاريخ بداية جديد)؛ مع التوليد و --plan-only و --commit-plan و --batch.')
+    p.add_argument('--release', action='store_true',
+                   help='تحرير كل ساعات --client-id (عميل محذوف أو مؤرشف) ونسيانها ثم الخروج؛ يطبع سطر RELEASED=.')
 
     # Debug
     p.add_argument('--placeholders', action='store_true', help='اطبع قائمة الـ placeholders المتاحة ثم اخرج.')
+    p.add_argument('--compile', action='store_true',
+                   help='ترجمة القالب مسبقاً إلى <input>.compiled.json (توليد أسرع بدون python-docx) ثم الخروج.')
 
-    args = p.parse_args()
+    args = p.parse_args(argv)
 
     # Validation
-    if not args.placeholders:
-        if not args.output:
+    if (args.release or (args.reschedule and not args.batch and not args.commit_plan)) and not args.client_id:
+        p.error('--release and --reschedule need --client-id')
+    if not args.placeholders and not args.compile and not args.commit_plan and not args.release:
+        if not args.output and not args.plan_only:
             p.error('--output is required')
-        if not args.start_date:
+        if not args.start_date and not args.batch:
             p.error('--start-date is required')
 
     return args
 
+def client_record_to_placeholders(loaded: Dict[str, Any]) -> Tuple[Dict[str, str], bool]:
+    """Convert a raw client record (first_name_ar, birth_date, tests...) to placeholder values.
+
+    Returns (placeholders, traffic_law_passed)."""
+    tests = loaded.get('tests', {})
+    traffic_law_test = tests.get('trafficLawTest', {})
+    traffic_law_passed = traffic_law_test.get('passed', False)
+
+    client_data = {
+        'category': 'B',  # Changed to English B as requested
+        'fullName': f"{loaded.get('first_name_ar', '')} {loaded.get('last_name_ar', '')}".strip(),
+        'birthDate': convert_date_to_dd_mm_yyyy(loaded.get('birth_date', '')),
+        'birthPlace': f"{loaded.get('birth_municipality', '')} {loaded.get('birth_state', '')}".strip(),
+        'address': ' '.join(filter(None, [
+            loaded.get('current_address', ''),
+            loaded.get('current_municipality', ''),
+            loaded.get('current_state', '')
+        ])),
+        'phoneNumber': loaded.get('phone_number', ''),
+        'schoolSubmissionDate': convert_date_to_dd_mm_yyyy(loaded.get('register_date', '')),
+        'vers': str(loaded.get('subPrice', '6000'))  # New placeholder for subPrice
+    }
+    return client_data, traffic_law_passed
+
+def default_placeholders() -> Dict[str, str]:
+    """Fallback values for placeholders missing from the client data."""
+    return {
+        'category': 'B',  # Changed to English B
+        'fullName': 'اسم المترشح',
+        'birthDate': '01/01/1990',
+        'birthPlace': 'المدينة',
+        'address': 'العنوان',
+        'phoneNumber': '0000000000',
+        'schoolSubmissionDate': datetime.now().strftime('%d/%m/%Y'),
+        'vers': '6000'  # Default subPrice
+    }
+
 def load_client_data(args) -> Tuple[Dict[str, str], bool]:
     """Load client data from various sources with proper priority. Returns (data, traffic_law_passed)"""
     data: Dict[str, str] = {}
@@ -393,26 +415,8 @@ def load_client_data(args) -> Tuple[Dict[str, str], bool]:
                 # Check if this looks like raw client data or processed placeholders
                 if 'first_name_ar' in loaded or 'last_name_ar' in loaded:
                     # Raw client data format - convert to placeholders
-                    client_data = {
-                        'category': 'B',
-                        'fullName': f"{loaded.get('first_name_ar', '')} {loaded.get('last_name_ar', '')}".strip(),
-                        'birthDate': convert_date_to_dd_mm_yyyy(loaded.get('birth_date', '')),
-                        'birthPlace': f"{loaded.get('birth_municipality', '')} {loaded.get('birth_state', '')}".strip(),
-                        'address': ' '.join(filter(None, [
-                            loaded.get('current_address', ''),
-                            loaded.get('current_municipality', ''),
-                            loaded.get('current_state', '')
-                        ])),
-                        'phoneNumber': loaded.get('phone_number', ''),
-                        'schoolSubmissionDate': convert_date_to_dd_mm_yyyy(loaded.get('register_date', '')),
-                        'vers': str(loaded.get('subPrice', '6000'))
-                    }
+                    client_data, traffic_law_passed = client_record_to_placeholders(loaded)
                     data.update(client_data)
-
-                    # Check traffic law test status from raw client data
-                    tests = loaded.get('tests', {})
-                    traffic_law_test = tests.get('trafficLawTest', {})
-                    traffic_law_passed = traffic_law_test.get('passed', False)
                 else:
                     # Already processed placeholder data
                     data.update({k: str(v) for k, v in loaded.items()})
@@ -425,9 +429,7 @@ def load_client_data(args) -> Tuple[Dict[str, str], bool]:
             loaded = json.loads(args.client_data)
             if isinstance(loaded, dict):
                 # INFO: Check traffic law test status for smart date calculation
-                tests = loaded.get('tests', {})
-                traffic_law_test = tests.get('trafficLawTest', {})
-                traffic_law_passed = traffic_law_test.get('passed', False)
+                client_data, traffic_law_passed = client_record_to_placeholders(loaded)
 
                 if traffic_law_passed:
                     safe_print(f"[INFO] ✅ Traffic law test passed - using smart date calculation for: {loaded.get('first_name_ar', '')} {loaded.get('last_name_ar', '')}")
@@ -435,20 +437,6 @@ def load_client_data(args) -> Tuple[Dict[str, str], bool]:
                     safe_print(f"[INFO] ⏳ Traffic law test not yet passed - generating template with empty practical lessons for: {loaded.get('first_name_ar', '')} {loaded.get('last_name_ar', '')}")
 
                 # Convert client data format to placeholders format
-                client_data = {
-                    'category': 'B',  # Changed to English B as requested
-                    'fullName': f"{loaded.get('first_name_ar', '')} {loaded.get('last_name_ar', '')}".strip(),
-                    'birthDate': convert_date_to_dd_mm_yyyy(loaded.get('birth_date', '')),
-                    'birthPlace': f"{loaded.get('birth_municipality', '')} {loaded.get('birth_state', '')}".strip(),
-                    'address': ' '.join(filter(None, [
-                        loaded.get('current_address', ''),
-                        loaded.get('current_municipality', ''),
-                        loaded.get('current_state', '')
-                    ])),
-                    'phoneNumber': loaded.get('phone_number', ''),
-                    'schoolSubmissionDate': convert_date_to_dd_mm_yyyy(loaded.get('register_date', '')),
-                    'vers': str(loaded.get('subPrice', '6000'))  # New placeholder for subPrice
-                }
                 data.update(client_data)
         except Exception as e:
             print(f"[WARN] Failed to read client-data JSON: {e}")
@@ -460,49 +448,26 @@ def load_client_data(args) -> Tuple[Dict[str, str], bool]:
             data[ph] = val
 
     # 4. Default values as fallback
-    defaults = {
-        'category': 'B',  # Changed to English B
-        'fullName': 'اسم المترشح',
-        'birthDate': '01/01/1990',
-        'birthPlace': 'المدينة',
-        'address': 'العنوان',
-        'phoneNumber': '0000000000',
-        'schoolSubmissionDate': datetime.now().strftime('%d/%m/%Y'),
-        'vers': '6000'  # Default subPrice
-    }
-
-    for k, v in defaults.items():
+    for k, v in default_placeholders().items():
         data.setdefault(k, v)
 
     return data, traffic_law_passed
 
-def generate_dates(start_date_str: str, count: int, out_format: str) -> List[str]:
-    """Generate dates skipping weekends (same logic as traffic law lessons)"""
-    # Try multiple date formats to be flexible
-    date_formats = ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d']
-    current = None
-
-    for fmt in date_formats:
-        try:
-            current = datetime.strptime(start_date_str, fmt).date()
-            break
-        except ValueError:
-            continue
+# Accepted --start-date formats, in the order they are tried
+START_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d')
 
+def parse_start_date(start_date_str: str):
+    """Parse --start-date (flexible formats) to a date."""
+    current = parse_date(start_date_str, START_DATE_FORMATS)
     if current is None:
         raise ValueError('تنسيق start-date يجب أن يكون YYYY-MM-DD أو MM/DD/YYYY أو DD/MM/YYYY')
+    return current
 
-    dates: List[str] = []
-    while len(dates) < count:
-        # Skip weekends (Friday=4, Saturday=5)
-        if current.weekday() not in WEEKEND_DAYS:
-            try:
-                dates.append(current.strftime(out_format))
-            except Exception:
-                # Fallback safe format
-                dates.append(current.strftime('%d/%m/%Y'))
-        current += timedelta(days=1)
-    return dates
+def generate_dates(start_date_str: str, count: int, out_format: str) -> List[str]:
+    """Generate dates skipping weekends and holidays (shared working-day calendar)"""
+    calendar = get_calendar()
+    days = calendar.working_days(parse_start_date(start_date_str), count)
+    return calendar.format_days(days, out_format, fallback='%d/%m/%Y')
 
 def convert_date_to_dd_mm_yyyy(date_str: str) -> str:
     """Convert any date format to DD/MM/YYYY for consistent display"""
@@ -523,7 +488,7 @@ def convert_date_to_dd_mm_yyyy(date_str: str) -> str:
     # If no format worked, return original
     return date_str
 
-def generate_hour_schedule(count: int, dates: List[str], client_id: str = None) -> List[str]:
+def generate_hour_schedule(count: int, dates: List[str], client_id: str = None, reservations: Dict[str, Any] = None) -> List[str]:
     """Generate hour schedule within 07-17 window.
 
     With client_id -> ALL lessons get the SAME hour slot (consistent per client).
@@ -531,7 +496,7 @@ def generate_hour_schedule(count: int, dates: List[str], client_id: str = None)
     """
     if client_id:
         # Get consistent hour assignment - SAME hour for ALL lessons
-        consistent = reserve_consistent_hour_for_dates(dates[:count], client_id)
+        consistent = reserve_consistent_hour_for_dates(dates[:count], client_id, reservations)
         return consistent
 
     # Fallback: without client_id, cycle hours per lesson
@@ -545,117 +510,12 @@ def generate_hour_schedule(count: int, dates: List[str], client_id: str = None)
     return hours
 
 def replace_paragraph_placeholders(doc, data: Dict[str, str]):
-    """Replace placeholders in paragraphs, tables, and XML elements (with mapping for misspelled placeholders)"""
-    # Create extended data with misspelled placeholder mapping
-    extended_data = data.copy()
-    for misspelled, correct in PLACEHOLDER_MAPPING.items():
-        if correct in data:
-            extended_data[misspelled] = data[correct]
-
-    # Replace in paragraphs
-    for para in doc.paragraphs:
-        if '{{' in para.text:
-            original = para.text
-            new_text = original
-
-            # Use flexible regex to find placeholders even if malformed
-            placeholders_in_text = re.findall(r'{{(\w+)\}?\}?', original)
-
-            for key in placeholders_in_text:
-                if key in extended_data:
-                    value = extended_data.get(key, '')
-                    # Try different placeholder patterns
-                    patterns = [
-                        '{{' + key + '}}',    # {{key}}
-                        '{{' + key + '}',     # {{key}
-                        '{{' + key + '}}}',   # {{key}}}
-                    ]
-                    replaced = False
-                    for pattern in patterns:
-                        if pattern in new_text:
-                            new_text = new_text.replace(pattern, value)
-                            replaced = True
-                            break
-
-                    if not replaced:
-                        # Last attempt with regex
-                        pattern = '{{' + key + r'\}?\}?'
-                        new_text = re.sub(pattern, value, new_text)
-
-            if new_text != original:
-                para.clear()
-                para.add_run(new_text)
-
-    # Replace in tables (personal info table contains placeholders)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    if '{{' in para.text:
-                        original = para.text
-                        new_text = original
-
-                        placeholders_in_text = re.findall(r'{{(\w+)\}?\}?', original)
-
-                        for key in placeholders_in_text:
-                            if key in extended_data:
-                                value = extended_data.get(key, '')
-                                patterns = [
-                                    '{{' + key + '}}',
-                                    '{{' + key + '}',
-                                    '{{' + key + '}}}',
-                                ]
-                                replaced = False
-                                for pattern in patterns:
-                                    if pattern in new_text:
-                                        new_text = new_text.replace(pattern, value)
-                                        replaced = True
-                                        break
-
-                                if not replaced:
-                                    pattern = '{{' + key + r'\}?\}?'
-                                    new_text = re.sub(pattern, value, new_text)
-
-                        if new_text != original:
-                            para.clear()
-                            para.add_run(new_text)
-
-    # Replace hardcoded time format patterns throughout the document
+    """Replace placeholders in paragraphs, tables and text boxes (aliases for misspelled placeholders), keeping run formatting"""
+    # Replace hardcoded time format patterns throughout the template first (never in client values)
     clean_hour_formats_in_document(doc)
 
-    # Replace in XML elements using simple iteration
-    try:
-        # Find all text elements in the document
-        for elem in doc._element.iter():
-            if hasattr(elem, 'text') and elem.text and '{{' in elem.text:
-                try:
-                    original_text = elem.text
-                    new_text = original_text
-
-                    placeholders_in_text = re.findall(r'{{(\w+)\}?\}?', original_text)
-                    for key in placeholders_in_text:
-                        if key in extended_data:
-                            value = extended_data.get(key, '')
-                            patterns = [
-                                '{{' + key + '}}',
-                                '{{' + key + '}',
-                                '{{' + key + '}}}',
-                            ]
-                            for pattern in patterns:
-                                if pattern in new_text:
-                                    new_text = new_text.replace(pattern, value)
-                                    break
-
-                    if new_text != original_text:
-                        # Try to set the text, skip if readonly
-                        elem.text = new_text
-                        safe_print(f"[INFO] XML replacement: '{original_text}' -> '{new_text}'")
-                except:
-                    # Skip readonly elements
-                    pass
-
-    except Exception as e:
-        print(f"[WARN] Failed to process XML elements: {e}")
+    replaced = replace_placeholders(doc.element, data, PLACEHOLDER_MAPPING)
+    safe_print(f"[INFO] Replaced {replaced} placeholders")
 
 def clean_hour_formats_in_document(doc):
     """Remove hardcoded hour format patterns from the document - SMART CLEANING
@@ -677,22 +537,22 @@ def clean_hour_formats_in_document(doc):
     if len(doc.tables) > 2:
         for table_idx in [2, 3]:  # Table 2 and Table 3
             if table_idx < len(doc.tables):
-                table = doc.tables[table_idx]
+                cells = table_cells(doc, table_idx)
                 safe_print(f"[INFO] 🧹 Smart cleaning of hardcoded Arabic patterns in Table {table_idx}")
 
-                for row_idx, row in enumerate(table.rows):
-                    if row_idx >= 2:  # Skip header rows
-                        for cell_idx, cell in enumerate(row.cells):
-                            if cell_idx == 2:  # Hour column (index 2)
-                                original = cell.text.strip()
-                                if original:
-                                    # Only clean if it matches hardcoded Arabic patterns
-                                    has_arabic_pattern = any(re.search(pattern, original) for pattern in hour_patterns)
-                                    if has_arabic_pattern:
-                                        # Completely clear the cell content and all formatting
-                                        cell._element.clear_content()
-                                        total_cleaned += 1
-                                        safe_print(f"[INFO] 🧹 CLEARED hardcoded pattern in Table {table_idx}, Row {row_idx}, Cell {cell_idx}: '{original}' -> EMPTY")
+                cell_idx = 2  # Hour column (index 2)
+                for row_idx in range(2, len(cells)):  # Skip header rows
+                    if cell_idx < cells.width(row_idx):
+                        cell = cells.cell(row_idx, cell_idx)
+                        original = cell.text.strip()
+                        if original:
+                            # Only clean if it matches hardcoded Arabic patterns
+                            has_arabic_pattern = any(re.search(pattern, original) for pattern in hour_patterns)
+                            if has_arabic_pattern:
+                                # Completely clear the cell content and all formatting
+                                cell._element.clear_content()
+                                total_cleaned += 1
+                                safe_print(f"[INFO] 🧹 CLEARED hardcoded pattern in Table {table_idx}, Row {row_idx}, Cell {cell_idx}: '{original}' -> EMPTY")
 
     # Also clean header cells that might have Arabic text
     # Clean "الساعة" (hour) to "العة" as seen in debug output
@@ -700,10 +560,10 @@ def clean_hour_formats_in_document(doc):
         (r'الساعة', 'العة'),  # Clean Arabic "hour" header
     ]
 
-    # Clean XML elements - more targeted approach for headers
+    # Clean text nodes - more targeted approach for headers
     try:
-        for elem in doc._element.iter():
-            if hasattr(elem, 'text') and elem.text:
+        for elem in doc.element.iter(W_T):
+            if elem.text and any(pattern in elem.text for pattern, _ in arabic_header_patterns):
                 original_text = elem.text
                 new_text = original_text
 
@@ -732,117 +592,101 @@ def clean_text(text: str) -> str:
     return re.sub(r'\s+', ' ', text.strip())
 
 def format_cell(cell, value: str):
-    """Apply compact formatting: Arial size 12, bold, center aligned, completely replace cell content."""
-    from docx.shared import Pt
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_ALIGN_VERTICAL
-    from docx.oxml import OxmlElement
-    from docx.oxml.ns import qn
-
+    """Replace the cell content with the cleaned value in the LessonCell style (see cell_format.py)."""
     cleaned = clean_text(value)
-
-    # COMPLETELY clear the cell - remove all paragraphs
-    cell._element.clear_content()
-
-    # Add a fresh paragraph
-    para = cell.add_paragraph()
-    run = para.add_run(cleaned)
-
-    # Set paragraph alignment
-    para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Set paragraph formatting
-    if para.paragraph_format is not None:
-        pf = para.paragraph_format
-        pf.space_before = Pt(0)
-        pf.space_after = Pt(0)
-        pf.line_spacing = 1
-
-    # Set run formatting
-    run.font.name = 'Arial'
-    run.font.size = Pt(12)
-    run.font.bold = True
-
-    # Set cell vertical alignment
-    try:
-        cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-        tcPr = cell._tc.get_or_add_tcPr()
-        # Remove existing margins
-        for child in list(tcPr):
-            if child.tag.endswith('tcMar'):
-                tcPr.remove(child)
-        tcMar = OxmlElement('w:tcMar')
-        for side in ['top', 'start', 'bottom', 'end']:
-            side_el = OxmlElement(f'w:{side}')
-            side_el.set(qn('w:w'), '0')
-            side_el.set(qn('w:type'), 'dxa')
-            tcMar.append(side_el)
-        tcPr.append(tcMar)
-    except Exception:
-        pass
-
+    LESSON_CELL.apply(cell._tc, cleaned)
     return cleaned
 
-def fill_table_dates_only(table, dates: List[str], start_row: int, date_col: int):
-    """Fill table with dates only (for 30 lessons table)"""
+def fill_table_dates_only(cells, dates: List[str], start_row: int, date_col: int):
+    """Fill table with dates only (for 30 lessons table); `cells` is a table_fill.TableCells"""
     filled_count = 0
     for i, date_str in enumerate(dates):
         row_idx = start_row + i
-        if row_idx >= len(table.rows):
+        if row_idx >= len(cells):
             break
 
-        row = table.rows[row_idx]
-        if date_col >= len(row.cells):
+        if date_col >= cells.width(row_idx):
             break
 
         # Compact format date cell
-        date_cell = row.cells[date_col]
-        format_cell(date_cell, date_str)
+        format_cell(cells.cell(row_idx, date_col), date_str)
 
         filled_count += 1
 
     return filled_count
 
-def fill_table_dates_and_hours(table, dates: List[str], hours: List[str], start_row: int, date_col: int, hour_col: int):
-    """Fill table with dates and hours (for 30 lessons table)"""
+def fill_table_dates_and_hours(cells, dates: List[str], hours: List[str], start_row: int, date_col: int, hour_col: int):
+    """Fill table with dates and hours (for 30 lessons table); `cells` is a table_fill.TableCells"""
     filled_count = 0
     for i in range(min(len(dates), len(hours))):
         row_idx = start_row + i
-        if row_idx >= len(table.rows):
+        if row_idx >= len(cells):
             break
 
-        row = table.rows[row_idx]
-        if date_col >= len(row.cells) or hour_col >= len(row.cells):
+        width = cells.width(row_idx)
+        if date_col >= width or hour_col >= width:
             break
 
         # Compact format date and hour cells
-        date_cell = row.cells[date_col]
-        format_cell(date_cell, dates[i])
-
-        hour_cell = row.cells[hour_col]
-        format_cell(hour_cell, hours[i])
+        format_cell(cells.cell(row_idx, date_col), dates[i])
+        format_cell(cells.cell(row_idx, hour_col), hours[i])
 
         filled_count += 1
 
     return filled_count
 
-def fill_candidate_tables(doc, start_date_str: str, table1_count: int, table2_count: int, date_format: str, client_id: str = None, traffic_law_passed: bool = False):
-    """Fill the candidate follow-up card tables based on discovered structure
+def plan_lesson_days(starts: List[Any], table1_count: int, table2_count: int, traffic_law_passed: bool = True) -> List[Tuple[List[Any], List[Any]]]:
+    """Working days of both lesson tables for each start date: [(table1_days, table2_days), ...].
 
-    Table 2 (Theory lessons): Always filled with DATES ONLY (no hours)
-    Table 3 (Practical lessons): Only filled with DATES + HOURS if traffic law test passed
+    Table 2 starts 7 calendar days after the last table 1 day. Several starts are
+    computed together (numpy busday path) for batch planning.
     """
-    results = {}
+    calendar = get_calendar()
+    table1 = calendar.working_days_many(starts, table1_count)
+    if not traffic_law_passed:
+        return [(days, None) for days in table1]
+    table2 = calendar.working_days_many([days[-1] + timedelta(days=7) for days in table1], table2_count)
+    return list(zip(table1, table2))
+
+def plan_candidate_tables(start_date_str: str, table1_count: int, table2_count: int, date_format: str, client_id: str = None, traffic_law_passed: bool = False, reservations: Dict[str, Any] = None, reserve_hours: bool = True, lesson_days=None) -> Dict[str, Any]:
+    """Compute the lesson dates (and reserved hours) for both tables without touching a document.
+
+    Returns {'table1_dates': [...], 'table2_dates': [...] | None, 'table2_hours': [...] | None}.
+    Hours are only reserved when the traffic law test has been passed; with
+    reserve_hours=False table2_hours stays None for the caller to fill (cohort planning).
+    `lesson_days` takes precomputed (table1_days, table2_days) from plan_lesson_days.
+    """
+    calendar = get_calendar()
+    with stage('dates'):
+        if lesson_days is None:
+            lesson_days = plan_lesson_days([parse_start_date(start_date_str)], table1_count, table2_count, traffic_law_passed)[0]
+        table1_days, table2_days = lesson_days
+
+        # Table 1 (theory lessons - always filled, dates only)
+        table1_dates = calendar.format_days(table1_days, date_format, fallback='%d/%m/%Y')
+        plan = {'table1_dates': table1_dates, 'table2_dates': None, 'table2_hours': None}
+
+        # Table 2 starts 7 days after the last table 1 date (kept as a date, no re-parsing)
+        if traffic_law_passed:
+            plan['table2_dates'] = calendar.format_days(table2_days, date_format, fallback='%d/%m/%Y')
+
+    # Generate smart hours for table 2 using reservation system
+    if traffic_law_passed and reserve_hours:
+        with stage('reservations'):
+            plan['table2_hours'] = generate_hour_schedule(table2_count, plan['table2_dates'], client_id, reservations)
+
+    return plan
 
-    # Generate dates for table 1 (theory lessons - always filled, dates only)
-    table1_dates = generate_dates(start_date_str, table1_count, date_format)
+def apply_candidate_tables(doc, plan: Dict[str, Any], table1_count: int, table2_count: int, traffic_law_passed: bool = False) -> Dict[str, str]:
+    """Write a plan from plan_candidate_tables into the document tables."""
+    results = {}
+    LESSON_CELL.ensure_style(doc)
 
     # Fill Table 2 (lessons_table1) - theory lessons with DATES ONLY (always filled)
     config_table1 = TABLES_CONFIG['lessons_table1']
     if config_table1['index'] < len(doc.tables):
-        table1 = doc.tables[config_table1['index']]
         filled_table1 = fill_table_dates_only(
-            table1, table1_dates,
+            table_cells(doc, config_table1['index']), plan['table1_dates'],
             config_table1['start_row'], config_table1['date_col']
         )
         results['table1'] = f"Filled {filled_table1} theory lesson date rows of {table1_count}"
@@ -854,35 +698,8 @@ def fill_candidate_tables(doc, start_date_str: str, table1_count: int, table2_co
     # Only fill if traffic law test has been passed
     config_table2 = TABLES_CONFIG['lessons_table2']
     if traffic_law_passed and config_table2['index'] < len(doc.tables):
-        # Calculate start date for table 2: 7 days after the last date in table1
-        # Parse the last date using the same flexible parsing as generate_dates
-        last_table1_date_str = table1_dates[-1]
-        date_formats_to_try = ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d']
-        last_table1_date = None
-
-        for fmt in date_formats_to_try:
-            try:
-                last_table1_date = datetime.strptime(last_table1_date_str, fmt)
-                break
-            except ValueError:
-                continue
-
-        if last_table1_date is None:
-            # Fallback: assume it's in the same format we're using for output
-            last_table1_date = datetime.strptime(last_table1_date_str, date_format)
-
-        table2_start_date = last_table1_date + timedelta(days=7)
-        table2_start_str = table2_start_date.strftime('%Y-%m-%d')  # Always use standard format for input
-
-        # Generate dates for table 2 (starting 7 days after table1 ends)
-        table2_dates = generate_dates(table2_start_str, table2_count, date_format)
-
-        # Generate smart hours for table 2 using reservation system
-        table2_hours = generate_hour_schedule(table2_count, table2_dates, client_id)
-
-        table2 = doc.tables[config_table2['index']]
         filled_table2 = fill_table_dates_and_hours(
-            table2, table2_dates, table2_hours,
+            table_cells(doc, config_table2['index']), plan['table2_dates'], plan['table2_hours'],
             config_table2['start_row'], config_table2['date_col'], config_table2['hour_col']
         )
         results['table2'] = f"Filled {filled_table2} practical lesson date/hour rows of {table2_count}"
@@ -897,58 +714,725 @@ def fill_candidate_tables(doc, start_date_str: str, table1_count: int, table2_co
 
     return results
 
-def main():
-    args = parse_args()
+def fill_candidate_tables(doc, start_date_str: str, table1_count: int, table2_count: int, date_format: str, client_id: str = None, traffic_law_passed: bool = False, reservations: Dict[str, Any] = None):
+    """Fill the candidate follow-up card tables based on discovered structure
+
+    Table 2 (Theory lessons): Always filled with DATES ONLY (no hours)
+    Table 3 (Practical lessons): Only filled with DATES + HOURS if traffic law test passed
+    """
+    # Hours are only reserved when table 3 actually exists in the document
+    config_table2 = TABLES_CONFIG['lessons_table2']
+    plan = plan_candidate_tables(
+        start_date_str, table1_count, table2_count, date_format, client_id,
+        traffic_law_passed and config_table2['index'] < len(doc.tables), reservations
+    )
+    return apply_candidate_tables(doc, plan, table1_count, table2_count, traffic_law_passed)
+
+# -----------------------------
+# Compiled template fast path (compiled_template.py)
+# -----------------------------
+
+COMPILED_KIND = 'candidate_follow_up'
+# Code whose output the compiled artefact reproduces; editing any of it invalidates the artefact
+COMPILED_SOURCES = tuple(Path(__file__).resolve().with_name(name) for name in (
+    Path(__file__).name, 'placeholder_engine.py', 'compiled_template.py', 'table_fill.py', 'cell_format.py'))
+
+def compiled_cell_name(table_index: int, row: int, col: int) -> str:
+    return f'{table_index}.{row}.{col}'
+
+def prepare_compiled_document(doc, placeholders: Dict[str, str], fill: bool) -> List[Tuple[str, Any]]:
+    """Run the render steps with sentinel values (see compile_template); returns the lesson cells."""
+    replace_paragraph_placeholders(doc, placeholders)
+    regions = []
+    for key, with_hours in (('lessons_table1', False), ('lessons_table2', True)):
+        config = TABLES_CONFIG[key]
+        if config['index'] >= len(doc.tables):
+            continue
+        cells = table_cells(doc, config['index'])
+        cols = [config['date_col'], config['hour_col']] if with_hours else [config['date_col']]
+        rows = range(config['start_row'], len(cells))
+        if fill:
+            values = [[cell_sentinel(compiled_cell_name(config['index'], r, c)) for r in rows] for c in cols]
+            if with_hours:
+                fill_table_dates_and_hours(cells, values[0], values[1], config['start_row'], config['date_col'], config['hour_col'])
+            else:
+                fill_table_dates_only(cells, values[0], config['start_row'], config['date_col'])
+        for r in rows:
+            if max(cols) >= cells.width(r):
+                break
+            for c in cols:
+                regions.append((compiled_cell_name(config['index'], r, c), cells.tc(r, c)))
+    LESSON_CELL.ensure_style(doc)
+    return regions
+
+def compile_card_template(input_path) -> Dict[str, Any]:
+    """Write <input>.compiled.json for the follow-up card template."""
+    try:
+        artefact = compile_template(input_path, COMPILED_KIND, {'tables': TABLES_CONFIG},
+                                    COMPILED_SOURCES, prepare_compiled_document)
+    except CompileError as e:
+        print(f"[ERROR] Template cannot be compiled: {e}", file=sys.stderr)
+        sys.exit(1)
+    path = write_compiled(input_path, artefact)
+    safe_print(f"[OK] Compiled template: {path} ({len(artefact['parts'])} parts)")
+    return {'output': str(path), 'docx_path': None, 'pdf_path': None}
+
+def load_compiled_card(input_path):
+    """The current compiled artefact of the template, or None."""
+    return load_compiled(input_path, COMPILED_KIND, {'tables': TABLES_CONFIG}, COMPILED_SOURCES)
+
+def compiled_cells(plan: Dict[str, Any], traffic_law_passed: bool) -> Dict[str, str]:
+    """Cell values of a plan, keyed like prepare_compiled_document's regions (cleaned as format_cell does)."""
+    cells = {}
+    config = TABLES_CONFIG['lessons_table1']
+    for i, value in enumerate(plan['table1_dates']):
+        cells[compiled_cell_name(config['index'], config['start_row'] + i, config['date_col'])] = clean_text(value)
+    config = TABLES_CONFIG['lessons_table2']
+    if traffic_law_passed and plan['table2_dates'] is not None and plan['table2_hours'] is not None:
+        for i, (date_str, hour) in enumerate(zip(plan['table2_dates'], plan['table2_hours'])):
+            row = config['start_row'] + i
+            cells[compiled_cell_name(config['index'], row, config['date_col'])] = clean_text(date_str)
+            cells[compiled_cell_name(config['index'], row, config['hour_col'])] = clean_text(hour)
+    return cells
+
+def render_candidate_document(input_path, data: Dict[str, str], plan: Dict[str, Any], table1_count: int,
+                              table2_count: int, traffic_law_passed: bool, compiled=None, doc=None):
+    """The filled card: spliced from the compiled template when it can be, else built with python-docx."""
+    if doc is None:
+        if compiled is None:
+            compiled = load_compiled_card(input_path)
+        if compiled is not None:
+            with stage('fill'):
+                rendered = compiled.render_document(expand_aliases(data, PLACEHOLDER_MAPPING),
+                                                    compiled_cells(plan, traffic_law_passed))
+            if rendered is not None:
+                safe_print(f"[INFO] Rendered from compiled template")
+                return rendered
+        with stage('template_load'):
+            doc = get_document(input_path)
+
+    with stage('placeholders'):
+        replace_paragraph_placeholders(doc, data)
+    print("[INFO] Placeholders replaced successfully")
+    with stage('table_fill'):
+        results = apply_candidate_tables(doc, plan, table1_count, table2_count, traffic_law_passed)
+    for table_name, result in results.items():
+        safe_print(f"[INFO] {table_name}: {result}")
+    return doc
+
+# -----------------------------
+# Direct PDF renderer (--renderer pdf-overlay, pdf_overlay.py)
+# -----------------------------
+
+def overlay_tables(plan: Dict[str, Any], traffic_law_passed: bool) -> Dict[str, Dict[str, List[str]]]:
+    """Lesson columns of a plan for PDF_OVERLAY_LAYOUT (cleaned as format_cell does)."""
+    tables = {'lessons_table1': {'date': [clean_text(d) for d in plan['table1_dates']]}}
+    if traffic_law_passed and plan['table2_dates'] is not None and plan['table2_hours'] is not None:
+        tables['lessons_table2'] = {'date': [clean_text(d) for d in plan['table2_dates']],
+                                    'hour': [clean_text(h) for h in plan['table2_hours']]}
+    return tables
+
+def lesson_counts(args) -> Tuple[int, int]:
+    """(theory, practical) lessons to plan: the PDF form of --renderer pdf-overlay prints fewer rows
+    than the Word card, and only the lessons it prints get dates and reserved hours."""
+    counts = (args.table1_dates, args.table2_dates)
+    if args.renderer != 'pdf-overlay':
+        return counts
+    tables = PDF_OVERLAY_LAYOUT['tables']
+    rows = (tables['lessons_table1']['rows'], tables['lessons_table2']['rows'])
+    for name, count, limit in zip(('theory', 'practical'), counts, rows):
+        if count > limit:
+            safe_print(f"[WARN] The PDF template holds {limit} {name} lessons: planning {limit} of {count} "
+                       f"(--renderer docx prints all of them)")
+    return min(counts[0], rows[0]), min(counts[1], rows[1])
+
+def render_overlay_card(pdf_template, output_pdf, data: Dict[str, str], plan: Dict[str, Any],
+                        traffic_law_passed: bool) -> Dict[str, Any]:
+    """Draw the card on the PDF template; raises OverlayError when the renderer cannot run."""
+    with stage('overlay'):
+        info = render_overlay(pdf_template, PDF_OVERLAY_LAYOUT, data, overlay_tables(plan, traffic_law_passed), output_pdf)
+    for table, count in info['dropped'].items():
+        safe_print(f"[WARN] {table}: {count} lesson rows do not fit the PDF template and were left out")
+    return info
+
+# -----------------------------
+# Render cache (render_cache.py)
+# -----------------------------
+
+# Code behind a cached card besides COMPILED_SOURCES
+CACHE_SOURCES = COMPILED_SOURCES + tuple(Path(__file__).resolve().with_name(name) for name in (
+    'docx_writer.py', 'pdf_overlay.py'))
+
+def output_formats(args) -> Tuple[str, ...]:
+    """Files a render leaves behind: the cache stores and returns exactly these."""
+    if args.renderer == 'pdf-overlay' or args.pdf_only:
+        return ('pdf',)
+    return ('docx', 'pdf') if args.pdf else ('docx',)
+
+def card_cache_key(args, start_date: str, data: Dict[str, str], plan: Dict[str, Any], traffic_law_passed: bool) -> Optional[str]:
+    """Key of one card: templates + code by content, client data, lesson dates and hours, output formats."""
+    formats = output_formats(args)
+    overlay = args.renderer == 'pdf-overlay'
+    return render_key(COMPILED_KIND, [args.pdf_template if overlay else args.input, *CACHE_SOURCES], {
+        'renderer': args.renderer,
+        'formats': formats,
+        'pdf_backend': args.pdf_backend if 'pdf' in formats and not overlay else None,
+        'data': normalise_data(data),
+        'start_date': start_date,
+        'plan': plan,
+        'table_counts': [args.table1_dates, args.table2_dates],
+        'traffic_law_passed': traffic_law_passed,
+    })
+
+def cache_targets(docx_path: Path, formats: Tuple[str, ...]) -> Dict[str, Path]:
+    paths = {'docx': docx_path, 'pdf': docx_path.with_suffix('.pdf')}
+    return {fmt: paths[fmt] for fmt in formats}
+
+def fetch_cached_card(cache, key: str, docx_path: Path, formats: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    """Copy a cached card to the output paths; the render result, or None on a miss."""
+    targets = cache_targets(docx_path, formats)
+    if cache is None:
+        return None
+    with stage('cache'):
+        if not cache.fetch(key, targets):
+            return None
+    annotate(cached=True)
+    for fmt, path in targets.items():
+        safe_print(f"[OK] {fmt.upper()} file from render cache: {path}")
+    if 'pdf' in targets:
+        print(f"PDF_PATH={targets['pdf']}")
+    pdf_path = str(targets['pdf']) if 'pdf' in targets else None
+    docx_path = str(targets['docx']) if 'docx' in targets else None
+    return {'output': pdf_path or docx_path, 'docx_path': docx_path, 'pdf_path': pdf_path, 'cached': True}
+
+def produced_files(result: Dict[str, Any], formats: Tuple[str, ...]) -> Optional[Dict[str, str]]:
+    """The output files of a successful render, or None when a requested format is missing."""
+    files = {}
+    if result.get('docx_path'):
+        files['docx'] = result['docx_path']
+    if result.get('pdf_path') and result['pdf_path'].lower().endswith('.pdf'):
+        files['pdf'] = result['pdf_path']
+    if not all(fmt in files for fmt in formats):
+        return None
+    return {fmt: files[fmt] for fmt in formats}
+
+# -----------------------------
+# Schedule preview (--plan-only, then --commit-plan)
+# -----------------------------
+
+def print_plan(plan: Dict[str, Any]):
+    """One PLAN= line of compact JSON (ASCII, like METRICS=) for the UI."""
+    print('PLAN=' + json.dumps(plan, ensure_ascii=True, separators=(',', ':')))
+
+def preview_plan(args) -> Dict[str, Any]:
+    """--plan-only: lesson dates and the hours the allocator would give now, in a dry-run session.
+
+    Nothing is rendered or reserved. The practical start (first working day 7 days after the
+    last theory lesson) is given even before the traffic law test is passed.
+    """
+    data, traffic_law_passed = load_client_data(args)
+    table1_count, table2_count = lesson_counts(args)
+    try:
+        table1_days, table2_days = plan_lesson_days([parse_start_date(args.start_date)],
+                                                    table1_count, table2_count)[0]
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    with get_reservation_store().session(commit=False) as reservations:
+        if args.reschedule:
+            release_hours(args.client_id, reservations)
+        plan = plan_candidate_tables(
+            args.start_date, table1_count, table2_count, args.date_format, args.client_id,
+            traffic_law_passed, reservations,
+            lesson_days=(table1_days, table2_days if traffic_law_passed else None)
+        )
+    preview = {
+        'client_id': args.client_id,
+        'start_date': args.start_date,
+        'date_format': args.date_format,
+        'traffic_law_passed': traffic_law_passed,
+        'practical_start': get_calendar().format_days(table2_days[:1], args.date_format)[0] if table2_days else None,
+        **plan,
+        'reschedule': args.reschedule,
+        'committed': False,
+    }
+    print_plan(preview)
+    return {'output': None, 'docx_path': None, 'pdf_path': None, 'plan': preview}
+
+def commit_plan_hours(client_id: str, dates: List[str], hours: List[str], reservations: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Reserve previewed hours for `client_id` exactly as shown.
+
+    Returns the conflicts (a slot taken since the preview, or a date the client already holds at
+    another hour); when there are any, nothing is reserved. Committed hours go into the client's
+    memory, so the printed card reuses them.
+    """
+    if '_client_memory' not in reservations:
+        reservations['_client_memory'] = {}
+    client_memory = reservations['_client_memory']
+    stored_hours = dict(client_memory.get(client_id) or {})
+
+    conflicts = []
+    new_hours = []
+    for date_str, hour in zip(dates, hours):
+        current = stored_hours.get(date_str)
+        if current is not None:
+            if current != hour:
+                conflicts.append({'date': date_str, 'hour': hour, 'reason': f'client already has {current}'})
+            continue
+        if hour != FULL_MARKER and hour in reservations.get(date_str, []):
+            conflicts.append({'date': date_str, 'hour': hour, 'reason': 'taken'})
+            continue
+        new_hours.append((date_str, hour))
+    if conflicts:
+        return conflicts
+
+    for date_str, hour in new_hours:
+        if hour != FULL_MARKER:
+            reservations[date_str] = reservations.get(date_str, []) + [hour]
+        stored_hours[date_str] = hour
+    client_memory[client_id] = stored_hours
+    return []
+
+class PlanConflicts(Exception):
+    """Aborts a --commit-plan session, so a --reschedule release is rolled back with it."""
+
+    def __init__(self, conflicts: List[Dict[str, str]]):
+        super().__init__(f"{len(conflicts)} conflicts")
+        self.conflicts = conflicts
+
+def commit_plan(args) -> Dict[str, Any]:
+    """--commit-plan: reserve the hours of a --plan-only preview, or exit 1 listing the conflicts.
+
+    A preview made with --reschedule first releases the client's previous hours, in the same session.
+    """
+    try:
+        if os.path.isfile(args.commit_plan):
+            with open(args.commit_plan, 'r', encoding='utf-8') as f:
+                plan = json.load(f)
+        else:
+            plan = json.loads(args.commit_plan)
+        if not isinstance(plan, dict):
+            raise ValueError('the plan must be a JSON object')
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Invalid --commit-plan: {e}", file=sys.stderr)
+        sys.exit(1)
+    client_id = args.client_id or plan.get('client_id')
+    if not client_id:
+        print("[ERROR] --commit-plan needs the client id (--client-id or client_id in the plan)", file=sys.stderr)
+        sys.exit(1)
+
+    dates = plan.get('table2_dates') or []
+    hours = plan.get('table2_hours') or []
+    reschedule = args.reschedule or bool(plan.get('reschedule'))
+    conflicts = []
+    try:
+        with get_reservation_store().session() as reservations:
+            released = release_hours(client_id, reservations) if reschedule else {}
+            conflicts = commit_plan_hours(client_id, dates, hours, reservations)
+            if conflicts:
+                raise PlanConflicts(conflicts)
+    except PlanConflicts:
+        pass
+    if conflicts:
+        print(f"[ERROR] Plan is out of date, {len(conflicts)} lesson hours changed since the preview; preview again",
+              file=sys.stderr)
+        print('PLAN_CONFLICTS=' + json.dumps(conflicts, ensure_ascii=True, separators=(',', ':')))
+        sys.exit(1)
+
+    plan = {**plan, 'client_id': client_id, 'reschedule': reschedule, 'committed': True}
+    freed = f", {len(released)} previous ones released" if released else ''
+    safe_print(f"[OK] Plan committed for {client_id}: {len(hours)} practical lesson hours reserved{freed}")
+    print_plan(plan)
+    return {'output': None, 'docx_path': None, 'pdf_path': None, 'plan': plan}
+
+# -----------------------------
+# Releasing a client (--release)
+# -----------------------------
+
+def release_client(args) -> Dict[str, Any]:
+    """--release: free all hours of --client-id; prints one RELEASED= line ({date: hour})."""
+    released = release_hours(args.client_id)
+    if released:
+        safe_print(f"[OK] Released {len(released)} lesson hours of {args.client_id}")
+    else:
+        safe_print(f"[WARN] No reserved hours for {args.client_id}")
+    print('RELEASED=' + json.dumps({'client_id': args.client_id, 'released': released},
+                                   ensure_ascii=True, separators=(',', ':')))
+    return {'output': None, 'docx_path': None, 'pdf_path': None, 'released': released}
+
+# -----------------------------
+# Batch mode (--batch): a whole cohort in one invocation
+# -----------------------------
+
+def load_batch_records(path: str) -> List[Dict[str, Any]]:
+    """Read raw client records from a JSON array or a JSONL file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        records = json.loads(stripped)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not all(isinstance(r, dict) for r in records):
+        raise ValueError('Each batch record must be a JSON object')
+    return records
+
+def batch_output_name(client_id: str) -> str:
+    """ASCII-safe file name for a client's card (same rule as the Electron handler)."""
+    return re.sub(r'[^\w\-.]', '_', client_id, flags=re.ASCII) + '.docx'
+
+def render_card(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Render one planned card. Runs inside the batch process pool."""
+    import contextlib
+    import io
+    import time
+
+    started = time.perf_counter()
+    entry = {'index': job['index'], 'client_id': job['client_id'], 'ok': False,
+             'output': None, 'pdf_path': None, 'error': None}
+    timings = {}
+    try:
+        # Per-card logs would interleave across processes; keep only the manifest
+        with contextlib.redirect_stdout(io.StringIO()):
+            if job['renderer'] == 'pdf-overlay':
+                t = time.perf_counter()
+                pdf_path = Path(job['output']).with_suffix('.pdf')
+                render_overlay_card(job['pdf_template'], pdf_path, job['data'], job['plan'], job['traffic_law_passed'])
+                entry['output'] = entry['pdf_path'] = str(pdf_path)
+                timings['overlay_ms'] = round((time.perf_counter() - t) * 1000, 2)
+                entry['ok'] = True
+                return entry
+
+            t = time.perf_counter()
+            compiled = load_compiled_card(job['input'])
+            doc = None if compiled is not None else get_document(job['input'])
+            timings['load_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+            t = time.perf_counter()
+            doc = render_candidate_document(job['input'], job['data'], job['plan'], job['table1_count'],
+                                            job['table2_count'], job['traffic_law_passed'], compiled, doc)
+            entry['compiled'] = isinstance(doc, CompiledDocument)
+            timings['fill_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+            t = time.perf_counter()
+            output_path = Path(job['output'])
+            save_docx(doc, str(output_path), job['input'])
+            entry['output'] = str(output_path)
+            timings['save_ms'] = round((time.perf_counter() - t) * 1000, 2)
+        entry['ok'] = True
+    except Exception as e:
+        entry['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        timings['render_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        entry['timings'] = timings
+    return entry
+
+def convert_batch_pdfs(entries: List[Dict[str, Any]], args, workers: int):
+    """Convert rendered cards to PDF; a LibreOffice pool gets one converter per worker."""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    backend = get_backend(args.pdf_backend, size=workers)
+    if backend is None:
+        for entry in entries:
+            entry['ok'] = False
+            entry['error'] = f"No PDF backend available ({args.pdf_backend}): install docx2pdf (Word) or LibreOffice"
+        return
+
+    def convert_entry(entry):
+        t = time.perf_counter()
+        docx_path = Path(entry['output'])
+        pdf_path = docx_path.with_suffix('.pdf')
+        try:
+            backend.convert(docx_path, pdf_path, timeout=args.pdf_timeout)
+            entry['output'] = entry['pdf_path'] = str(pdf_path)
+            if args.pdf_only:
+                docx_path.unlink(missing_ok=True)
+        except Exception as e:
+            entry['ok'] = False
+            entry['error'] = f"{type(e).__name__}: {e}"
+        entry['timings']['pdf_ms'] = round((time.perf_counter() - t) * 1000, 2)
+
+    with ThreadPoolExecutor(max_workers=getattr(backend, 'size', 1)) as pool:
+        list(pool.map(convert_entry, entries))
+
+def run_batch(args) -> Dict[str, Any]:
+    """Plan every client in one reservation session, then render in a process pool."""
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    started = time.perf_counter()
+    input_path = Path(args.input)
+    if args.renderer != 'pdf-overlay' and not input_path.exists():
+        print(f"[ERROR] Source file not found: {input_path}", file=sys.stderr)
+        sys.exit(1)
+    table1_count, table2_count = lesson_counts(args)
+
+    try:
+        with stage('load_data'):
+            records = load_batch_records(args.batch)
+    except Exception as e:
+        print(f"[ERROR] Failed to read batch file: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    cohort_mode = args.allocator == 'cohort'
+    if cohort_mode and not numpy_available():
+        safe_print("[WARN] numpy not installed, falling back to the greedy allocator: pip install numpy")
+        cohort_mode = False
+
+    # Lesson days of every record in one vectorised calendar pass
+    with stage('dates'):
+        starts = {}
+        for index, record in enumerate(records):
+            start_date = record.get('start_date') or record.get('startDate') or args.start_date
+            with contextlib.suppress(ValueError, TypeError):
+                starts[index] = parse_start_date(start_date)
+        lesson_days = dict(zip(starts, plan_lesson_days(list(starts.values()), table1_count, table2_count)))
+
+    # 1. Plan all cards inside a single reservation session
+    jobs: List[Dict[str, Any]] = []
+    manifest_entries: List[Dict[str, Any]] = []
+    with stage('reservations'), get_reservation_store().session() as reservations:
+        for index, record in enumerate(records):
+            client_id = str(record.get('client_id') or record.get('_id') or record.get('id') or f'client_{index + 1}')
+            start_date = record.get('start_date') or record.get('startDate') or args.start_date
+            t = time.perf_counter()
+            try:
+                if not start_date:
+                    raise ValueError('start_date is required for every batch record')
+                if args.reschedule:
+                    release_hours(client_id, reservations)
+                data, traffic_law_passed = client_record_to_placeholders(record)
+                for k, v in default_placeholders().items():
+                    data.setdefault(k, v)
+                days = lesson_days.get(index)
+                plan = plan_candidate_tables(
+                    start_date, table1_count, table2_count, args.date_format,
+                    client_id, traffic_law_passed, reservations, reserve_hours=not cohort_mode,
+                    lesson_days=(days[0], days[1] if traffic_law_passed else None) if days else None
+                )
+            except Exception as e:
+                manifest_entries.append({'index': index, 'client_id': client_id, 'ok': False,
+                                         'output': None, 'pdf_path': None, 'error': f"{type(e).__name__}: {e}",
+                                         'timings': {}})
+                continue
+            jobs.append({
+                'index': index,
+                'client_id': client_id,
+                'start_date': start_date,
+                'input': str(input_path),
+                'output': str(output_dir / batch_output_name(client_id)),
+                'data': data,
+                'plan': plan,
+                'plan_ms': round((time.perf_counter() - t) * 1000, 2),
+                'table1_count': table1_count,
+                'table2_count': table2_count,
+                'traffic_law_passed': traffic_law_passed,
+                'renderer': args.renderer,
+                'pdf_template': args.pdf_template,
+            })
+
+        # Cohort mode: the practical-lesson hours of all clients are solved together
+        if cohort_mode:
+            t = time.perf_counter()
+            pending = [job for job in jobs if job['plan']['table2_dates'] is not None]
+            hours = plan_cohort_hours([(job['client_id'], job['plan']['table2_dates']) for job in pending], reservations)
+            for job, job_hours in zip(pending, hours):
+                job['plan']['table2_hours'] = job_hours
+            safe_print(f"[INFO] Cohort hours planned for {len(pending)} clients in {(time.perf_counter() - t) * 1000:.1f} ms")
+    safe_print(f"[INFO] Planned {len(jobs)} cards with one reservation load/save")
+
+    # Cards rendered before with the same inputs are copied from the render cache
+    cache = open_render_cache(args.no_cache, args.cache_dir)
+    formats = output_formats(args)
+    cached_entries: List[Dict[str, Any]] = []
+    if cache is not None:
+        with stage('cache'):
+            pending = []
+            for job in jobs:
+                t = time.perf_counter()
+                job['cache_key'] = card_cache_key(args, job['start_date'], job['data'], job['plan'], job['traffic_law_passed'])
+                targets = cache_targets(Path(job['output']), formats)
+                if not cache.fetch(job['cache_key'], targets):
+                    pending.append(job)
+                    continue
+                cached_entries.append({
+                    'index': job['index'], 'client_id': job['client_id'], 'ok': True, 'cached': True,
+                    'output': str(targets.get('pdf', targets.get('docx'))),
+                    'pdf_path': str(targets['pdf']) if 'pdf' in targets else None, 'error': None,
+                    'timings': {'plan_ms': job['plan_ms'], 'cache_ms': round((time.perf_counter() - t) * 1000, 2)},
+                    'table2_hours': job['plan']['table2_hours'],
+                })
+        jobs = pending
+        safe_print(f"[INFO] Render cache: {len(cached_entries)} cards reused, {len(jobs)} to render")
+
+    # 2. Render the DOCX files in parallel
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(jobs) or 1))
+    annotate(docs=len(records), workers=workers)
+    with stage('render'):
+        if workers == 1:
+            rendered = [render_card(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rendered = list(pool.map(render_card, jobs))
+    for job, entry in zip(jobs, rendered):
+        entry['timings']['plan_ms'] = job['plan_ms']
+        entry['table2_hours'] = job['plan']['table2_hours']
+
+    # 3. PDFs from this process, through one backend shared by the whole batch
+    if (args.pdf or args.pdf_only) and args.renderer == 'docx':
+        with stage('pdf'):
+            convert_batch_pdfs([entry for entry in rendered if entry['ok']], args, workers)
+    if cache is not None:
+        with stage('cache'):
+            for job, entry in zip(jobs, rendered):
+                files = cache_targets(Path(job['output']), formats)
+                if entry['ok'] and all(path.exists() for path in files.values()):
+                    cache.store(job['cache_key'], files)
+    manifest_entries.extend(rendered)
+    manifest_entries.extend(cached_entries)
+    manifest_entries.sort(key=lambda e: e['index'])
+
+    manifest = {
+        'template': str(input_path),
+        'count': len(records),
+        'succeeded': sum(1 for e in manifest_entries if e['ok']),
+        'cached': len(cached_entries),
+        'workers': workers,
+        'total_ms': round((time.perf_counter() - started) * 1000, 2),
+        'cards': manifest_entries,
+    }
+    manifest_path = Path(args.manifest) if args.manifest else output_dir / 'manifest.json'
+    with stage('manifest'), open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    safe_print(f"[OK] Batch finished: {manifest['succeeded']}/{manifest['count']} cards in {manifest['total_ms']} ms")
+    print(f"MANIFEST_PATH={manifest_path}")
+    return {'output': str(output_dir), 'docx_path': None, 'pdf_path': None, 'manifest_path': str(manifest_path)}
+
+def main(argv=None):
+    """Run one render. Returns a result dict (output/docx/pdf paths) for the render worker."""
+    global _reservations_path
+    args = parse_args(argv)
+    _reservations_path = args.reservations
 
     if args.placeholders:
         print('\n'.join(PLACEHOLDERS))
-        return
+        return None
 
+    if args.compile:
+        return compile_card_template(args.input)
+
+    try:
+        configure_holidays(args.holidays)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Cannot load the holidays file: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.plan_only:
+        return preview_plan(args)
+
+    if args.commit_plan:
+        return commit_plan(args)
+
+    if args.release:
+        return release_client(args)
+
+    # One METRICS= record per invocation (a whole cohort with --batch)
+    template = args.pdf_template if args.renderer == 'pdf-overlay' else args.input
+    with recording(COMPILED_KIND, args.metrics_file, template=template, renderer=args.renderer,
+                   batch=True if args.batch else None), \
+            profiling(args.profile, args.output, args.profile_top, args.profile_memory):
+        if args.batch:
+            return run_batch(args)
+        return render_single(args)
+
+def plan_single_card(args, table1_count: int, table2_count: int, traffic_law_passed: bool) -> Dict[str, Any]:
+    """Lesson plan of one card in one reservation session. With --reschedule the client's old
+    hours are released in that session too, so a failure while planning keeps them."""
+    with get_reservation_store().session() as reservations:
+        if args.reschedule:
+            with stage('reservations'):
+                released = release_hours(args.client_id, reservations)
+            safe_print(f"[INFO] Released {len(released)} previous lesson hours of {args.client_id}")
+        return plan_candidate_tables(args.start_date, table1_count, table2_count, args.date_format,
+                                     args.client_id, traffic_law_passed, reservations)
+
+def render_single(args) -> Dict[str, Any]:
+    """One card from --client-data/--data: the pdf-overlay renderer or the DOCX template."""
     # Load client data and traffic law test status
-    data, traffic_law_passed = load_client_data(args)
+    with stage('load_data'):
+        data, traffic_law_passed = load_client_data(args)
     safe_print(f"[INFO] Data loaded with keys: {list(data.keys())}")
 
-    # Validate input file
+    cache = open_render_cache(args.no_cache, args.cache_dir)
+
+    # Direct PDF renderer: no Word template, no conversion (falls back to DOCX when it cannot run)
+    if args.renderer == 'pdf-overlay':
+        table1_count, table2_count = lesson_counts(args)
+        plan = plan_single_card(args, table1_count, table2_count, traffic_law_passed)
+        pdf_path = Path(args.output).with_suffix('.pdf')
+        with stage('cache'):
+            key = card_cache_key(args, args.start_date, data, plan, traffic_law_passed)
+        cached = fetch_cached_card(cache, key, Path(args.output), output_formats(args))
+        if cached is not None:
+            return cached
+        try:
+            render_overlay_card(args.pdf_template, pdf_path, data, plan, traffic_law_passed)
+            safe_print(f"[OK] PDF file created: {pdf_path} (pdf-overlay)")
+            print(f"PDF_PATH={pdf_path}")
+            if cache is not None:
+                with stage('cache'):
+                    cache.store(key, {'pdf': pdf_path})
+            return {'output': str(pdf_path), 'docx_path': None, 'pdf_path': str(pdf_path)}
+        except OverlayError as e:
+            print(f"[WARN] PDF overlay renderer unavailable, using the DOCX template: {e}")
+            args.renderer = 'docx'
+            args.reschedule = False  # the client was moved by the plan above
+            annotate(renderer='docx', template=Path(args.input).name)
+            # Planned again for the full Word tables: the hours already reserved are kept
+            return render_docx_card(args, data, traffic_law_passed, cache)
+
+    return render_docx_card(args, data, traffic_law_passed, cache)
+
+def render_docx_card(args, data: Dict[str, str], traffic_law_passed: bool, cache=None) -> Dict[str, Any]:
+    """The --renderer docx path of render_single: fill the Word template, save it and convert on request."""
     input_path = Path(args.input)
     if not input_path.exists():
         print(f"[ERROR] Source file not found: {input_path}", file=sys.stderr)
         sys.exit(1)
 
-    # Load document
-    doc = Document(str(input_path))
-    print(f"[INFO] Document loaded: {len(doc.tables)} tables, {len(doc.paragraphs)} paragraphs")
-
-    # Replace placeholders
-    replace_paragraph_placeholders(doc, data)
-    print("[INFO] Placeholders replaced successfully")
-
-    # Fill tables with dates and hours
-    results = fill_candidate_tables(
-        doc, args.start_date,
-        args.table1_dates, args.table2_dates,
-        args.date_format, args.client_id,  # Pass client ID
-        traffic_law_passed  # Pass traffic law test status
+    # Compiled artefact if current, else the document (parsed once per template, cloned per render)
+    with stage('template_load'):
+        compiled = load_compiled_card(input_path)
+        doc = None if compiled is not None else get_document(input_path)
+    if compiled is None:
+        print(f"[INFO] Document loaded: {len(doc.tables)} tables, {len(doc.paragraphs)} paragraphs")
+    table_count = compiled.tables if compiled is not None else len(doc.tables)
+
+    # Lesson dates and hours (hours are only reserved when table 3 actually exists in the template)
+    plan = plan_single_card(
+        args, args.table1_dates, args.table2_dates,
+        traffic_law_passed and TABLES_CONFIG['lessons_table2']['index'] < table_count
     )
 
-    for table_name, result in results.items():
-        safe_print(f"[INFO] {table_name}: {result}")
+    # Same template, data, lessons and formats as an earlier render: reuse its files
+    output_path = Path(args.output)
+    with stage('cache'):
+        key = card_cache_key(args, args.start_date, data, plan, traffic_law_passed)
+    cached = fetch_cached_card(cache, key, output_path, output_formats(args))
+    if cached is not None:
+        return cached
+
+    # Replace placeholders and fill tables with dates and hours
+    doc = render_candidate_document(input_path, data, plan, args.table1_dates, args.table2_dates,
+                                    traffic_law_passed, compiled, doc)
 
-    # Apply Arial font size 8 bold to table content only
-    try:
-        from docx.shared import Pt
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        for run in paragraph.runs:
-                            run.font.name = 'Arial'
-                            run.font.bold = True
-                            run.font.size = Pt(10)
-        print("[INFO] Applied Arial font size 8 bold to table content")
-    except Exception as e:
-        print(f"[WARN] Failed to apply font formatting: {e}")
     # Save output with better Unicode path handling
-    output_path = Path(args.output)
+    result = {'output': str(output_path), 'docx_path': str(output_path), 'pdf_path': None}
     try:
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -963,7 +1447,8 @@ def main():
             safe_name = f"candidate_follow_up_{timestamp}.docx"
             safe_output_path = output_path.parent / safe_name
             print(f"[WARN] Using safe filename due to Unicode path: {safe_output_path}")
-            doc.save(str(safe_output_path))
+            with stage('save'):
+                save_docx(doc, str(safe_output_path), input_path)
             safe_print(f"[OK] File created: {safe_output_path}")
 
             # Try to rename to original if possible
@@ -973,8 +1458,10 @@ def main():
             except Exception as rename_err:
                 print(f"[WARN] Could not rename to original path: {rename_err}")
                 safe_print(f"[OK] Final file: {safe_output_path}")
+                result['output'] = result['docx_path'] = str(safe_output_path)
         else:
-            doc.save(output_str)
+            with stage('save'):
+                save_docx(doc, output_str, input_path)
             safe_print(f"[OK] File created: {output_path}")
 
     except PermissionError as e:
@@ -986,8 +1473,9 @@ def main():
 
     # Convert to PDF if requested
     if args.pdf or args.pdf_only:
-        if convert is None:
-            print("[ERROR] Need to install docx2pdf library: pip install docx2pdf", file=sys.stderr)
+        backend = get_backend(args.pdf_backend)
+        if backend is None:
+            print(f"[ERROR] No PDF backend available ({args.pdf_backend}): install docx2pdf (Word) or LibreOffice", file=sys.stderr)
             sys.exit(1)
 
         pdf_path = output_path.with_suffix('.pdf')
@@ -1000,19 +1488,29 @@ def main():
             # Ensure output directory exists for PDF
             pdf_path.parent.mkdir(parents=True, exist_ok=True)
 
-            convert(str(output_path), str(pdf_path))
-            safe_print(f"[OK] PDF file created: {pdf_path}")
+            with stage('pdf'):
+                backend.convert(output_path, pdf_path, timeout=args.pdf_timeout)
+            safe_print(f"[OK] PDF file created: {pdf_path} ({backend.name})")
             print(f"PDF_PATH={pdf_path}")
+            result['output'] = result['pdf_path'] = str(pdf_path)
 
             # Delete DOCX if pdf-only requested
             if args.pdf_only:
                 output_path.unlink(missing_ok=True)
                 safe_print(f"[OK] DOCX file deleted (pdf-only mode)")
+                result['docx_path'] = None
         except Exception as e:
             print(f"[ERROR] Failed to convert to PDF: {e}", file=sys.stderr)
             # Don't exit on PDF conversion failure, return DOCX instead
             print(f"[WARN] Will use DOCX file instead of PDF")
             print(f"PDF_PATH={output_path}")  # Return DOCX path as fallback
+            result['pdf_path'] = str(output_path)
+
+    files = produced_files(result, output_formats(args))
+    if cache is not None and files is not None:
+        with stage('cache'):
+            cache.store(key, files)
+    return result
 
 if __name__ == '__main__':
     main()
@@ -26,6 +26,7 @@ python scripts/fill_traffic_law_lessons_card.py \
   "address": "حي النصر، المسيلة",
   "registrationDate": "2025/01/10"
 }
+أو نفس الكائن مباشرة كـ --client-data '{...}' (كما يرسله التطبيق إلى render_worker.py).
 
 ملاحظات:
 - الآن يتم إنشاء ملف PDF افتراضياً بدلاً من DOCX
@@ -33,33 +34,61 @@ python scripts/fill_traffic_law_lessons_card.py \
 - إذا كان الجدول يحتوي صف رأس (Header) يمكن استخدام العلم --has-header لتخطي أول صف.
 - استخدم --docx-only لإنشاء DOCX فقط أو --docx للاحتفاظ بكل من PDF وDOCX.
 - السكربت لا يعدل Placeholder داخل الجدول (غير مطلوبة).
+- --renderer pdf-overlay يرسم البيانات والتواريخ مباشرة على قالب PDF للبطاقة (pdf_overlay.py)
+  بدون DOCX ولا تحويل؛ جدول نموذج PDF يتسع لـ 25 حصة.
+- كل توليد يطبع سطر METRICS= (زمن وذاكرة كل مرحلة، render_metrics.py) بجانب PDF_PATH=،
+  ومع --metrics-file يُلحق نفس السجل بملف JSONL.
+- --profile يكتب ملف .pstats وملخصاً لأثقل الدوال (و --profile-memory فرق tracemalloc)، انظر render_profile.py.
 """
 from __future__ import annotations
 import argparse
+import importlib.util
 import json
 import sys
 import re
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
-try:
-    from docx import Document
-    from docx.shared import Pt
-except ImportError:  # pragma: no cover
+# python-docx / lxml and the PDF libraries are imported by the modules below on first use,
+# so --help, argument errors and render-cache hits do not load them
+if importlib.util.find_spec('docx') is None:  # pragma: no cover
     print("[ERROR] تحتاج لتثبيت المكتبة python-docx: pip install python-docx", file=sys.stderr)
     sys.exit(1)
 
-try:
-    from docx2pdf import convert
-except ImportError:  # pragma: no cover
-    convert = None
+from template_cache import get_document
+
+from working_calendar import configure_holidays, get_calendar, parse_date
+from placeholder_engine import expand_aliases, replace_placeholders
+from compiled_template import CompileError, cell_sentinel, compile_template, load_compiled, write_compiled
+from docx_writer import save_docx
+from table_fill import table_cells
+from cell_format import CellFormat
+from pdf_backend import DEFAULT_TIMEOUT as PDF_TIMEOUT, PDF_BACKENDS, get_backend
+from pdf_overlay import RENDERERS, TEMPLATES_DIR, OverlayError, render_overlay
+from render_cache import normalise_data, open_render_cache, render_key
+from render_metrics import annotate, recording, stage
+from render_profile import DEFAULT_TOP as PROFILE_TOP, profiling
 
 PLACEHOLDERS = [
     'fullName', 'birthDate', 'birthPlace', 'address', 'registrationDate'
 ]
 
-WEEKEND_DAYS = [4, 5]  # الجمعة=4, السبت=5
+# Where --renderer pdf-overlay draws on the card's PDF form (points from the bottom-left, see pdf_overlay.py)
+PDF_OVERLAY_TEMPLATE = TEMPLATES_DIR / 'بطاقة خاصة بدروس قانون المرور .pdf'
+PDF_OVERLAY_LAYOUT = {
+    'font': 'Amiri-Regular.ttf', 'size': 12, 'bold': True,
+    'fields': [
+        {'text': '{fullName}', 'x': 270, 'y': 680.8, 'align': 'right', 'width': 200},
+        {'text': '{birthDate} - {birthPlace}', 'x': 468, 'y': 667.5, 'align': 'right', 'width': 250},
+        {'text': '{address}', 'x': 518, 'y': 653.2, 'align': 'right', 'width': 160},
+        {'text': '{registrationDate}', 'x': 284, 'y': 653.2, 'align': 'right', 'width': 150},
+    ],
+    'tables': {
+        'lessons': {'first_y': 589.6, 'pitch': 19.95, 'rows': 25, 'size': 11, 'width': 84,
+                    'columns': {'date': 310.5}},
+    },
+}
+
 
 
 def clean_text(text):
@@ -68,75 +97,33 @@ def clean_text(text):
         return text
     return re.sub(r'\s+', ' ', str(text)).strip()
 
+# Look of the filled date cells: Arial 12 bold, centred, no spacing, zero cell margins
+LESSON_CELL = CellFormat('LessonCell', 'Lesson Cell', font='Arial', size_pt=12, bold=True)
+
 def format_cell(cell, value: str):
-    """Apply strict compact formatting: single run, Arial 7, no extra spacing, removed cell margins."""
-    from docx.shared import Pt
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.enum.table import WD_ALIGN_VERTICAL
-    from docx.oxml import OxmlElement
-    from docx.oxml.ns import qn
+    """Replace the cell content with the cleaned value in the LessonCell style (see cell_format.py)."""
     cleaned = clean_text(value)
-    # Remove extra paragraphs
-    while len(cell.paragraphs) > 1:
-        p = cell.paragraphs[-1]._p
-        p.getparent().remove(p)
-    para = cell.paragraphs[0]
-    para.clear()
-    run = para.add_run(cleaned)
-    para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    if para.paragraph_format is not None:
-        pf = para.paragraph_format
-        pf.space_before = Pt(0)
-        pf.space_after = Pt(0)
-        pf.line_spacing = 1
-    run.font.name = 'Arial'
-    run.font.size = Pt(12)
-    run.font.bold = True
-    try:
-        cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-        tcPr = cell._tc.get_or_add_tcPr()
-        # Remove existing tcMar
-        for child in list(tcPr):
-            if child.tag.endswith('tcMar'):
-                tcPr.remove(child)
-        tcMar = OxmlElement('w:tcMar')
-        for side in ['top', 'start', 'bottom', 'end']:
-            side_el = OxmlElement(f'w:{side}')
-            side_el.set(qn('w:w'), '0')
-            side_el.set(qn('w:type'), 'dxa')
-            tcMar.append(side_el)
-        tcPr.append(tcMar)
-    except Exception:
-        pass
+    LESSON_CELL.apply(cell._tc, cleaned)
     return cleaned
 
 def generate_dates(start_date_str: str, count: int, out_format: str) -> List[str]:
-    """Generate sequential dates skipping Friday/Saturday."""
-    try:
-        # Handle both YYYY-MM-DD and YYYY/MM/DD formats
-        if '/' in start_date_str:
-            current = datetime.strptime(start_date_str, '%Y/%m/%d').date()
-        else:
-            current = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-    except ValueError:
+    """Generate sequential dates skipping Friday/Saturday and holidays."""
+    # Handle both YYYY-MM-DD and YYYY/MM/DD formats
+    current = parse_date(start_date_str, ('%Y/%m/%d',) if '/' in start_date_str else ('%Y-%m-%d',))
+    if current is None:
         raise ValueError('تنسيق start-date يجب أن يكون YYYY-MM-DD أو YYYY/MM/DD')
 
-    dates: List[str] = []
-    while len(dates) < count:
-        if current.weekday() not in WEEKEND_DAYS:
-            try:
-                dates.append(current.strftime(out_format))
-            except Exception:
-                dates.append(current.strftime('%Y/%m/%d'))
-        current += timedelta(days=1)
-    return dates
-
-def parse_args():
+    calendar = get_calendar()
+    return calendar.format_days(calendar.working_days(current, count), out_format, fallback='%Y/%m/%d')
+
+def parse_args(argv=None):
     p = argparse.ArgumentParser(description='Fill Traffic Law Lessons Card (Arabic).')
     p.add_argument('--input', help='ملف Word المصدر.')
     p.add_argument('--output', default='output/بطاقة_قانون_المرور_مملوءة.pdf', help='ملف الإخراج.')
     p.add_argument('--start-date', dest='start_date', help='تاريخ بداية أول حصة (YYYY-MM-DD أو YYYY/MM/DD).')
     p.add_argument('--data', dest='data_path', help='ملف JSON للبيانات العامة (حقول الرأس).')
+    p.add_argument('--client-data', dest='client_data', help='حقول الرأس كـ JSON string (بدل --data).')
+    p.add_argument('--holidays', help='ملف JSON للعطل الرسمية (لا تُجدول فيها حصص). افتراضي holidays.json إن وجد.')
     for ph in PLACEHOLDERS:
         p.add_argument(f'--{ph}', help=f'قيمة {ph} إذا لم يُستخدم --data')
     p.add_argument('--sessions', type=int, default=30, help='عدد الحصص المطلوب جدولتها (افتراضي 30).')
@@ -147,22 +134,47 @@ def parse_args():
     p.add_argument('--placeholders', action='store_true', help='اطبع قائمة الـ placeholders المتاحة ثم اخرج.')
     p.add_argument('--docx', action='store_true', help='إنشاء نسخة DOCX بالإضافة إلى PDF.')
     p.add_argument('--docx-only', action='store_true', help='إنشاء DOCX فقط وتخطي PDF.')
-
-    args = p.parse_args()
+    p.add_argument('--pdf-backend', choices=PDF_BACKENDS, default='auto',
+                   help='محرك التحويل إلى PDF: docx2pdf (Word) أو libreoffice (soffice بدون واجهة). افتراضي auto.')
+    p.add_argument('--pdf-timeout', type=float, default=PDF_TIMEOUT, help='مهلة تحويل الملف إلى PDF بالثواني.')
+    p.add_argument('--renderer', choices=RENDERERS, default='docx',
+                   help='docx: تعبئة قالب Word ثم التحويل؛ pdf-overlay: رسم البيانات مباشرة على قالب PDF بدون تحويل.')
+    p.add_argument('--pdf-template', default=str(PDF_OVERLAY_TEMPLATE), help='قالب PDF لـ --renderer pdf-overlay.')
+    p.add_argument('--no-cache', action='store_true', help='تجاهل ذاكرة الملفات المولَّدة (توليد كامل بدون قراءة أو تخزين).')
+    p.add_argument('--cache-dir', help='مجلد ذاكرة الملفات المولَّدة (افتراضي RENDER_CACHE_DIR أو .render_cache).')
+    p.add_argument('--metrics-file', help='ملف JSONL يُلحق به سجل METRICS لكل توليد (افتراضي HYPERDRIVE_METRICS_FILE).')
+    p.add_argument('--profile', nargs='?', const='', metavar='PSTATS',
+                   help='تشغيل التوليد تحت cProfile وكتابة ملف .pstats وملخص نصي (افتراضي بجانب ملف الإخراج).')
+    p.add_argument('--profile-top', type=int, default=PROFILE_TOP, help='عدد الدوال في ملخص --profile.')
+    p.add_argument('--profile-memory', action='store_true',
+                   help='لقطات tracemalloc بين تحميل القالب والحفظ (أبطأ بكثير)، مع --profile.')
+    p.add_argument('--compile', action='store_true',
+                   help='ترجمة القالب مسبقاً (مع --has-header/--table-index/--date-column) إلى <input>.compiled.json ثم الخروج.')
+
+    args = p.parse_args(argv)
     if not args.placeholders:
         if not args.input:
             p.error('--input is required')
-        if not args.start_date:
+        if not args.start_date and not args.compile:
             p.error('--start-date is required')
     return args
 
 
 def load_data(args) -> Dict[str, str]:
     data: Dict[str, str] = {}
+    # A file (--data) and/or the inline JSON the app's render worker jobs pass (--client-data)
+    sources: List[str] = []
     if args.data_path:
         try:
             with open(args.data_path, 'r', encoding='utf-8') as f:
-                loaded = json.load(f)
+                sources.append(f.read())
+        except OSError as e:
+            print(f"[WARN] تعذر قراءة JSON: {e}")
+    if args.client_data:
+        sources.append(args.client_data)
+    for text in sources:
+        try:
+            loaded = json.loads(text)
             if not isinstance(loaded, dict):
                 raise ValueError('JSON يجب أن يكون كائن (object).')
             data.update({k: str(v) for k, v in loaded.items()})
@@ -192,74 +204,9 @@ def load_data(args) -> Dict[str, str]:
 
 
 def replace_paragraph_placeholders(doc, data: Dict[str, str]):
-    # استبدال في الفقرات العادية
-    for para in doc.paragraphs:
-        if '{{' in para.text:
-            original = para.text
-            new_text = original
-
-            # استخدام regex مرن للعثور على placeholders حتى لو كانت معطوبة
-            placeholders_in_text = re.findall(r'{{(\w+)\}?\}?', original)
-
-            # استبدال كل placeholder موجود
-            for key in placeholders_in_text:
-                if key in data:
-                    value = data.get(key, '')
-                    # جرب الأشكال المختلفة للـ placeholder
-                    patterns = [
-                        '{{' + key + '}}',    # {{key}}
-                        '{{' + key + '}',     # {{key}
-                        '{{' + key + '}}}',   # {{key}}}
-                    ]
-                    replaced = False
-                    for pattern in patterns:
-                        if pattern in new_text:
-                            new_text = new_text.replace(pattern, value)
-                            replaced = True
-                            break
-
-                    if not replaced:
-                        # محاولة أخيرة: استبدال باستخدام regex
-                        pattern = '{{' + key + r'\}?\}?'
-                        new_text = re.sub(pattern, value, new_text)
-
-            if new_text != original:
-                para.clear()
-                para.add_run(new_text)
-
-    # استبدال في الجداول (نفس المنطق)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    if '{{' in para.text:
-                        original = para.text
-                        new_text = original
-
-                        placeholders_in_text = re.findall(r'{{(\w+)\}?\}?', original)
-
-                        for key in placeholders_in_text:
-                            if key in data:
-                                value = data.get(key, '')
-                                patterns = [
-                                    '{{' + key + '}}',
-                                    '{{' + key + '}',
-                                    '{{' + key + '}}}',
-                                ]
-                                replaced = False
-                                for pattern in patterns:
-                                    if pattern in new_text:
-                                        new_text = new_text.replace(pattern, value)
-                                        replaced = True
-                                        break
-
-                                if not replaced:
-                                    pattern = '{{' + key + r'\}?\}?'
-                                    new_text = re.sub(pattern, value, new_text)
-
-                        if new_text != original:
-                            para.clear()
-                            para.add_run(new_text)
+    # مرور واحد على نصوص المستند (الفقرات والجداول) مع الحفاظ على تنسيق الـ runs
+    replaced = replace_placeholders(doc.element, data)
+    print(f"[INFO] Replaced {replaced} placeholders")
 
 
 def fill_table_dates(doc, dates: List[str], has_header: bool, table_index: int, date_column: int):
@@ -267,50 +214,232 @@ def fill_table_dates(doc, dates: List[str], has_header: bool, table_index: int,
         raise ValueError('لم يتم العثور على أي جدول في المستند.')
     if table_index < 0 or table_index >= len(doc.tables):
         raise ValueError(f'رقم الجدول خارج النطاق. المستند يحتوي على {len(doc.tables)} جداول.')
-    table = doc.tables[table_index]
+    cells = table_cells(doc, table_index)
     start_index = 1 if has_header else 0
+    LESSON_CELL.ensure_style(doc)
 
     dates_filled = 0
     for i, date_str in enumerate(dates):
         # تأكد من وجود صف كافٍ
-        if (start_index + i) >= len(table.rows):
+        if (start_index + i) >= len(cells):
             break
 
-        row = table.rows[start_index + i]
-        if date_column < 0 or date_column >= len(row.cells):
-            raise ValueError(f'الصف {start_index + i} لا يحتوي على عمود رقم {date_column}. عدد الأعمدة المتاحة: {len(row.cells)}')
+        width = cells.width(start_index + i)
+        if date_column < 0 or date_column >= width:
+            raise ValueError(f'الصف {start_index + i} لا يحتوي على عمود رقم {date_column}. عدد الأعمدة المتاحة: {width}')
 
         # Compact date cell
-        format_cell(row.cells[date_column], date_str)
+        format_cell(cells.cell(start_index + i, date_column), date_str)
         # Try remove fixed row height
         try:
             from docx.enum.table import WD_ROW_HEIGHT_RULE
+            row = cells.row(start_index + i)
             row.height = None
             row.height_rule = WD_ROW_HEIGHT_RULE.AUTO
         except Exception:
             pass
         dates_filled += 1
 
-    print(f"[INFO] Filled {dates_filled} date rows with Arial font size 7")
+    print(f"[INFO] Filled {dates_filled} date rows with Arial font size 12")
+
+
+# -----------------------------
+# Compiled template fast path (compiled_template.py)
+# -----------------------------
+
+COMPILED_KIND = 'traffic_law_lessons'
+# Code whose output the compiled artefact reproduces; editing any of it invalidates the artefact
+COMPILED_SOURCES = tuple(Path(__file__).resolve().with_name(name) for name in (
+    Path(__file__).name, 'placeholder_engine.py', 'compiled_template.py', 'table_fill.py', 'cell_format.py'))
+
+
+def compiled_layout(args) -> Dict[str, Any]:
+    return {'has_header': bool(args.has_header), 'table_index': args.table_index, 'date_column': args.date_column}
+
+
+def prepare_compiled_document(doc, placeholders: Dict[str, str], fill: bool, layout: Dict[str, Any]):
+    """Run the render steps with sentinel values (see compile_template); returns the lesson rows."""
+    replace_paragraph_placeholders(doc, placeholders)
+    if not 0 <= layout['table_index'] < len(doc.tables):
+        raise CompileError(f"Table {layout['table_index']} not found ({len(doc.tables)} tables)")
+    cells = table_cells(doc, layout['table_index'])
+    # fill_table_dates also resets the row height, so a whole w:tr is one fillable region
+    rows = range(1 if layout['has_header'] else 0, len(cells))
+    if fill:
+        fill_table_dates(doc, [cell_sentinel(str(r)) for r in rows], layout['has_header'],
+                         layout['table_index'], layout['date_column'])
+    else:
+        LESSON_CELL.ensure_style(doc)
+    return [(str(r), cells.tr(r)) for r in rows]
 
 
-def main():
-    args = parse_args()
+def compile_card_template(args) -> Dict[str, Any]:
+    """Write <input>.compiled.json for the traffic-law card template and this table layout."""
+    layout = compiled_layout(args)
+    try:
+        artefact = compile_template(args.input, COMPILED_KIND, layout, COMPILED_SOURCES,
+                                    lambda doc, placeholders, fill: prepare_compiled_document(doc, placeholders, fill, layout))
+    except (CompileError, ValueError) as e:
+        print(f"[ERROR] لا يمكن ترجمة القالب: {e}", file=sys.stderr)
+        sys.exit(1)
+    path = write_compiled(args.input, artefact)
+    print(f"[OK] Compiled template: {path} ({len(artefact['parts'])} parts)")
+    return {'output': str(path), 'docx_path': None, 'pdf_path': None}
+
+
+def render_compiled(input_path, args, data: Dict[str, str], dates: List[str]):
+    """The filled card from the compiled template, or None when it is missing, stale or cannot render these values."""
+    with stage('template_load'):
+        compiled = load_compiled(input_path, COMPILED_KIND, compiled_layout(args), COMPILED_SOURCES)
+    if compiled is None:
+        return None
+    start_index = 1 if args.has_header else 0
+    cells = {str(start_index + i): clean_text(date_str) for i, date_str in enumerate(dates)}
+    with stage('fill'):
+        return compiled.render_document(expand_aliases(data), cells)
+
+
+# -----------------------------
+# Render cache (render_cache.py)
+# -----------------------------
+
+# Code behind a cached card besides COMPILED_SOURCES
+CACHE_SOURCES = COMPILED_SOURCES + tuple(Path(__file__).resolve().with_name(name) for name in (
+    'docx_writer.py', 'pdf_overlay.py'))
+
+
+def output_paths(args) -> Dict[str, Path]:
+    """Files a render leaves behind ({format: path}); the cache stores and returns exactly these."""
+    output_path = Path(args.output)
+    pdf_path = output_path if output_path.suffix.lower() == '.pdf' else output_path.with_suffix('.pdf')
+    docx_path = output_path.with_suffix('.docx') if output_path.suffix.lower() == '.pdf' else output_path
+    if args.renderer == 'pdf-overlay':
+        return {'pdf': pdf_path}
+    if args.docx_only:
+        return {'docx': docx_path}
+    return {'docx': docx_path, 'pdf': pdf_path} if args.docx else {'pdf': pdf_path}
+
+
+def card_cache_key(args, data: Dict[str, str], dates: List[str]) -> Optional[str]:
+    """Key of one card: template + code by content, header data, lesson dates, table layout, output formats."""
+    formats = sorted(output_paths(args))
+    overlay = args.renderer == 'pdf-overlay'
+    return render_key(COMPILED_KIND, [args.pdf_template if overlay else args.input, *CACHE_SOURCES], {
+        'renderer': args.renderer,
+        'formats': formats,
+        'pdf_backend': args.pdf_backend if 'pdf' in formats and not overlay else None,
+        'data': normalise_data(data),
+        'start_date': args.start_date,
+        'dates': dates,
+        'layout': None if overlay else compiled_layout(args),
+    })
+
+
+def fetch_cached_card(cache, key: str, args) -> Optional[Dict[str, Any]]:
+    """Copy a cached card to the output paths; the render result, or None on a miss."""
+    targets = output_paths(args)
+    if cache is None:
+        return None
+    with stage('cache'):
+        if not cache.fetch(key, targets):
+            return None
+    annotate(cached=True)
+    for fmt, path in targets.items():
+        print(f"[OK] تم استرجاع الملف من ذاكرة التوليد: {path}")
+        print(f"{fmt.upper()}_PATH={path}")
+    pdf_path = str(targets['pdf']) if 'pdf' in targets else None
+    docx_path = str(targets['docx']) if 'docx' in targets else None
+    return {'output': pdf_path or docx_path, 'docx_path': docx_path, 'pdf_path': pdf_path, 'cached': True}
+
+
+def store_card(cache, key: str, args):
+    """Keep the files of a finished render in the cache."""
+    files = output_paths(args)
+    if cache is not None and all(path.exists() for path in files.values()):
+        with stage('cache'):
+            cache.store(key, files)
+
+
+def render_overlay_card(args, data: Dict[str, str], dates: List[str]):
+    """--renderer pdf-overlay: the card drawn on the PDF template, or None when the renderer cannot run."""
+    output_path = Path(args.output)
+    pdf_path = output_path if output_path.suffix.lower() == '.pdf' else output_path.with_suffix('.pdf')
+    try:
+        with stage('overlay'):
+            info = render_overlay(args.pdf_template, PDF_OVERLAY_LAYOUT, data,
+                                  {'lessons': {'date': [clean_text(d) for d in dates]}}, pdf_path)
+    except OverlayError as e:
+        print(f"[WARN] تعذر الرسم المباشر على قالب PDF، سيتم استخدام قالب Word: {e}")
+        return None
+    for count in info['dropped'].values():
+        print(f"[WARN] {count} حصة لا تتسع في جدول قالب PDF ولم تُرسم")
+    print(f"[OK] تم إنشاء ملف PDF: {pdf_path} (pdf-overlay)")
+    print(f"PDF_PATH={pdf_path}")
+    return {'output': str(pdf_path), 'docx_path': None, 'pdf_path': str(pdf_path)}
+
+
+def main(argv=None):
+    """Run one render. Returns a result dict (output/docx/pdf paths) for the render worker."""
+    args = parse_args(argv)
     if args.placeholders:
         print('\n'.join(PLACEHOLDERS))
-        return
+        return None
+    if args.compile:
+        return compile_card_template(args)
+    try:
+        configure_holidays(args.holidays)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Cannot load the holidays file: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    data = load_data(args)
-    dates = generate_dates(args.start_date, args.sessions, args.date_format)
+    template = args.pdf_template if args.renderer == 'pdf-overlay' else args.input
+    with recording(COMPILED_KIND, args.metrics_file, template=template, renderer=args.renderer), \
+            profiling(args.profile, args.output, args.profile_top, args.profile_memory):
+        return render_card(args)
+
+
+def render_card(args) -> Dict[str, Any]:
+    """One card: the pdf-overlay renderer, or the Word template (then PDF unless --docx-only)."""
+    with stage('load_data'):
+        data = load_data(args)
+    with stage('dates'):
+        dates = generate_dates(args.start_date, args.sessions, args.date_format)
+
+    cache = open_render_cache(args.no_cache, args.cache_dir)
+    if args.renderer == 'pdf-overlay':
+        with stage('cache'):
+            key = card_cache_key(args, data, dates)
+        cached = fetch_cached_card(cache, key, args)
+        if cached is not None:
+            return cached
+        result = render_overlay_card(args, data, dates)
+        if result is not None:
+            store_card(cache, key, args)
+            return result
+        args.renderer = 'docx'
+        annotate(renderer='docx', template=Path(args.input).name)
+
+    with stage('cache'):
+        key = card_cache_key(args, data, dates)
+    cached = fetch_cached_card(cache, key, args)
+    if cached is not None:
+        return cached
 
     input_path = Path(args.input)
     if not input_path.exists():
         print(f"[ERROR] الملف المصدر غير موجود: {input_path}", file=sys.stderr)
         sys.exit(1)
 
-    doc = Document(str(input_path))
-    replace_paragraph_placeholders(doc, data)
-    fill_table_dates(doc, dates, args.has_header, args.table_index, args.date_column)
+    doc = render_compiled(input_path, args, data, dates)
+    if doc is not None:
+        print("[INFO] Rendered from compiled template")
+    else:
+        with stage('template_load'):
+            doc = get_document(input_path)
+        with stage('placeholders'):
+            replace_paragraph_placeholders(doc, data)
+        with stage('table_fill'):
+            fill_table_dates(doc, dates, args.has_header, args.table_index, args.date_column)
 
     # Create temporary DOCX file
     output_path = Path(args.output)
@@ -320,24 +449,30 @@ def main():
         docx_path = output_path
 
     docx_path.parent.mkdir(parents=True, exist_ok=True)
-    doc.save(str(docx_path))
+    with stage('save'):
+        save_docx(doc, str(docx_path), input_path)
+    result = {'output': str(docx_path), 'docx_path': str(docx_path), 'pdf_path': None}
 
     # Determine what output to generate
     if args.docx_only:
         # DOCX only
         print(f"[OK] تم إنشاء الملف: {docx_path}")
         print(f"DOCX_PATH={docx_path}")
+        store_card(cache, key, args)
     else:
         # PDF by default (unless --docx-only specified)
-        if convert is None:
-            print("[ERROR] تحتاج لتثبيت المكتبة docx2pdf: pip install docx2pdf", file=sys.stderr)
+        backend = get_backend(args.pdf_backend)
+        if backend is None:
+            print(f"[ERROR] لا يوجد محرك PDF متاح ({args.pdf_backend}): ثبّت docx2pdf (Word) أو LibreOffice", file=sys.stderr)
             sys.exit(1)
 
         pdf_path = output_path if output_path.suffix.lower() == '.pdf' else output_path.with_suffix('.pdf')
         try:
-            convert(str(docx_path), str(pdf_path))
-            print(f"[OK] تم إنشاء ملف PDF: {pdf_path}")
+            with stage('pdf'):
+                backend.convert(docx_path, pdf_path, timeout=args.pdf_timeout)
+            print(f"[OK] تم إنشاء ملف PDF: {pdf_path} ({backend.name})")
             print(f"PDF_PATH={pdf_path}")
+            result['output'] = result['pdf_path'] = str(pdf_path)
 
             # Keep DOCX if --docx flag specified, otherwise delete it
             if args.docx:
@@ -346,12 +481,16 @@ def main():
             else:
                 docx_path.unlink(missing_ok=True)
                 print(f"[OK] تم حذف ملف DOCX المؤقت")
+                result['docx_path'] = None
+            store_card(cache, key, args)
         except Exception as e:
             print(f"[ERROR] فشل في تحويل PDF: {e}", file=sys.stderr)
             # Fallback to DOCX if PDF conversion fails
             print(f"[FALLBACK] سيتم استخدام ملف DOCX: {docx_path}")
             print(f"DOCX_PATH={docx_path}")
-            return
+            return result
+
+    return result
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -9,8 +9,12 @@
      - mode=flat  : القالب يحتوي placeholder نصي واحد هو {{ candidates_block }} أو {{ candidates_text }}.
 3. حساب النقاط (dots) للحفاظ على عرض السطر بهدف محاذاة يدوية.
 4. خيار ضبط العرض المستهدف TARGET_LINE_WIDTH عبر وسيط --width (القيمة الافتراضية 70).
-5. خيار تحويل الناتج إلى PDF (--pdf) إن توفرت docx2pdf.
+5. خيار تحويل الناتج إلى PDF (--pdf) عبر docx2pdf أو LibreOffice (--pdf-backend، انظر pdf_backend.py).
 6. استعراض قائمة الـ placeholders المتاحة (--placeholders) بدون توليد ملف.
+7. ذاكرة للملفات المولَّدة (render_cache.py) مفتاحها بصمة القالب والمرشحين والعرض والوضع وصيغ الإخراج؛
+   --no-cache لتجاوزها. بخلاف --skip-if-exists تتغير النتيجة عند تغيّر القالب أو --width.
+8. سطر METRICS= بزمن وذاكرة كل مرحلة (render_metrics.py) بجانب PDF_PATH=؛ --metrics-file يُلحقه بملف JSONL.
+9. --profile لتشغيل التوليد تحت cProfile (ملف .pstats وملخص نصي) و --profile-memory للقطات tracemalloc (render_profile.py).
 
 Placeholders:
     - في وضع block داخل الصف المتكرر: {{ index }}, {{ fullName }}, {{ dots }}
@@ -31,25 +35,26 @@ Placeholders:
 """
 from __future__ import annotations
 import argparse
+import importlib.util
 import json
 import os
 import sys
 from typing import List, Dict, Any
 from pathlib import Path
 
-try:
-    # محاولة استيراد docx2pdf (يتطلب Word على Windows أو استخدام ماك)
-    from docx2pdf import convert as docx2pdf_convert
-    DOCX2PDF_AVAILABLE = True
-except Exception:
-    DOCX2PDF_AVAILABLE = False
-
-try:
-    from docxtpl import DocxTemplate
-except ImportError:
+# docxtpl (Jinja2, python-docx, lxml) is imported by template_cache on the first render, so
+# --placeholders, argument errors, --skip-if-exists and render-cache hits do not load it
+if importlib.util.find_spec('docxtpl') is None:
     print("[ERROR] تحتاج لتثبيت المكتبة docxtpl أولاً: pip install docxtpl", file=sys.stderr)
     sys.exit(1)
 
+from template_cache import get_docx_template
+from docx_writer import save_docx
+from pdf_backend import DEFAULT_TIMEOUT as PDF_TIMEOUT, PDF_BACKENDS, get_backend
+from render_cache import open_render_cache, render_key
+from render_metrics import annotate, recording, stage
+from render_profile import DEFAULT_TOP as PROFILE_TOP, profiling
+
 # -----------------------------
 # دالة طباعة آمنة (تجنب UnicodeEncodeError في cp1252)
 # -----------------------------
@@ -150,31 +155,75 @@ def render_doc(template_path: str, output_path: str, context: Dict[str, Any]):
     if not os.path.exists(template_path):
         raise FileNotFoundError(f"القالب غير موجود: {template_path}")
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    doc = DocxTemplate(template_path)
-    doc.render(context)
-    doc.save(output_path)
+    with stage('template_load'):
+        doc = get_docx_template(template_path)
+    with stage('placeholders'):
+        doc.render(context)
+    # DocxTemplate.save() with the untouched parts copied straight from the template
+    with stage('save'):
+        doc.pre_processing()
+        save_docx(doc.docx, output_path, template_path)
+        doc.post_processing(output_path)
+    doc.is_saved = True
+
+
+# -----------------------------
+# ذاكرة الملفات المولَّدة (render_cache.py)
+# -----------------------------
+
+CACHE_SOURCES = tuple(Path(__file__).resolve().with_name(name) for name in (
+    Path(__file__).name, 'docx_writer.py'))
+
+
+def output_paths(args) -> Dict[str, Path]:
+    """Files a render leaves behind ({format: path}); the cache stores and returns exactly these."""
+    pdf_path = Path(args.output).resolve().with_suffix('.pdf')
+    if args.pdf_only:
+        return {'pdf': pdf_path}
+    return {'docx': Path(args.output), 'pdf': pdf_path} if args.pdf else {'docx': Path(args.output)}
+
+
+def deposit_cache_key(args, context: Dict[str, Any]):
+    formats = sorted(output_paths(args))
+    return render_key('deposit', [args.template, *CACHE_SOURCES], {
+        'formats': formats,
+        'pdf_backend': args.pdf_backend if 'pdf' in formats else None,
+        'context': context,
+    })
 
 
 # -----------------------------
 # CLI
 # -----------------------------
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='Generate Deposit Word File from template (Arabic).')
     parser.add_argument('--template', default='resources/templates/ملف الإيداع.docx', help='مسار القالب.')
     parser.add_argument('--output', default='output/ملف الإيداع.docx', help='مسار الإخراج.')
     parser.add_argument('--json', dest='json_path', help='ملف JSON للمرشحين (اختياري).')
     parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help='TARGET_LINE_WIDTH')
     parser.add_argument('--mode', choices=['flat', 'block'], default='flat', help='وضع القالب: flat نص واحد أو block تكرار صف.')
-    parser.add_argument('--pdf', action='store_true', help='تحويل الناتج إلى PDF (يتطلب docx2pdf)')
+    parser.add_argument('--pdf', action='store_true', help='تحويل الناتج إلى PDF (يتطلب docx2pdf أو LibreOffice)')
+    parser.add_argument('--pdf-backend', choices=PDF_BACKENDS, default='auto',
+                        help='محرك التحويل إلى PDF: docx2pdf (Word) أو libreoffice (soffice بدون واجهة). افتراضي auto.')
+    parser.add_argument('--pdf-timeout', type=float, default=PDF_TIMEOUT, help='مهلة تحويل الملف إلى PDF بالثواني.')
     parser.add_argument('--placeholders', action='store_true', help='عرض قائمة الحقول (placeholders) المتاحة ثم الخروج.')
     parser.add_argument('--pdf-only', action='store_true', help='إنتاج PDF فقط (يحذف ملف DOCX بعد نجاح التحويل).')
     parser.add_argument('--skip-if-exists', action='store_true', help='يتخطى التوليد إذا كان الملف الهدف (و PDF عند طلبه) موجوداً بالفعل.')
-    return parser.parse_args()
+    parser.add_argument('--no-cache', action='store_true', help='تجاهل ذاكرة الملفات المولَّدة (توليد كامل بدون قراءة أو تخزين).')
+    parser.add_argument('--cache-dir', help='مجلد ذاكرة الملفات المولَّدة (افتراضي RENDER_CACHE_DIR أو .render_cache).')
+    parser.add_argument('--metrics-file', help='ملف JSONL يُلحق به سجل METRICS لكل توليد (افتراضي HYPERDRIVE_METRICS_FILE).')
+    parser.add_argument('--profile', nargs='?', const='', metavar='PSTATS',
+                        help='تشغيل التوليد تحت cProfile وكتابة ملف .pstats وملخص نصي (افتراضي بجانب ملف الإخراج).')
+    parser.add_argument('--profile-top', type=int, default=PROFILE_TOP, help='عدد الدوال في ملخص --profile.')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='لقطات tracemalloc بين تحميل القالب والحفظ (أبطأ بكثير)، مع --profile.')
+    return parser.parse_args(argv)
 
 
-def main():
-    args = parse_args()
+def main(argv=None):
+    """Run one render. Returns a result dict (output/docx/pdf paths) for the render worker."""
+    args = parse_args(argv)
 
     if args.placeholders:
         safe_print("[INFO] Placeholders:")
@@ -185,18 +234,28 @@ def main():
         safe_print("- dots: سلسلة من النقاط لتعبئة الفراغ قبل اللاحقة ' (ب)'.")
         safe_print("- يمكنك تعديل العرض المستهدف بالنطاق --width.")
         safe_print("- في وضع block ضع حلقة Jinja2 مثل: {% for c in candidates %} |{{ c.index }} - {{ c.fullName }} {{ c.dots }} (ب)| {% endfor %}")
-        return
-
-    if args.json_path:
-        try:
-            candidates = load_candidates_from_json(args.json_path)
-        except Exception as e:
-            safe_print(f"[WARN] فشل تحميل JSON: {e}. سيتم استخدام قائمة افتراضية.")
+        return None
+
+    with recording('deposit', args.metrics_file, template=args.template, mode=args.mode), \
+            profiling(args.profile, args.output, args.profile_top, args.profile_memory):
+        return generate(args)
+
+
+def generate(args) -> Dict[str, Any]:
+    """The deposit file for the candidates of --json (or the default list), then PDF on request."""
+    with stage('load_data'):
+        if args.json_path:
+            try:
+                candidates = load_candidates_from_json(args.json_path)
+            except Exception as e:
+                safe_print(f"[WARN] فشل تحميل JSON: {e}. سيتم استخدام قائمة افتراضية.")
+                candidates = default_candidates()
+        else:
             candidates = default_candidates()
-    else:
-        candidates = default_candidates()
 
-    context = build_context(candidates, args.width, args.mode)
+    with stage('context'):
+        context = build_context(candidates, args.width, args.mode)
+    annotate(candidates=len(candidates))
 
     output_exists = os.path.exists(args.output)
     pdf_target_path = Path(args.output).with_suffix('.pdf')
@@ -205,9 +264,32 @@ def main():
 
     if args.skip_if_exists and output_exists and (not pdf_wanted or (pdf_wanted and pdf_exists)):
         safe_print('[SKIP] الملفات موجودة مسبقاً وتم تجاوز إعادة التوليد (--skip-if-exists).')
+        annotate(skipped=True)
         if pdf_wanted and pdf_exists:
             print(f"PDF_PATH={pdf_target_path}")
-        return
+        return {
+            'output': str(pdf_target_path if pdf_wanted else args.output),
+            'docx_path': args.output,
+            'pdf_path': str(pdf_target_path) if pdf_wanted else None,
+            'skipped': True,
+        }
+
+    cache = open_render_cache(args.no_cache, args.cache_dir)
+    targets = output_paths(args)
+    with stage('cache'):
+        key = deposit_cache_key(args, context)
+        cached = cache is not None and cache.fetch(key, targets)
+    if cached:
+        annotate(cached=True)
+        safe_print("[OK] تم استرجاع الملف من ذاكرة التوليد:", ', '.join(str(p) for p in targets.values()))
+        if 'pdf' in targets:
+            print(f"PDF_PATH={targets['pdf']}")
+        return {
+            'output': str(targets.get('pdf', targets.get('docx'))),
+            'docx_path': str(targets['docx']) if 'docx' in targets else None,
+            'pdf_path': str(targets['pdf']) if 'pdf' in targets else None,
+            'cached': True,
+        }
 
     try:
         render_doc(args.template, args.output, context)
@@ -215,27 +297,38 @@ def main():
         safe_print(f"[ERROR] فشل إنشاء الملف: {e}")
         sys.exit(1)
     safe_print("[OK] تم إنشاء الملف بنجاح:", args.output)
+    result = {'output': args.output, 'docx_path': args.output, 'pdf_path': None}
 
     if args.pdf or args.pdf_only:
-        if not DOCX2PDF_AVAILABLE:
-            safe_print("[WARN] تم طلب PDF ولكن مكتبة docx2pdf غير مثبّتة أو غير صالحة هنا.")
+        backend = get_backend(args.pdf_backend)
+        if backend is None:
+            safe_print(f"[WARN] تم طلب PDF ولكن لا يوجد محرك تحويل متاح هنا ({args.pdf_backend}): docx2pdf أو LibreOffice.")
             print("PDF_PATH=", '')
-            return
+            return result
         try:
             output_path = Path(args.output).resolve()
             pdf_path = output_path.with_suffix('.pdf')
-            docx2pdf_convert(str(output_path), str(pdf_path))
+            with stage('pdf'):
+                backend.convert(output_path, pdf_path, timeout=args.pdf_timeout)
             safe_print("[OK] تم إنشاء ملف PDF:", pdf_path)
             print(f"PDF_PATH={pdf_path}")
+            result['output'] = result['pdf_path'] = str(pdf_path)
             if getattr(args, 'pdf_only', False):
                 try:
                     output_path.unlink(missing_ok=True)  # Python 3.8+ safe removal
                     safe_print("[INFO] تم حذف ملف DOCX (وضع PDF فقط).")
+                    result['docx_path'] = None
                 except Exception as del_err:
                     safe_print(f"[WARN] تعذر حذف ملف DOCX: {del_err}")
         except Exception as e:
             safe_print(f"[WARN] فشل التحويل إلى PDF: {e}")
             print("PDF_PATH=", '')
+            return result
+
+    if cache is not None and all(path.exists() for path in targets.values()):
+        with stage('cache'):
+            cache.store(key, targets)
+    return result
 
 
 if __name__ == '__main__':
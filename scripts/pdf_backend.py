@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+طبقة تحويل DOCX إلى PDF قابلة للاستبدال (PDF backends).
+
+docx2pdf يشغّل Microsoft Word، فلا يعمل على خادم Linux، وكان كل طلب PDF هناك
+يعود بصمت إلى ملف DOCX. الواجهات المتاحة:
+
+- docx2pdf: Word على Windows/macOS (كما كان).
+- libreoffice: مجموعة (pool) من عمليات soffice --headless تبقى تعمل وتستقبل التحويلات:
+  - لكل عملية ملف تعريف (profile) ومنفذ خاصان بها، وتُشغَّل عند أول تحويل.
+  - طابور: كل تحويل يأخذ أول محوّل متاح، وينتظر حتى انتهاء المهلة.
+  - مهلة لكل تحويل: إذا علق المحوّل تُقتل العملية، ويُعاد تشغيلها عند التحويل التالي،
+    ويفشل هذا التحويل وحده.
+  - إذا ماتت العملية أو انقطع الاتصال يُعاد تشغيلها وتُعاد المحاولة مرة واحدة.
+  - التحويل عبر UNO إن وُجدت وحدة uno في Python الحالي. بدونها يُستدعى
+    soffice --convert-to لكل ملف، مع نفس ملف التعريف الجاهز.
+- auto: docx2pdf على Windows/macOS إن كان مثبتاً، وإلا libreoffice إن وُجد soffice.
+
+المحوّلات تبقى جاهزة طوال عمر العملية، فيعيد render_worker.py استخدامها بين المهام.
+تُغلق عند الخروج. ملف PDF يُكتب أولاً باسم مؤقت ثم يُنقل إلى مكانه، فلا يبقى ملف
+ناقص بعد مهلة أو عطل.
+
+الاستخدام من الكود:
+    from pdf_backend import get_backend
+    backend = get_backend('auto')          # None إذا لم تتوفر أي واجهة
+    backend.convert('card.docx', 'card.pdf', timeout=120)
+
+متغيرات البيئة:
+- SOFFICE_PATH: مسار soffice.
+- PDF_POOL_SIZE: عدد عمليات soffice، والافتراضي 1.
+"""
+from __future__ import annotations
+import atexit
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+PDF_BACKENDS = ('auto', 'docx2pdf', 'libreoffice')
+DEFAULT_TIMEOUT = 120.0
+STARTUP_TIMEOUT = 60.0
+
+_SOFFICE_CANDIDATES = (
+    'soffice',
+    'libreoffice',
+    '/usr/lib/libreoffice/program/soffice',
+    '/opt/libreoffice/program/soffice',
+    '/Applications/LibreOffice.app/Contents/MacOS/soffice',
+    r'C:\Program Files\LibreOffice\program\soffice.exe',
+)
+
+
+class ConversionError(Exception):
+    """A document could not be converted to PDF."""
+
+
+def find_soffice() -> Optional[str]:
+    """Path of the LibreOffice executable (SOFFICE_PATH first), or None."""
+    configured = os.environ.get('SOFFICE_PATH')
+    for candidate in ((configured,) if configured else ()) + _SOFFICE_CANDIDATES:
+        found = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if found:
+            return found
+    return None
+
+
+def uno_available() -> bool:
+    try:
+        import uno  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# -----------------------------
+# Process helpers
+# -----------------------------
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _spawn(cmd) -> subprocess.Popen:
+    # Own process group: soffice forks soffice.bin, and a hung converter must die as a whole
+    if os.name == 'posix':
+        extra = {'start_new_session': True}
+    else:
+        extra = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, **extra)
+
+
+def _kill(process: Optional[subprocess.Popen]):
+    if process is None or process.poll() is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        pass
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+
+
+def _run_with_timeout(fn: Callable[[], None], timeout: float) -> bool:
+    """Run fn in a helper thread; False if it is still running after `timeout` seconds."""
+    outcome: Dict[str, BaseException] = {}
+
+    def target():
+        try:
+            fn()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        return False
+    if 'error' in outcome:
+        raise outcome['error']
+    return True
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+
+class Docx2PdfBackend:
+    """Microsoft Word through docx2pdf (Windows/macOS)."""
+
+    name = 'docx2pdf'
+
+    def __init__(self):
+        from docx2pdf import convert
+        self._convert = convert
+
+    @staticmethod
+    def available() -> bool:
+        if sys.platform not in ('win32', 'darwin'):
+            return False
+        try:
+            import docx2pdf  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def convert(self, docx_path, pdf_path, timeout: Optional[float] = None):
+        self._convert(str(docx_path), str(pdf_path))
+        if not Path(pdf_path).exists():
+            raise ConversionError(f'docx2pdf produced no file: {pdf_path}')
+
+    def close(self):
+        pass
+
+
+class _Converter:
+    """One warm soffice listener with its own profile (and UNO connection)."""
+
+    def __init__(self, soffice: str, index: int, use_uno: bool):
+        self.soffice = soffice
+        self.use_uno = use_uno
+        self.profile = Path(tempfile.mkdtemp(prefix=f'soffice-pool-{index}-'))
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.conversions = 0
+        self.restarts = 0
+
+    def _base_cmd(self):
+        return [self.soffice, '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+                '--nolockcheck', f'-env:UserInstallation={self.profile.as_uri()}']
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None and self.desktop is not None
+
+    def start(self):
+        import uno
+
+        port = _free_port()
+        url = f'socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext'
+        self.process = _spawn(self._base_cmd() + [f'--accept={url}'])
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f'uno:{url}')
+                break
+            except Exception:
+                # NoConnectException until soffice is listening
+                if self.process.poll() is not None:
+                    raise ConversionError('soffice exited during startup')
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionError(f'soffice did not accept connections within {STARTUP_TIMEOUT:.0f}s')
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def stop(self):
+        self.desktop = None
+        _kill(self.process)
+        self.process = None
+
+    def discard(self):
+        self.stop()
+        shutil.rmtree(self.profile, ignore_errors=True)
+
+    def _store(self, src: Path, dst: Path):
+        import uno
+
+        def props(**values):
+            result = []
+            for name, value in values.items():
+                prop = uno.createUnoStruct('com.sun.star.beans.PropertyValue')
+                prop.Name, prop.Value = name, value
+                result.append(prop)
+            return tuple(result)
+
+        doc = self.desktop.loadComponentFromURL(src.as_uri(), '_blank', 0, props(Hidden=True, ReadOnly=True))
+        if doc is None:
+            raise ConversionError(f'LibreOffice could not open {src}')
+        try:
+            doc.storeToURL(dst.as_uri(), props(FilterName='writer_pdf_Export'))
+        finally:
+            doc.close(True)
+
+    def _convert_uno(self, src: Path, tmp: Path, timeout: float):
+        for attempt in (1, 2):
+            if not self.alive():
+                if self.process is not None:
+                    self.restarts += 1
+                self.stop()
+                self.start()
+            try:
+                finished = _run_with_timeout(lambda: self._store(src, tmp), timeout)
+            except ConversionError:
+                raise
+            except Exception as e:
+                # Bridge disposed / soffice crashed: restart and retry once
+                self.stop()
+                self.restarts += 1
+                if attempt == 2:
+                    raise ConversionError(f'soffice failed: {type(e).__name__}: {e}') from e
+                continue
+            if not finished:
+                self.stop()
+                self.restarts += 1
+                raise ConversionError(f'Conversion timed out after {timeout:.0f}s (converter restarted)')
+            return
+
+    def _convert_cli(self, src: Path, tmp: Path, timeout: float):
+        outdir = Path(tempfile.mkdtemp(prefix='soffice-out-', dir=self.profile.parent))
+        try:
+            self.process = _spawn(self._base_cmd() + ['--convert-to', 'pdf:writer_pdf_Export',
+                                                      '--outdir', str(outdir), str(src)])
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.restarts += 1
+                raise ConversionError(f'Conversion timed out after {timeout:.0f}s (converter killed)')
+            finally:
+                _kill(self.process)
+                self.process = None
+            produced = outdir / (src.stem + '.pdf')
+            if not produced.exists():
+                raise ConversionError(f'LibreOffice produced no PDF for {src}')
+            os.replace(produced, tmp)
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+
+    def convert(self, src: Path, dst: Path, timeout: float):
+        tmp = dst.with_name(dst.name + '.part')
+        try:
+            if self.use_uno:
+                self._convert_uno(src, tmp, timeout)
+            else:
+                self._convert_cli(src, tmp, timeout)
+            os.replace(tmp, dst)
+            self.conversions += 1
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+
+class LibreOfficeBackend:
+    """A queue of warm headless soffice converters (see module docstring)."""
+
+    name = 'libreoffice'
+
+    def __init__(self, size: Optional[int] = None, soffice: Optional[str] = None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise ConversionError('LibreOffice (soffice) not found; set SOFFICE_PATH')
+        self.size = max(1, size or int(os.environ.get('PDF_POOL_SIZE', '1')))
+        self.use_uno = uno_available()
+        self._converters = [_Converter(self.soffice, i, self.use_uno) for i in range(self.size)]
+        self._idle: 'queue.Queue[_Converter]' = queue.Queue()
+        for converter in self._converters:
+            self._idle.put(converter)
+
+    @staticmethod
+    def available() -> bool:
+        return find_soffice() is not None
+
+    def convert(self, docx_path, pdf_path, timeout: Optional[float] = None):
+        timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+        src, dst = Path(docx_path).resolve(), Path(pdf_path).resolve()
+        try:
+            converter = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise ConversionError(f'No free converter within {timeout:.0f}s')
+        try:
+            converter.convert(src, dst, timeout)
+        finally:
+            self._idle.put(converter)
+
+    def info(self) -> Dict[str, object]:
+        return {
+            'backend': self.name,
+            'mode': 'uno' if self.use_uno else 'convert-to',
+            'size': self.size,
+            'running': sum(1 for c in self._converters if c.alive()),
+            'conversions': sum(c.conversions for c in self._converters),
+            'restarts': sum(c.restarts for c in self._converters),
+        }
+
+    def close(self):
+        for converter in self._converters:
+            converter.discard()
+
+
+# -----------------------------
+# Process-wide backends
+# -----------------------------
+
+_BACKEND_CLASSES = {'docx2pdf': Docx2PdfBackend, 'libreoffice': LibreOfficeBackend}
+_backends: Dict[str, object] = {}
+
+
+def resolve_backend_name(name: Optional[str]) -> Optional[str]:
+    """'auto' -> the backend usable here ('docx2pdf' / 'libreoffice'), or None."""
+    name = name or 'auto'
+    if name != 'auto':
+        return name
+    if Docx2PdfBackend.available():
+        return 'docx2pdf'
+    if LibreOfficeBackend.available():
+        return 'libreoffice'
+    return None
+
+
+def get_backend(name: Optional[str] = 'auto', size: Optional[int] = None):
+    """Shared backend instance for `name` (kept warm for the process), or None if unavailable.
+
+    `size` is the number of soffice converters, used when the LibreOffice pool is first created.
+    """
+    resolved = resolve_backend_name(name)
+    if resolved is None:
+        return None
+    if resolved not in _BACKEND_CLASSES:
+        raise ValueError(f'Unknown PDF backend: {resolved} (choose from {", ".join(PDF_BACKENDS)})')
+    backend = _backends.get(resolved)
+    if backend is None:
+        try:
+            backend = LibreOfficeBackend(size) if resolved == 'libreoffice' else Docx2PdfBackend()
+        except (ImportError, ConversionError):
+            return None
+        _backends[resolved] = backend
+    return backend
+
+
+def backends_info() -> Dict[str, object]:
+    """State of the backends started in this process (for the render worker's ping)."""
+    return {name: backend.info() if hasattr(backend, 'info') else {'backend': name}
+            for name, backend in _backends.items()}
+
+
+def close_backends():
+    for backend in _backends.values():
+        try:
+            backend.close()
+        except Exception:
+            pass
+    _backends.clear()
+
+
+atexit.register(close_backends)
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+رسم البطاقات مباشرة على قوالب PDF الجاهزة (resources/templates/*.pdf) بدون DOCX.
+
+بدل تعبئة قالب Word ثم تحويله إلى PDF (Word أو LibreOffice، عدة ثوانٍ)، تُكتب
+بيانات العميل وتواريخ/ساعات الحصص فوق صفحة القالب PDF في إحداثيات محددة مسبقاً:
+
+- قالب PDF يُقرأ مرة واحدة لكل عملية (مفتاح: المسار + mtime/الحجم)، وكل توليد
+  ينسخ كائناته فقط؛ محتوى صفحات القالب لا يُفك ضغطه ولا يُعاد ترميزه.
+- طبقة النص تُرسم بـ reportlab في صفحة PDF صغيرة، ثم تُضاف إلى صفحة القالب
+  ككائن Form XObject (بدون دمج تدفقات المحتوى).
+- النص العربي يُشكَّل (arabic_reshaper) ويُرتب من اليمين إلى اليسار (python-bidi)،
+  بخط من src/fonts (Amiri افتراضياً) يُضمَّن جزئياً في الملف.
+
+تخطيط كل بطاقة (الإحداثيات بالنقاط من أسفل يسار الصفحة) قاموس عادي في سكربت
+البطاقة، بنفس أسلوب TABLES_CONFIG:
+
+    {
+        'font': 'Amiri-Regular.ttf', 'size': 10, 'bold': True,
+        'fields': [{'text': '{fullName}', 'page': 0, 'x': 228, 'y': 408.6, 'width': 190}],
+        'tables': {'table1': {'page': 1, 'first_y': 533.3, 'pitch': 12.96, 'rows': 30,
+                              'columns': {'date': 288.65}}},
+    }
+
+- fields: نص بصيغة str.format من قيم الـ placeholders؛ align = center (افتراضي) أو
+  right أو left حول x؛ width (اختياري) يصغّر الخط حتى يتسع النص.
+- tables: صفوف متساوية الارتفاع، الصف i على الخط first_y - i * pitch، والأعمدة
+  بمراكزها الأفقية. القيم الزائدة عن rows لا تُرسم (وتُعاد في dropped).
+
+المتطلبات (اختيارية، مطلوبة فقط مع --renderer pdf-overlay):
+    pip install reportlab pypdf arabic-reshaper python-bidi
+تُستورد عند أول رسم فقط (حوالي 100ms)، فاستيراد هذه الوحدة لا يكلف شيئاً مع DOCX.
+
+الاستخدام من الكود:
+    from pdf_overlay import render_overlay
+    info = render_overlay('resources/templates/ملف المتابعة.pdf', LAYOUT,
+                          {'fullName': 'أحمد بن صالح'}, {'table1': {'date': dates}}, 'out.pdf')
+"""
+from __future__ import annotations
+import io
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+RENDERERS = ('docx', 'pdf-overlay')
+INSTALL_HINT = 'pip install reportlab pypdf arabic-reshaper python-bidi'
+
+FONTS_DIR = Path(__file__).resolve().parent.parent / 'src' / 'fonts'
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / 'resources' / 'templates'
+
+DEFAULT_FONT = 'Amiri-Regular.ttf'
+DEFAULT_SIZE = 10
+MIN_FIT_SIZE = 6
+# Stroke width of the simulated bold (fill + stroke text render mode), in points
+BOLD_STROKE = 0.3
+
+_ARABIC = re.compile('[\u0600-\u06ff\u0750-\u077f\u08a0-\u08ff\ufb50-\ufdff\ufe70-\ufeff]')
+_OVERLAY_NAME = '/HDOverlay'
+
+
+class OverlayError(Exception):
+    """The PDF overlay renderer cannot run (missing packages, template or font)."""
+
+
+def shape(text: str) -> str:
+    """Visual-order text for a PDF: Arabic letters joined and RTL runs reordered."""
+    if not text or not _ARABIC.search(text):
+        return text
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+
+    return get_display(arabic_reshaper.reshape(text))
+
+
+# -----------------------------
+# Fonts and templates, loaded once per process
+# -----------------------------
+
+_fonts: Dict[str, str] = {}
+_templates: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+
+def font_name(font_file: str) -> str:
+    """reportlab name of a TTF from src/fonts (or an absolute path), registered on first use."""
+    name = _fonts.get(font_file)
+    if name is None:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        path = Path(font_file)
+        if not path.is_absolute():
+            path = FONTS_DIR / font_file
+        if not path.exists():
+            raise OverlayError(f'Font not found: {path}')
+        name = 'HD-' + path.stem
+        pdfmetrics.registerFont(TTFont(name, str(path)))
+        _fonts[font_file] = name
+    return name
+
+
+def template_reader(path) -> 'PdfReader':
+    """Parsed PDF template, reloaded when the file changes on disk."""
+    from pypdf import PdfReader
+
+    path = Path(path).resolve()
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise OverlayError(f'PDF template not found: {path}')
+    stat_key = (st.st_mtime_ns, st.st_size)
+    cached = _templates.get(str(path))
+    if cached is None or cached[0] != stat_key:
+        with open(path, 'rb') as f:
+            reader = PdfReader(io.BytesIO(f.read()))
+        cached = _templates[str(path)] = (stat_key, reader)
+    return cached[1]
+
+
+# -----------------------------
+# Drawing
+# -----------------------------
+
+def _draw(c, text: str, x: float, y: float, font: str, size: float, bold: bool,
+          align: str = 'center', width: Optional[float] = None):
+    from reportlab.pdfbase import pdfmetrics
+
+    text = shape(text)
+    text_width = pdfmetrics.stringWidth(text, font, size)
+    if width and text_width > width:
+        fitted = max(MIN_FIT_SIZE, size * width / text_width)
+        text_width = text_width * fitted / size
+        size = fitted
+    if align == 'center':
+        x -= text_width / 2
+    elif align == 'right':
+        x -= text_width
+    t = c.beginText(x, y)
+    t.setFont(font, size)
+    if bold:
+        t.setTextRenderMode(2)
+    t.textOut(text)
+    c.drawText(t)
+
+
+def _overlay_pages(layout: Dict[str, Any], page_sizes: List[Tuple[float, float]],
+                   fields: Dict[str, str], tables: Dict[str, Dict[str, List[str]]]):
+    """One-page-per-template-page PDF holding only the text; returns (bytes, used pages, dropped rows)."""
+    from reportlab.pdfgen import canvas
+
+    font = font_name(layout.get('font', DEFAULT_FONT))
+    size = layout.get('size', DEFAULT_SIZE)
+    bold = layout.get('bold', False)
+
+    by_page: Dict[int, List[Tuple]] = {}
+    for spec in layout.get('fields', ()):
+        text = spec['text'].format_map(_Blank(fields)).strip(' -')
+        if text:
+            by_page.setdefault(spec.get('page', 0), []).append(
+                (text, spec['x'], spec['y'], spec.get('size', size), spec.get('align', 'center'), spec.get('width')))
+    dropped: Dict[str, int] = {}
+    for key, spec in layout.get('tables', {}).items():
+        columns = tables.get(key) or {}
+        for column, values in columns.items():
+            x = spec['columns'].get(column)
+            if x is None or values is None:
+                continue
+            for i, value in enumerate(values[:spec['rows']]):
+                if value:
+                    by_page.setdefault(spec.get('page', 0), []).append(
+                        (value, x, spec['first_y'] - i * spec['pitch'], spec.get('size', size), 'center', spec.get('width')))
+            if len(values) > spec['rows']:
+                dropped[key] = max(dropped.get(key, 0), len(values) - spec['rows'])
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=page_sizes[0], pageCompression=1)
+    for index, page_size in enumerate(page_sizes):
+        c.setPageSize(page_size)
+        c.setLineWidth(BOLD_STROKE)
+        for text, x, y, text_size, align, width in by_page.get(index, ()):
+            _draw(c, text, x, y, font, text_size, bold, align, width)
+        c.showPage()
+    c.save()
+    return buffer.getvalue(), set(by_page), dropped
+
+
+class _Blank(dict):
+    """format_map source where missing placeholders render as empty text."""
+
+    def __missing__(self, key):
+        return ''
+
+
+def _stamp(writer, page, overlay_page, name: str):
+    """Draw `overlay_page` over `page` as a Form XObject, leaving the page's own streams untouched."""
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+
+    form = DecodedStreamObject()
+    form.set_data(overlay_page.get_contents().get_data())
+    form.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): overlay_page.mediabox,
+        NameObject('/Resources'): overlay_page['/Resources'].clone(writer),
+    })
+    form_ref = writer._add_object(form.flate_encode())
+
+    resources = page.get('/Resources')
+    resources = DictionaryObject() if resources is None else resources.get_object()
+    page[NameObject('/Resources')] = resources
+    xobjects = resources.get('/XObject')
+    if xobjects is None:
+        xobjects = resources[NameObject('/XObject')] = DictionaryObject()
+    xobjects.get_object()[NameObject(name)] = form_ref
+
+    # q ... Q around the template content so its graphics state cannot shift the overlay
+    before = DecodedStreamObject()
+    before.set_data(b'q\n')
+    after = DecodedStreamObject()
+    after.set_data(f'\nQ q {name} Do Q\n'.encode('ascii'))
+    contents = page.raw_get('/Contents') if '/Contents' in page else None
+    existing = contents.get_object() if contents is not None else None
+    streams = list(existing) if isinstance(existing, ArrayObject) else ([contents] if contents is not None else [])
+    page[NameObject('/Contents')] = ArrayObject(
+        [writer._add_object(before), *streams, writer._add_object(after)])
+
+
+def render_overlay(template_path, layout: Dict[str, Any], fields: Dict[str, str],
+                   tables: Dict[str, Dict[str, List[str]]], output_path) -> Dict[str, Any]:
+    """Write `template_path` with `fields` and `tables` drawn on it (see module docstring) to `output_path`.
+
+    Returns {'pages': pages drawn on, 'dropped': {table: values beyond its rows}}."""
+    try:
+        import arabic_reshaper  # noqa: F401
+        import bidi.algorithm  # noqa: F401
+        from pypdf import PdfReader, PdfWriter
+        import reportlab.pdfgen.canvas  # noqa: F401
+    except ImportError:
+        raise OverlayError(f'PDF overlay renderer needs: {INSTALL_HINT}')
+    reader = template_reader(template_path)
+    page_sizes = [(float(p.mediabox.width), float(p.mediabox.height)) for p in reader.pages]
+    overlay_bytes, used, dropped = _overlay_pages(layout, page_sizes, fields, tables)
+
+    overlay = PdfReader(io.BytesIO(overlay_bytes))
+    writer = PdfWriter(clone_from=reader)
+    for index in sorted(used):
+        if index < len(writer.pages):
+            _stamp(writer, writer.pages[index], overlay.pages[index], f'{_OVERLAY_NAME}{index}')
+
+    # Same temp file + rename as pdf_backend: PDF_PATH= never points at a half-written file
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    partial = output_path.with_name(output_path.name + '.part')
+    with open(partial, 'wb') as f:
+        writer.write(f)
+    os.replace(partial, output_path)
+    return {'pages': sorted(used), 'dropped': dropped}
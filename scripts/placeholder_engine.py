@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+محرك استبدال المتغيرات ({{key}}) المشترك بين بطاقة المتابعة وبطاقة قانون المرور.
+
+مرور واحد على عُقد w:t في شجرة XML للمستند (الفقرات، الجداول، مربعات النص):
+- تُجمع نصوص كل فقرة ابتداءً من أول '{' فيها، فيُكتشف المتغير حتى لو قسّمه Word
+  على عدة runs (مثل '{{' + 'fullName' + '}}').
+- الصيغ المقبولة كما في السابق: {{key}} و {{key} و {{key}}} (يبقى '}' الزائد).
+- الأسماء المكتوبة خطأ في القوالب تُحل عبر PLACEHOLDER_ALIASES (birtDate -> birthDate ...).
+- تُكتب القيمة في w:t الذي يبدأ فيه المتغير وتُحذف بقية أجزائه من العقد التالية،
+  فتبقى خصائص كل run (الخط، الحجم، الغامق، الاتجاه) كما هي في القالب.
+- المتغيرات غير المعروفة تبقى دون تغيير.
+
+الاستخدام من الكود:
+    from placeholder_engine import replace_placeholders
+    replace_placeholders(doc.element, data)
+"""
+from __future__ import annotations
+import re
+from bisect import bisect_right
+from typing import Dict, List, Mapping, Optional
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_P = f'{{{W_NS}}}p'
+W_T = f'{{{W_NS}}}t'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# {{key}}, {{key} and {{key}}} (the third brace is left in place, as before)
+PLACEHOLDER_RE = re.compile(r'\{\{(\w+)\}{0,2}')
+
+# Misspelled placeholders found in the templates -> the data key they stand for
+PLACEHOLDER_ALIASES = {
+    'birtDate': 'birthDate',
+    'birtPlace': 'birthPlace',
+    'poneNumber': 'phoneNumber',
+    'scoolSubmissionDate': 'schoolSubmissionDate',
+}
+
+
+def expand_aliases(data: Mapping[str, str], aliases: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    """`data` plus every alias whose target key is present."""
+    values = dict(data)
+    for alias, key in (PLACEHOLDER_ALIASES if aliases is None else aliases).items():
+        if key in data:
+            values[alias] = data[key]
+    return values
+
+
+def _paragraph_of(node):
+    parent = node.getparent()
+    while parent is not None and parent.tag != W_P:
+        parent = parent.getparent()
+    return parent
+
+
+def _set_text(node, text: str):
+    # Always preserve: the text now depends on the data, not on the template
+    node.text = text
+    node.set(XML_SPACE, 'preserve')
+
+
+def _splice(nodes: List, values: Mapping[str, str]) -> int:
+    """Substitute the placeholders in one paragraph's w:t run; returns the count replaced."""
+    texts = [node.text or '' for node in nodes]
+    joined = ''.join(texts)
+    if '{{' not in joined:
+        return 0
+    edits = [(m.start(), m.end(), values[m.group(1)])
+             for m in PLACEHOLDER_RE.finditer(joined) if m.group(1) in values]
+    if not edits:
+        return 0
+
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text)
+    out: List[List[str]] = [[] for _ in nodes]
+
+    def emit(i: int, j: int):
+        while i < j:
+            n = bisect_right(starts, i) - 1
+            end = min(j, starts[n + 1]) if n + 1 < len(starts) else j
+            out[n].append(joined[i:end])
+            i = end
+
+    touched = set()
+    pos = 0
+    for start, end, value in edits:
+        emit(pos, start)
+        first = bisect_right(starts, start) - 1
+        out[first].append(value)
+        touched.update(range(first, bisect_right(starts, end - 1)))
+        pos = end
+    emit(pos, len(joined))
+
+    for n in touched:
+        _set_text(nodes[n], ''.join(out[n]))
+    return len(edits)
+
+
+def _paragraph_groups(root) -> Dict[object, List]:
+    """paragraph -> its w:t nodes from the first one containing '{' (document order)."""
+    groups: Dict[object, List] = {}
+    for node in root.iter(W_T):
+        para = _paragraph_of(node)
+        group = groups.get(para)
+        if group is not None:
+            group.append(node)
+        elif node.text and '{' in node.text:
+            groups[para] = [node]
+    return groups
+
+
+def find_placeholders(root) -> List[str]:
+    """Placeholder keys under `root`, in document order without duplicates."""
+    keys: Dict[str, None] = {}
+    for nodes in _paragraph_groups(root).values():
+        for m in PLACEHOLDER_RE.finditer(''.join(node.text or '' for node in nodes)):
+            keys.setdefault(m.group(1))
+    return list(keys)
+
+
+def replace_placeholders(root, data: Mapping[str, str], aliases: Optional[Mapping[str, str]] = None) -> int:
+    """Replace {{key}} placeholders under `root` (e.g. doc.element) in one pass over its w:t nodes.
+
+    Returns the number of placeholders replaced.
+    """
+    values = expand_aliases(data, aliases)
+    return sum(_splice(nodes, values) for nodes in _paragraph_groups(root).values())
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة مؤقتة لملفات DOCX/PDF المولَّدة، معنونة بالمحتوى (content-addressed render cache).
+
+إعادة طباعة بطاقة نفس العميل كانت تعيد التوليد والتحويل إلى PDF كاملين. هنا يُحسب
+مفتاح من كل ما يحدد الملف الناتج:
+
+- بصمة SHA-256 لمحتوى القالب (DOCX أو PDF) وللكود الذي يولّد الملف؛
+- بيانات العميل بعد التطبيع (مفاتيح مرتبة، قيم نصية)؛
+- تاريخ البداية وتواريخ الحصص والساعات المحجوزة (الخطة)؛
+- صيغ الإخراج المطلوبة (docx و/أو pdf) ومحرك التوليد/التحويل.
+
+عند التطابق تُنسخ الملفات المخزنة إلى مسار الإخراج فوراً بدون أي توليد. كل ملف
+مخزن باسم <المفتاح>.<الصيغة> داخل المجلد، ووقت تعديله (mtime) هو آخر استخدام:
+عند تجاوز الحجم الأقصى تُحذف الملفات الأقدم استخداماً أولاً (LRU).
+
+الإعدادات:
+- RENDER_CACHE_DIR: مجلد الذاكرة (افتراضي .render_cache في مجلد العمل)، أو --cache-dir.
+- RENDER_CACHE_MAX_MB: الحجم الأقصى بالميغابايت (افتراضي 256).
+- --no-cache في السكربتات يتجاوز الذاكرة (لا قراءة ولا كتابة).
+
+الاستخدام من الكود:
+    from render_cache import open_render_cache, render_key
+    cache = open_render_cache(args.no_cache, args.cache_dir)
+    key = render_key('candidate_follow_up', [template, *sources], {'data': data, 'plan': plan, ...})
+    if cache and cache.fetch(key, {'docx': out_docx, 'pdf': out_pdf}):
+        ...  # الملفات جاهزة
+    ...
+    cache.store(key, {'docx': out_docx, 'pdf': out_pdf})
+"""
+from __future__ import annotations
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from compiled_template import source_digest
+
+DEFAULT_CACHE_DIR = '.render_cache'
+DEFAULT_MAX_MB = 256
+CACHE_VERSION = 1
+
+
+def normalise_data(data: Mapping[str, Any]) -> Dict[str, str]:
+    """Placeholder values as the renderers see them: text, with None as empty."""
+    return {str(k): '' if v is None else str(v) for k, v in data.items()}
+
+
+def render_key(kind: str, files: Sequence, material: Mapping[str, Any]) -> Optional[str]:
+    """Cache key of one render: `files` (templates + code) by content, `material` as canonical JSON.
+
+    None when a file cannot be read; the render then runs uncached and reports its own error."""
+    try:
+        files_digest = source_digest(files)
+    except OSError:
+        return None
+    payload = json.dumps({'version': CACHE_VERSION, 'kind': kind, 'files': files_digest,
+                          'material': material}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _copy(src: Path, dst: Path):
+    """Copy through a temp file in the target directory so readers never see a partial file."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=dst.name + '.', suffix='.tmp', dir=str(dst.parent))
+    try:
+        with os.fdopen(fd, 'wb') as out, open(src, 'rb') as f:
+            shutil.copyfileobj(f, out, 1 << 20)
+        os.replace(tmp, dst)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+class RenderCache:
+    """Output files keyed by render_key, evicted least-recently-used past max_bytes."""
+
+    def __init__(self, directory=None, max_bytes: Optional[int] = None):
+        self.directory = Path(directory or os.environ.get('RENDER_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('RENDER_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._total: Optional[int] = None  # bytes stored, scanned on the first store
+        self.hits = self.misses = self.evictions = 0
+
+    def path(self, key: str, fmt: str) -> Path:
+        return self.directory / key[:2] / f'{key}.{fmt}'
+
+    def fetch(self, key: Optional[str], targets: Mapping[str, Any]) -> bool:
+        """Copy the cached files of `key` to `targets` ({format: path}); False unless all are cached."""
+        if key is None:
+            return False
+        entries = {fmt: self.path(key, fmt) for fmt in targets}
+        try:
+            if not all(p.is_file() for p in entries.values()):
+                self.misses += 1
+                return False
+            for fmt, target in targets.items():
+                _copy(entries[fmt], Path(target))
+                os.utime(entries[fmt])  # mtime = last use (LRU order)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key: Optional[str], files: Mapping[str, Any]):
+        """Keep copies of `files` ({format: path}) under `key`, then evict past the size limit."""
+        if key is None or self.max_bytes <= 0:
+            return
+        added = 0
+        for fmt, src in files.items():
+            dst = self.path(key, fmt)
+            _copy(Path(src), dst)
+            added += dst.stat().st_size
+        if self._total is None:
+            self._total = sum(size for _, size, _ in self._scan())
+        else:
+            self._total += added
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def _scan(self) -> List[Tuple[int, int, Path]]:
+        entries = []
+        for path in self.directory.glob('??/*.*'):
+            if path.suffix == '.tmp':
+                continue
+            with contextlib.suppress(OSError):
+                st = path.stat()
+                entries.append((st.st_mtime_ns, st.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """Remove least recently used files until the cache fits max_bytes; returns files removed."""
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(OSError):
+                path.unlink()
+                total -= size
+                removed += 1
+        self._total = total
+        self.evictions += removed
+        return removed
+
+    def info(self) -> Dict[str, Any]:
+        entries = self._scan()
+        return {'directory': str(self.directory), 'files': len(entries),
+                'bytes': sum(size for _, size, _ in entries), 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+_caches: Dict[str, RenderCache] = {}
+
+
+def open_render_cache(disabled: bool = False, directory=None) -> Optional[RenderCache]:
+    """The process-wide cache for `directory` (None with --no-cache)."""
+    if disabled:
+        return None
+    cache = RenderCache(directory)
+    return _caches.setdefault(str(cache.directory.resolve()), cache)
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+قياس زمن وذاكرة كل مرحلة توليد (per-stage metrics) في السكربتات الثلاثة.
+
+عندما تستغرق بطاقة 6 ثوانٍ لا نعرف أين ذهب الوقت: تحميل القالب، ملف الحجوزات، تعبئة
+XML أو التحويل إلى PDF. كل سكربت يسجل الآن لكل مرحلة:
+
+- ms: الزمن الفعلي (wall time)؛
+- peak_mb: أعلى ذاكرة مخصَّصة (allocated) خلال المرحلة نفسها، من tracemalloc: يعمل على كل
+  الأنظمة ويُعاد ضبطه في بداية كل مرحلة (reset_peak، Python 3.9+)، فيبقى صحيحاً داخل عامل
+  التوليد الدائم. يحسب ما خصّصه التوليد الحالي فقط، بدون ذاكرة lxml و libxml2 الداخلية.
+  tracemalloc يبطئ التوليد نحو 3 مرات، لذلك لا يعمل إلا عند كتابة السجل إلى ملف
+  (--metrics-file أو HYPERDRIVE_METRICS_FILE) أو تحت --profile-memory؛
+- rss_delta_mb: تغير الذاكرة الفعلية (RSS) خلال المرحلة، من نظام التشغيل (/proc/self/status
+  على Linux، GetProcessMemoryInfo على Windows)، فتشمل ذاكرة lxml؛
+- rss_peak_mb: أعلى ذاكرة فعلية خلال المرحلة، حيث يمكن إعادة ضبط القمة التي يحفظها النظام
+  (/proc/self/clear_refs على Linux)؛ لا يُسجَّل على Windows و macOS.
+
+في نهاية كل توليد يُطبع سطر واحد بجانب PDF_PATH=:
+    METRICS={"script": "candidate_follow_up", "template": "...", "total_ms": 412.3, "stages": {...}}
+ومع --metrics-file (أو متغير البيئة HYPERDRIVE_METRICS_FILE) يُلحق نفس السجل بملف JSONL.
+
+تقرير p50/p95/p99 لكل مرحلة ولكل قالب من ملف السجل:
+    python scripts/render_metrics.py report metrics.jsonl
+    python scripts/render_metrics.py report metrics.jsonl --by script --json
+
+الاستخدام من الكود:
+    from render_metrics import recording, stage
+    with recording('candidate_follow_up', args.metrics_file, template=args.input):
+        with stage('template_load'):
+            doc = get_document(path)
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+METRICS_FILE_ENV = 'HYPERDRIVE_METRICS_FILE'
+PERCENTILES = (50, 95, 99)
+
+
+# -----------------------------
+# Process memory (resident set size)
+# -----------------------------
+
+def _memory_linux() -> Tuple[Optional[float], Optional[float]]:
+    rss = peak = None
+    with open('/proc/self/status', 'rb') as f:
+        for line in f:
+            if line.startswith(b'VmRSS:'):
+                rss = int(line.split()[1]) / 1024
+            elif line.startswith(b'VmHWM:'):
+                peak = int(line.split()[1]) / 1024
+    return rss, peak
+
+
+def _memory_windows() -> Tuple[Optional[float], Optional[float]]:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi = ctypes.windll.psapi
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None, None
+    return counters.WorkingSetSize / 2 ** 20, counters.PeakWorkingSetSize / 2 ** 20
+
+
+def _memory_other() -> Tuple[Optional[float], Optional[float]]:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+# Whether the peak RSS can be reset; None until the first try
+_peak_resettable: Optional[bool] = None
+
+
+def reset_peak_memory() -> bool:
+    """Restart the process peak RSS from the current RSS (Linux 4.0+); False where it cannot be reset."""
+    global _peak_resettable
+    if _peak_resettable is False:
+        return False
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        _peak_resettable = True
+    except OSError:
+        _peak_resettable = False
+    return _peak_resettable
+
+
+def process_memory() -> Tuple[Optional[float], Optional[float]]:
+    """(current RSS, peak RSS) of this process in MB; None where the platform does not say."""
+    try:
+        if sys.platform.startswith('linux'):
+            return _memory_linux()
+        if sys.platform == 'win32':
+            return _memory_windows()
+        return _memory_other()
+    except Exception:
+        return None, None
+
+
+# -----------------------------
+# Recording
+# -----------------------------
+
+class StageRecorder:
+    """Wall time and memory per named stage of one render.
+
+    Repeated stages add up. Stages do not nest: one opened inside another is counted as
+    part of the outer stage, so the stage times of a record never overlap."""
+
+    def __init__(self, script: str, **info):
+        self.script = script
+        self.info: Dict[str, Any] = {k: v for k, v in info.items() if v is not None}
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._started = time.perf_counter()
+        self._open = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self._open:
+            yield
+            return
+        self._open = True
+        for hook in _stage_hooks:
+            hook(name, 'start')
+        # Both peaks read at the end are this stage's own only if they were reset here
+        traced = tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak')
+        if traced:
+            tracemalloc.reset_peak()
+        own_rss_peak = reset_peak_memory()
+        rss_before, _ = process_memory()
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._open = False
+            elapsed = (time.perf_counter() - t) * 1000
+            rss_after, rss_peak = process_memory()
+            entry = self.stages.setdefault(name, {'ms': 0.0})
+            entry['ms'] += elapsed
+            if traced:
+                entry['peak_mb'] = max(entry.get('peak_mb', 0.0), tracemalloc.get_traced_memory()[1] / 2 ** 20)
+            if rss_before is not None and rss_after is not None:
+                entry['rss_delta_mb'] = entry.get('rss_delta_mb', 0.0) + rss_after - rss_before
+            if own_rss_peak and rss_peak is not None:
+                entry['rss_peak_mb'] = max(entry.get('rss_peak_mb', 0.0), rss_peak)
+            for hook in _stage_hooks:
+                hook(name, 'end')
+
+    def record(self, ok: bool = True) -> Dict[str, Any]:
+        # Peaks of the render: the highest stage peaks (None where they are not measured)
+        peak, rss_peak = (max((entry[field] for entry in self.stages.values() if field in entry), default=None)
+                          for field in ('peak_mb', 'rss_peak_mb'))
+        record: Dict[str, Any] = {
+            'ts': datetime.now().isoformat(timespec='seconds'),
+            'script': self.script,
+            **self.info,
+            'ok': ok,
+            'total_ms': round((time.perf_counter() - self._started) * 1000, 2),
+            'peak_mb': round(peak, 1) if peak is not None else None,
+            'rss_peak_mb': round(rss_peak, 1) if rss_peak is not None else None,
+            'stages': {name: {k: round(v, 2 if k == 'ms' else 1) for k, v in entry.items()}
+                       for name, entry in self.stages.items()},
+        }
+        return record
+
+
+_active: Optional[StageRecorder] = None
+_last: Optional[Dict[str, Any]] = None
+# Called as hook(stage, 'start' | 'end') around the timed part of every recorded stage
+_stage_hooks: List[Callable[[str, str], None]] = []
+
+
+def add_stage_hook(hook: Callable[[str, str], None]):
+    """Call `hook(stage, 'start' | 'end')` at the stage boundaries (render_profile.py snapshots memory there)."""
+    _stage_hooks.append(hook)
+
+
+def remove_stage_hook(hook: Callable[[str, str], None]):
+    with contextlib.suppress(ValueError):
+        _stage_hooks.remove(hook)
+
+
+def stage(name: str):
+    """Time `name` in the active recording; a no-op outside one (e.g. batch pool workers)."""
+    return _active.stage(name) if _active is not None else contextlib.nullcontext()
+
+
+def annotate(**info):
+    """Add fields (renderer, cached, docs...) to the active recording's METRICS record."""
+    if _active is not None:
+        _active.info.update({k: v for k, v in info.items() if v is not None})
+
+
+def pop_last_record() -> Optional[Dict[str, Any]]:
+    """The METRICS record of the last finished recording, once (for the render worker)."""
+    global _last
+    record, _last = _last, None
+    return record
+
+
+def write_metrics(record: Dict[str, Any], metrics_file=None):
+    """Print the METRICS= line and append `record` to the JSONL log, if one is configured."""
+    # ASCII on stdout: the Electron side reads it through the console code page
+    print('METRICS=' + json.dumps(record, ensure_ascii=True, separators=(',', ':')))
+    metrics_file = metrics_file or os.environ.get(METRICS_FILE_ENV)
+    if not metrics_file:
+        return
+    try:
+        path = Path(metrics_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except OSError as e:
+        print(f"[WARN] Could not write metrics to {metrics_file}: {e}", file=sys.stderr)
+
+
+@contextlib.contextmanager
+def recording(script: str, metrics_file=None, template=None, **info) -> Iterator[StageRecorder]:
+    """Record the stages of one render and emit its METRICS record on the way out (also on sys.exit)."""
+    global _active, _last
+    recorder = StageRecorder(script, template=Path(template).name if template else None, **info)
+    previous, _active = _active, recorder
+    # Allocated memory of this render only, when the record is logged: tracing (one frame per
+    # block, the cheapest) makes the render about 3x slower
+    started_tracing = bool(metrics_file or os.environ.get(METRICS_FILE_ENV)) and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(1)
+    ok = False
+    try:
+        yield recorder
+        ok = True
+    except SystemExit as e:
+        ok = e.code in (None, 0)
+        raise
+    finally:
+        _active = previous
+        _last = recorder.record(ok)
+        if started_tracing:
+            tracemalloc.stop()
+        write_metrics(_last, metrics_file)
+
+
+# -----------------------------
+# Report (p50/p95/p99 from a JSONL log)
+# -----------------------------
+
+def read_records(path) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if isinstance(record, dict) and 'stages' in record:
+                records.append(record)
+    return records
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarise(records: List[Dict[str, Any]], by: str = 'template') -> List[Dict[str, Any]]:
+    """p50/p95/p99 of ms (and p95 of peak_mb) per group and stage; 'total' is the whole render."""
+    groups: Dict[Tuple[str, str], Dict[str, Dict[str, List[float]]]] = {}
+    for record in records:
+        key = (record.get('script', '?'), str(record.get(by) or '-') if by != 'script' else '')
+        stages = groups.setdefault(key, {})
+        entries = dict(record['stages'])
+        entries['total'] = {'ms': record.get('total_ms'), 'peak_mb': record.get('peak_mb')}
+        for name, entry in entries.items():
+            values = stages.setdefault(name, {'ms': [], 'peak_mb': []})
+            for field in ('ms', 'peak_mb'):
+                if entry.get(field) is not None:
+                    values[field].append(float(entry[field]))
+
+    rows = []
+    for (script, group), stages in sorted(groups.items()):
+        for name, values in stages.items():
+            if not values['ms']:
+                continue
+            ms = sorted(values['ms'])
+            row: Dict[str, Any] = {'script': script}
+            if by != 'script':
+                row[by] = group
+            row.update(stage=name, count=len(ms))
+            for p in PERCENTILES:
+                row[f'p{p}_ms'] = round(percentile(ms, p), 2)
+            if values['peak_mb']:
+                row['p95_peak_mb'] = round(percentile(sorted(values['peak_mb']), 95), 1)
+            rows.append(row)
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]], by: str):
+    group_width = 0 if by == 'script' else 38
+    header = f"{'script':<22} {by if group_width else '':<{group_width}}{' ' if group_width else ''}" \
+             f"{'stage':<14} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        group = f"{row.get(by, ''):<{group_width}} " if group_width else ''
+        peak = row.get('p95_peak_mb')
+        print(f"{row['script']:<22} {group}{row['stage']:<14} {row['count']:>6} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {peak if peak is not None else '-':>8}")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Per-stage render metrics (METRICS= / --metrics-file).')
+    sub = p.add_subparsers(dest='command', required=True)
+    report = sub.add_parser('report', help='p50/p95/p99 لكل مرحلة ولكل قالب من ملف JSONL.')
+    report.add_argument('path', help='ملف السجل (--metrics-file).')
+    report.add_argument('--by', choices=('template', 'script', 'renderer'), default='template',
+                        help='تجميع السجلات حسب القالب (افتراضي) أو السكربت أو محرك التوليد.')
+    report.add_argument('--since', help='السجلات من هذا التاريخ فقط (YYYY-MM-DD).')
+    report.add_argument('--json', action='store_true', help='إخراج JSON بدل الجدول.')
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        records = read_records(args.path)
+    except OSError as e:
+        print(f"[ERROR] Cannot read {args.path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.since:
+        records = [r for r in records if str(r.get('ts', '')) >= args.since]
+    rows = summarise(records, args.by)
+    if args.json:
+        print(json.dumps({'records': len(records), 'rows': rows}, indent=2, ensure_ascii=False))
+    else:
+        print_report(rows, args.by)
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+تشخيص توليد بطيء من مهمة حقيقية (--profile) بدون تعديل السكربتات.
+
+مع --profile يعمل التوليد كاملاً تحت cProfile ويُكتب:
+- <الإخراج>.pstats: ملف pstats كامل (snakeviz، python -m pstats ...)؛
+- <الإخراج>.profile.txt: أكثر --profile-top دالة كلفة، مرتبة بالزمن التراكمي ثم بالزمن الذاتي.
+
+ومع --profile-memory تُؤخذ لقطتا tracemalloc: بعد تحميل القالب (نهاية مرحلة template_load)
+وقبل الحفظ (بداية مرحلة save)، ويُكتب الفرق بينهما لكل سطر كود في <الإخراج>.memory.txt.
+في وضع --batch تحيط اللقطتان بمرحلة render كاملة.
+المراحل هي نفسها مراحل METRICS= (render_metrics.py). tracemalloc يبطئ التوليد عدة مرات
+ولا يرى ذاكرة lxml الداخلية (كائنات XML)، فهو لتحديد الكود الذي يحجز فقط.
+
+--profile PATH يحدد مسار ملف .pstats (الملفات الأخرى بجانبه). في وضع --batch يُكتب
+profile.pstats في مجلد الإخراج، وتوليد العمليات المتوازية لا يظهر فيه إلا مع --workers 1.
+
+الاستخدام:
+    python scripts/fill_candidate_follow_up_card.py ... --profile
+    python scripts/generate_deposit_docx.py ... --profile out/deposit.pstats --profile-top 50 --profile-memory
+    python -m pstats out/deposit.pstats
+"""
+from __future__ import annotations
+import contextlib
+import io
+import sys
+from pathlib import Path
+from typing import Iterator, Optional
+
+from render_metrics import add_stage_hook, annotate, remove_stage_hook
+
+DEFAULT_TOP = 30
+# tracemalloc snapshots at the first of these stage events ... and at the first of these after it
+MEMORY_FROM = (('template_load', 'end'), ('render', 'start'))
+MEMORY_TO = (('save', 'start'), ('render', 'end'))
+
+
+def profile_path(target: Optional[str], output) -> Path:
+    """The .pstats file: --profile PATH, else next to the output (inside it for a --batch directory)."""
+    if target:
+        return Path(target)
+    output = Path(output)
+    if output.is_dir() or not output.suffix:
+        return output / 'profile.pstats'
+    return output.with_suffix('.pstats')
+
+
+def write_summary(profiler, path: Path, top: int):
+    """Top-N functions by cumulative and by own time, as pstats prints them."""
+    import pstats
+
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer).strip_dirs()
+    buffer.write(f'# Top {top} by cumulative time\n')
+    stats.sort_stats('cumulative').print_stats(top)
+    buffer.write(f'\n# Top {top} by own time\n')
+    stats.sort_stats('tottime').print_stats(top)
+    path.write_text(buffer.getvalue(), encoding='utf-8')
+
+
+class MemorySnapshots:
+    """tracemalloc snapshots at the first MEMORY_FROM event and the first MEMORY_TO event after it.
+
+    The profiler is paused while a snapshot is taken so it does not show up in the .pstats."""
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.before = self.after = None
+        self.span = None
+
+    def __call__(self, stage: str, event: str):
+        if (stage, event) in MEMORY_FROM and self.before is None:
+            self.before = self._snapshot()
+            self.span = [f'{event} of {stage}']
+        elif (stage, event) in MEMORY_TO and self.before is not None and self.after is None:
+            self.after = self._snapshot()
+            self.span.append(f'{event} of {stage}')
+
+    def _snapshot(self):
+        import tracemalloc
+
+        if self.profiler is not None:
+            self.profiler.disable()
+        try:
+            return tracemalloc.take_snapshot()
+        finally:
+            if self.profiler is not None:
+                self.profiler.enable()
+
+    def write(self, path: Path, top: int) -> bool:
+        """Write the allocation diff per source line; False when the render skipped those stages."""
+        import tracemalloc
+
+        if self.before is None or self.after is None:
+            return False
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+        diff = self.after.filter_traces(ignore).compare_to(self.before.filter_traces(ignore), 'lineno')
+        growth = sum(stat.size_diff for stat in diff)
+        lines = [f'# Python allocations from the {self.span[0]} to the {self.span[1]}',
+                 f'# Net: {growth / 1024:+.1f} KiB; top {top} lines by size difference', '']
+        lines.extend(str(stat) for stat in diff[:top])
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return True
+
+
+@contextlib.contextmanager
+def profiling(target: Optional[str], output, top: int = DEFAULT_TOP, memory: bool = False) -> Iterator[None]:
+    """Run the block under cProfile (and tracemalloc with `memory`) and write the reports on the way out.
+
+    `target` is the --profile value: None disables profiling, '' uses the default path."""
+    if target is None and not memory:
+        yield
+        return
+    import cProfile
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # another profiler (python -m cProfile) is already running
+        print(f"[WARN] --profile ignored: {e}", file=sys.stderr)
+        profiler = None
+
+    # Profiled renders are slower: keep them apart in the METRICS log
+    annotate(profiled=True)
+    snapshots = None
+    started_tracing = False
+    if memory:
+        snapshots = MemorySnapshots(profiler)
+        add_stage_hook(snapshots)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if snapshots is not None:
+            remove_stage_hook(snapshots)
+        if started_tracing:
+            tracemalloc.stop()
+
+        path = profile_path(target, output)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if profiler is not None:
+                profiler.dump_stats(str(path))
+                summary = path.with_suffix('.profile.txt')
+                write_summary(profiler, summary, top)
+                print(f"[OK] Profile written: {path} (summary: {summary})")
+                print(f"PROFILE_PATH={path}")
+            if snapshots is not None:
+                memory_path = path.with_suffix('.memory.txt')
+                if snapshots.write(memory_path, top):
+                    print(f"[OK] Memory profile written: {memory_path}")
+                else:
+                    print("[WARN] No memory profile: the render had no template_load/save stages "
+                          "(render cache hit or PDF overlay?)")
+        except OSError as e:
+            print(f"[WARN] Could not write the profile to {path}: {e}", file=sys.stderr)
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+عامل توليد مستندات دائم (long-lived render worker) يخدم السكربتات الثلاثة:
+- fill_candidate_follow_up_card.py
+- fill_traffic_law_lessons_card.py
+- generate_deposit_docx.py
+
+بدلاً من تشغيل مفسّر Python جديد لكل بطاقة (وإعادة استيراد python-docx وdocxtpl وdocx2pdf
+في كل مرة)، يبقى هذا العامل يعمل ويستقبل مهام التوليد كسطور JSON على stdin،
+ويكتب سطر نتيجة JSON واحد لكل مهمة على stdout. محوّلات PDF (pdf_backend.py، مثل
+عمليات soffice) تبقى جاهزة بين المهام.
+
+صيغة المهمة (سطر واحد):
+    {"id": "42", "script": "follow_up", "args": ["--input", "...", "--output", "...", "--start-date", "2025-09-20"]}
+
+- script: follow_up | traffic_law | deposit (أو اسم ملف السكربت بدون .py)
+- args: نفس وسيطات سطر الأوامر التي يقبلها السكربت تماماً.
+- type (اختياري): render (افتراضي) | plan | commit_plan | release، لجدول الدروس في بطاقة المتابعة:
+    {"id": "7", "type": "plan", "args": ["--start-date", "2025-09-20", "--client-id", "c1", "--client-data", "{...}"]}
+    {"id": "8", "type": "commit_plan", "plan": {...}}
+    {"id": "9", "type": "release", "args": ["--client-id", "c1"]}
+  plan يعيد "plan" (تواريخ وساعات بدون توليد ولا حجز)، و commit_plan يحجز تلك الساعات كما هي
+  (خطأ إذا حُجزت فتحة منذ المعاينة)، و release يحرر كل ساعات العميل ويعيد "released".
+  script الافتراضي لها follow_up.
+
+أوامر تحكم:
+    {"cmd": "ping"}       -> {"ok": true, "pong": true, "templates": {...}, "pdf": {...}}
+    {"cmd": "shutdown"}   -> إنهاء العامل
+
+صيغة النتيجة:
+    {"id": "42", "ok": true, "exit_code": 0, "output": "...", "docx_path": "...", "pdf_path": null,
+     "timings": {"total_ms": 123.4}, "metrics": {...}, "stdout": "...", "stderr": "...", "error": null}
+
+يحتوي stdout في النتيجة على نفس السطور التي يطبعها السكربت (بما فيها PDF_PATH= و METRICS=)،
+لذلك يبقى عقد الواجهة كما هو. metrics هو نفس سجل METRICS= (زمن وذاكرة كل مرحلة،
+render_metrics.py) كقاموس، أو null للمهام التي لا تولّد ملفاً.
+
+الاستخدام:
+    python scripts/render_worker.py
+"""
+from __future__ import annotations
+import contextlib
+import importlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+# Short job names accepted in the "script" field
+SCRIPT_ALIASES = {
+    'follow_up': 'fill_candidate_follow_up_card',
+    'traffic_law': 'fill_traffic_law_lessons_card',
+    'deposit': 'generate_deposit_docx',
+}
+
+# Job types besides a plain render: they run the follow-up card with these extra arguments
+CARD_JOB_TYPES = {
+    'plan': lambda job: ['--plan-only'],
+    'commit_plan': lambda job: ['--commit-plan', json.dumps(job.get('plan') or {}, ensure_ascii=False)],
+    'release': lambda job: ['--release'],
+}
+
+_modules: Dict[str, Any] = {}
+
+
+def resolve_script(name: str) -> str:
+    """Map a job's script field to a module name."""
+    name = (name or '').strip()
+    if name.endswith('.py'):
+        name = name[:-3]
+    name = SCRIPT_ALIASES.get(name, name)
+    if name not in SCRIPT_ALIASES.values():
+        raise ValueError(f"Unknown script: {name}")
+    return name
+
+
+def load_script(module_name: str):
+    """Import a generator script once and keep it warm for later jobs."""
+    module = _modules.get(module_name)
+    if module is None:
+        try:
+            module = importlib.import_module(module_name)
+        except SystemExit:
+            # The scripts exit on missing dependencies; report that as a job error instead
+            raise RuntimeError(f"Failed to import {module_name} (missing dependency?)")
+        _modules[module_name] = module
+    return module
+
+
+def preload():
+    """Import every generator up-front so the first job does not pay for it."""
+    loaded = []
+    for module_name in SCRIPT_ALIASES.values():
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                load_script(module_name)
+            loaded.append(module_name)
+        except Exception as e:
+            print(f"[WARN] Could not preload {module_name}: {e}", file=sys.stderr)
+    return loaded
+
+
+def template_cache_info() -> Dict[str, Any]:
+    """Hit/miss counters of the shared parsed-template cache (see template_cache.py)."""
+    module = sys.modules.get('template_cache')
+    return module.default_cache.info() if module else {}
+
+
+def pdf_backend_info() -> Dict[str, Any]:
+    """State of the warm PDF converters (see pdf_backend.py)."""
+    module = sys.modules.get('pdf_backend')
+    return module.backends_info() if module else {}
+
+
+def pop_metrics() -> Any:
+    """METRICS record of the job that just ran (see render_metrics.py), None when it recorded nothing."""
+    module = sys.modules.get('render_metrics')
+    return module.pop_last_record() if module else None
+
+
+def job_command(job: Dict[str, Any]):
+    """(module name, argv) of a job, with the extra arguments of its type."""
+    job_type = job.get('type') or 'render'
+    argv = [str(a) for a in job.get('args') or []]
+    if job_type == 'render':
+        return resolve_script(job.get('script')), argv
+    if job_type not in CARD_JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    return resolve_script(job.get('script') or 'follow_up'), argv + CARD_JOB_TYPES[job_type](job)
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a single render job in-process and build its result record."""
+    started = time.perf_counter()
+    result: Dict[str, Any] = {
+        'id': job.get('id'),
+        'ok': False,
+        'exit_code': 0,
+        'output': None,
+        'docx_path': None,
+        'pdf_path': None,
+        'error': None,
+    }
+    out_buf = io.StringIO()
+    err_buf = io.StringIO()
+    try:
+        module_name, argv = job_command(job)
+        module = load_script(module_name)
+        with contextlib.redirect_stdout(out_buf), contextlib.redirect_stderr(err_buf):
+            paths = module.main(argv)
+        if paths:
+            result.update(paths)
+        result['ok'] = True
+    except SystemExit as e:
+        # argparse errors and the scripts' own sys.exit(1) calls; sys.exit() is a success and
+        # sys.exit('message') a failure, as for the interpreter
+        code = 0 if e.code is None else e.code if isinstance(e.code, int) else 1
+        if not isinstance(e.code, (int, type(None))):
+            print(e.code, file=err_buf)  # the interpreter prints the message to stderr
+        result['exit_code'] = code
+        result['ok'] = code == 0
+        if code != 0:
+            lines = [l for l in err_buf.getvalue().splitlines() if l.strip()]
+            result['error'] = lines[-1] if lines else f"Script exited with code {code}"
+    except Exception as e:
+        result['exit_code'] = 1
+        result['error'] = f"{type(e).__name__}: {e}"
+
+    result['timings'] = {'total_ms': round((time.perf_counter() - started) * 1000, 2)}
+    result['metrics'] = pop_metrics()
+    result['stdout'] = out_buf.getvalue()
+    result['stderr'] = err_buf.getvalue()
+    return result
+
+
+def write_line(record: Dict[str, Any], stream=None):
+    stream = stream or sys.stdout
+    stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+    stream.flush()
+
+
+def serve(stdin=None, stdout=None) -> int:
+    """Read JSON-lines jobs until EOF or a shutdown command."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    started = time.perf_counter()
+    loaded = preload()
+    write_line({
+        'ready': True,
+        'scripts': loaded,
+        'startup_ms': round((time.perf_counter() - started) * 1000, 2),
+    }, stdout)
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError('Job must be a JSON object')
+        except Exception as e:
+            write_line({'id': None, 'ok': False, 'error': f"Invalid job: {e}"}, stdout)
+            continue
+
+        cmd = job.get('cmd')
+        if cmd == 'shutdown':
+            write_line({'id': job.get('id'), 'ok': True, 'shutdown': True}, stdout)
+            break
+        if cmd == 'ping':
+            write_line({'id': job.get('id'), 'ok': True, 'pong': True, 'templates': template_cache_info(),
+                        'pdf': pdf_backend_info()}, stdout)
+            continue
+
+        write_line(run_job(job), stdout)
+    return 0
+
+
+def main() -> int:
+    # Force UTF-8 on the JSON channel regardless of the console code page
+    for stream in (sys.stdin, sys.stdout, sys.stderr):
+        try:
+            stream.reconfigure(encoding='utf-8')
+        except Exception:
+            pass
+    return serve()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1035 @@
+# -*- coding: utf-8 -*-
+"""
+طبقة تخزين حجوزات الساعات (reservation store) قابلة للتبديل.
+
+الشكل المنطقي للبيانات هو نفسه شكل schedule_reservations.json:
+    {
+      "_client_memory": {"<client_id>": {"dd/mm/yyyy": "07-08", ...}, ...},
+      "dd/mm/yyyy": ["07-08", "08-09", ...],
+      ...
+    }
+
+الواجهات:
+- JsonReservationStore   : الملف JSON الحالي كلقطة (snapshot) + سجل إلحاقي
+                           (schedule_reservations.json.journal). كل جلسة تُلحق سطراً
+                           واحداً بالقيم الجديدة للمفاتيح التي لمستها فقط، ويُدمج السجل
+                           في لقطة جديدة في الخلفية عند تجاوز حد الحجم. الجلسة محمية
+                           بقفل ملف بين العمليات (schedule_reservations.json.lock)،
+                           وكتابة اللقطة ذرّية (ملف مؤقت ثم os.replace).
+- SqliteReservationStore : قاعدة SQLite مفهرسة (WAL) بجداول لإشغال التواريخ/الفتحات
+                           وتعيينات العملاء. كل جلسة = معاملة واحدة، وتُحمَّل فقط
+                           التواريخ والعملاء الذين يلمسهم التخصيص فعلاً.
+
+الاستخدام من الكود:
+    store = open_reservation_store('schedule_reservations.db')
+    with store.session() as reservations:
+        ...  # نفس واجهة dict القديمة
+    with store.session(commit=False) as reservations:
+        ...  # تخصيص تجريبي (معاينة): التغييرات لا تُحفظ
+
+أدوات سطر الأوامر:
+    python scripts/reservation_store.py import schedule_reservations.json schedule_reservations.db
+    python scripts/reservation_store.py export schedule_reservations.db out.json
+    python scripts/reservation_store.py compact schedule_reservations.json
+    python scripts/reservation_store.py compact schedule_reservations.json --layout runs
+    python scripts/reservation_store.py release schedule_reservations.json <client_id>
+    python scripts/reservation_store.py holders schedule_reservations.json 12/10/2025
+
+الشكل المضغوط (--layout runs، انظر client_runs.py) يخزن ساعات كل عميل كتتابعات أيام عمل
+بدل زوج لكل حصة؛ يُحوَّل مرة واحدة ثم تحافظ عليه اللقطات التالية، و export يعيد الشكل القديم.
+
+فهرس عكسي (التاريخ، الفتحة) -> العميل بجانب _client_memory: في SQLite هو الفهرس
+idx_client_hours_date، وفي JSON يُبنى في الذاكرة مرة لكل تحميل ويُحدَّث مع كل سجل.
+release(client_id) يحرر فتحات العميل من قوائم تواريخه وينسى ساعاته في O(عدد الحصص)،
+بدون إعادة بناء المخزن (عميل محذوف أو مؤرشف أو منقول لم يعد يحجز ساعات).
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import copy
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from client_runs import RunLengthMemory, encode_reservations, is_runs_layout, load_runs_layout
+from slot_allocator import FULL_MARKER
+
+CLIENT_MEMORY_KEY = '_client_memory'
+
+# Markers of the old Arabic / "07:00-08:00" hour formats that must be normalised
+LEGACY_HOUR_MARKERS = ['من', 'إلى', 'ىلإ', 'الى', ':00', 'h']
+
+SQLITE_SUFFIXES = {'.db', '.sqlite', '.sqlite3'}
+
+# JSON snapshot layouts: the legacy one, or run-length client memory (client_runs.py)
+SNAPSHOT_LAYOUTS = ('legacy', 'runs')
+
+
+def safe_print(*args, **kwargs):
+    """Safe print function that handles Unicode encoding issues on Windows"""
+    try:
+        print(*args, **kwargs)
+    except UnicodeEncodeError:
+        safe_args = [a.encode('ascii', 'ignore').decode('ascii') if isinstance(a, str) else str(a) for a in args]
+        print(*safe_args, **kwargs)
+
+
+# -----------------------------
+# Hour format cleaning
+# -----------------------------
+
+def is_legacy_hour(hour_str) -> bool:
+    return any(pattern in str(hour_str) for pattern in LEGACY_HOUR_MARKERS)
+
+
+def clean_hour(hour_str) -> str:
+    """Convert a legacy hour value to XX-XX (07-08 when it cannot be recovered)."""
+    hour_match = re.search(r'(\d{2})', str(hour_str))
+    if hour_match:
+        hour_num = int(hour_match.group(1))
+        if 7 <= hour_num <= 16:
+            return f"{hour_num:02d}-{hour_num+1:02d}"
+    return "07-08"  # Default fallback
+
+
+# A store holds a handful of distinct hour strings: each one is scanned once per process
+_clean_hours = set()
+
+
+def has_legacy_hours(hours) -> bool:
+    """Whether any value needs cleaning; values already known to be clean are not rescanned."""
+    try:
+        unknown = set(hours) - _clean_hours
+    except TypeError:  # unhashable values: check them one by one
+        return any(is_legacy_hour(hour_str) for hour_str in hours)
+    for hour_str in unknown:
+        if is_legacy_hour(hour_str):
+            return True
+        _clean_hours.add(hour_str)
+    return False
+
+
+def clean_reservation_formats(reservations):
+    """Clean all hour formats in reservation data to ensure consistent XX-XX format
+
+    Lists and client hours that are already clean are kept as they are (not copied)."""
+    cleaned = {}
+
+    # Clean date-based reservations
+    for key, value in reservations.items():
+        if (key == CLIENT_MEMORY_KEY and isinstance(value, RunLengthMemory)
+                and not has_legacy_hours(value.distinct_hours())):
+            # Nothing to clean: keep the clients encoded instead of decoding them all
+            cleaned[key] = value
+        elif key == CLIENT_MEMORY_KEY:
+            # Clean client memory
+            cleaned_client_memory = {}
+            for client_id, client_hours in value.items():
+                if not has_legacy_hours(client_hours.values()):
+                    cleaned_client_memory[client_id] = client_hours
+                    continue
+                cleaned_client_hours = {}
+                for date_str, hour_str in client_hours.items():
+                    if is_legacy_hour(hour_str):
+                        clean = clean_hour(hour_str)
+                        cleaned_client_hours[date_str] = clean
+                        safe_print(f"[INFO] 🧹 Cleaned hour format: '{hour_str}' -> '{clean}'")
+                    else:
+                        cleaned_client_hours[date_str] = hour_str
+                cleaned_client_memory[client_id] = cleaned_client_hours
+            cleaned[key] = cleaned_client_memory
+        elif isinstance(value, list) and not has_legacy_hours(value):
+            cleaned[key] = value
+        elif isinstance(value, list):
+            # Clean hour lists for date reservations
+            cleaned_hours = []
+            for hour_str in value:
+                if is_legacy_hour(hour_str):
+                    clean = clean_hour(hour_str)
+                    cleaned_hours.append(clean)
+                    safe_print(f"[INFO] 🧹 Cleaned reservation hour: '{hour_str}' -> '{clean}'")
+                else:
+                    cleaned_hours.append(hour_str)
+            cleaned[key] = cleaned_hours
+        else:
+            cleaned[key] = value
+
+    return cleaned
+
+
+# -----------------------------
+# Reverse index: (date, slot) -> client
+# -----------------------------
+
+class SlotHolders:
+    """Reverse index of `_client_memory`: date -> {slot: client_id}.
+
+    FULL markers hold no slot. A slot claimed by two clients (only possible in files
+    written before the store lock) stays with the first one indexed."""
+
+    def __init__(self, memory=None):
+        self.by_date: Dict[str, Dict[str, str]] = {}
+        if not memory:
+            return
+        if isinstance(memory, RunLengthMemory):
+            claims = memory.claims()
+        else:
+            claims = ((client_id, d, h) for client_id, hours in memory.items() for d, h in hours.items())
+        by_date = self.by_date
+        for client_id, date_str, hour in claims:
+            if hour != FULL_MARKER:
+                by_date.setdefault(date_str, {}).setdefault(hour, client_id)
+
+    def on(self, date_str: str) -> Dict[str, str]:
+        """{slot: client_id} on a date (a copy)."""
+        return dict(self.by_date.get(date_str, ()))
+
+    def add(self, client_id: str, hours: Dict[str, str]):
+        for date_str, hour in hours.items():
+            if hour != FULL_MARKER:
+                self.by_date.setdefault(date_str, {}).setdefault(hour, client_id)
+
+    def remove(self, client_id: str, hours: Dict[str, str]):
+        for date_str, hour in hours.items():
+            held = self.by_date.get(date_str)
+            if held is not None and held.get(hour) == client_id:
+                del held[hour]
+                if not held:
+                    del self.by_date[date_str]
+
+
+# -----------------------------
+# Cross-process file lock
+# -----------------------------
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive lock on a side file, shared between processes (flock / msvcrt).
+
+    Re-entrant within one process: nested acquire() calls only bump a counter, so a
+    session opened inside another session of the same store does not deadlock.
+    """
+
+    def __init__(self, path, timeout: float = 60.0, poll: float = 0.05):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll = poll
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(self, fd: int):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth:
+            self._depth += 1
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+            deadline = time.monotonic() + self.timeout
+            while not self._try_lock(fd):
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"Timed out waiting for reservation lock {self.path}")
+                time.sleep(self.poll)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        self._depth = 1
+
+    def release(self):
+        self._depth -= 1
+        if not self._depth:
+            fd, self._fd = self._fd, None
+            try:
+                self._unlock(fd)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """Write to a temp file in the same directory, fsync it, then os.replace it in."""
+    path = Path(path)
+    mode = path.stat().st_mode & 0o777 if path.exists() else 0o644
+    fd, tmp = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=str(path.parent))
+    try:
+        os.chmod(tmp, mode)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def dump_reservations(reservations: Dict[str, Any], indent: Optional[int] = 2) -> bytes:
+    """Serialise in the schedule_reservations.json layout (indent=2, UTF-8; indent=None: one line)."""
+    separators = (',', ':') if indent is None else None
+    return json.dumps(reservations, indent=indent, ensure_ascii=False, separators=separators).encode('utf-8')
+
+
+def legacy_copy(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep copy in the plain legacy layout (a run-length `_client_memory` is decoded)."""
+    memory = state.get(CLIENT_MEMORY_KEY)
+    if memory is None or isinstance(memory, dict):
+        return copy.deepcopy(state)
+    return {key: {client_id: dict(hours) for client_id, hours in value.items()}
+            if key == CLIENT_MEMORY_KEY else copy.deepcopy(value)
+            for key, value in state.items()}
+
+
+# -----------------------------
+# Store interface
+# -----------------------------
+
+class ReservationStore(ABC):
+    """Backend interface. session() yields a dict-like view in the legacy layout.
+
+    With commit=False the session is a dry run: allocations made in the view are
+    discarded on exit (schedule previews). A backend missing one of the abstract
+    methods fails when it is created."""
+
+    @abstractmethod
+    def session(self, commit: bool = True):
+        """Context manager yielding the view; changes are written on a clean exit."""
+
+    @abstractmethod
+    def load_all(self) -> Dict[str, Any]:
+        """Full legacy-layout dict (exports, queries)."""
+
+    @abstractmethod
+    def replace_all(self, reservations: Dict[str, Any]):
+        """Overwrite the whole store with a legacy-layout dict."""
+
+    def release(self, client_id: str) -> Dict[str, str]:
+        """Free every slot of `client_id` and forget its hours (see _ReservationsView.release)."""
+        with self.session() as reservations:
+            return reservations.release(client_id)
+
+    def holders(self, date_str: str) -> Dict[str, str]:
+        """{slot: client_id} on a date, from the reverse index."""
+        with self.session(commit=False) as reservations:
+            return reservations.holders(date_str)
+
+    def close(self):
+        pass
+
+
+# -----------------------------
+# Change-tracking views
+# -----------------------------
+# A session hands out these lazy mappings instead of the whole data set. Values are
+# fetched from a backend source on first access; changes() returns only the keys
+# whose value differs from what was read, already format-cleaned.
+
+class _ClientMemoryView(MutableMapping):
+    """Lazy `_client_memory` mapping: a client's hours are read on first access."""
+
+    def __init__(self, source):
+        self._source = source
+        self._cache: Dict[str, Optional[Dict[str, str]]] = {}
+        self._original: Dict[str, Optional[Dict[str, str]]] = {}
+
+    def _load(self, client_id: str) -> Optional[Dict[str, str]]:
+        if client_id not in self._cache:
+            value = self._source.load_client(client_id)
+            self._cache[client_id] = value
+            self._original[client_id] = dict(value) if value is not None else None
+        return self._cache[client_id]
+
+    def __getitem__(self, client_id):
+        value = self._load(client_id)
+        if value is None:
+            raise KeyError(client_id)
+        return value
+
+    def __setitem__(self, client_id, hours):
+        self._load(client_id)
+        self._cache[client_id] = hours
+
+    def __delitem__(self, client_id):
+        if self._load(client_id) is None:
+            raise KeyError(client_id)
+        self._cache[client_id] = None
+
+    def __iter__(self) -> Iterator[str]:
+        for client_id in list(self._source.client_ids()):
+            self._load(client_id)
+        return iter([c for c, v in self._cache.items() if v is not None])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def changes(self) -> Dict[str, Optional[Dict[str, str]]]:
+        changed = {}
+        for client_id, hours in self._cache.items():
+            if hours == self._original.get(client_id):
+                continue
+            if hours:
+                hours = clean_reservation_formats({CLIENT_MEMORY_KEY: {client_id: hours}})[CLIENT_MEMORY_KEY][client_id]
+            changed[client_id] = hours
+        return changed
+
+
+class _ReservationsView(MutableMapping):
+    """Lazy legacy-layout mapping over one store session.
+
+    Only the dates (and clients) actually read are loaded; changes() reports only
+    the keys whose value changed.
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._memory = _ClientMemoryView(source)
+        self._cache: Dict[str, Any] = {}
+        self._original: Dict[str, Any] = {}
+
+    def _load(self, key: str):
+        if key not in self._cache:
+            value = self._source.load_entry(key)
+            self._cache[key] = value
+            self._original[key] = copy.deepcopy(value)
+        return self._cache[key]
+
+    def __getitem__(self, key):
+        if key == CLIENT_MEMORY_KEY:
+            return self._memory
+        value = self._load(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key == CLIENT_MEMORY_KEY:
+            if value is not self._memory:
+                for client_id, hours in value.items():
+                    self._memory[client_id] = hours
+            return
+        self._load(key)
+        self._cache[key] = value
+
+    def __delitem__(self, key):
+        if key == CLIENT_MEMORY_KEY or self._load(key) is None:
+            raise KeyError(key)
+        self._cache[key] = None
+
+    def __iter__(self):
+        for key in list(self._source.entry_keys()):
+            self._load(key)
+        live = [k for k, v in self._cache.items() if v is not None]
+        return iter([CLIENT_MEMORY_KEY] + live)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def holders(self, date_str: str) -> Dict[str, str]:
+        """{slot: client_id} on a date: the store's reverse index plus this session's changes."""
+        held = self._source.load_holders(date_str)
+        memory = self._memory
+        for client_id, hours in memory._cache.items():
+            before = (memory._original.get(client_id) or {}).get(date_str)
+            after = (hours or {}).get(date_str)
+            if before == after:
+                continue
+            if before is not None and held.get(before) == client_id:
+                del held[before]
+            if after is not None and after != FULL_MARKER:
+                held.setdefault(after, client_id)
+        return held
+
+    def holder(self, date_str: str, slot: str) -> Optional[str]:
+        """Client holding `slot` on a date, or None."""
+        return self.holders(date_str).get(slot)
+
+    def release(self, client_id: str) -> Dict[str, str]:
+        """Free the slots `client_id` holds and forget its hours; returns the released {date: hour}.
+
+        Only the client's own dates are read and written (O(lessons)). A slot the reverse
+        index gives to another client (a double booking) stays taken."""
+        hours = self._memory.get(client_id)
+        if hours is None:
+            return {}
+        released = {}
+        for date_str, hour in hours.items():
+            if hour == FULL_MARKER or self.holder(date_str, hour) not in (client_id, None):
+                continue
+            slots = self.get(date_str)
+            if not isinstance(slots, list) or hour not in slots:
+                continue
+            slots.remove(hour)
+            if not slots:
+                del self[date_str]
+            released[date_str] = hour
+        del self._memory[client_id]
+        return released
+
+    def changes(self):
+        """(entries, clients): changed date/extra keys and changed client memories (None = deleted)."""
+        entries = {}
+        for key, value in self._cache.items():
+            if value == self._original.get(key):
+                continue
+            if isinstance(value, list):
+                value = clean_reservation_formats({key: value})[key]
+            entries[key] = value
+        return entries, self._memory.changes()
+
+
+# -----------------------------
+# JSON snapshot + journal backend
+# -----------------------------
+
+# Fold the journal into the snapshot once it grows past this many bytes
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+
+class _StateSource:
+    """View source over the in-memory (snapshot + journal) state; hands out copies."""
+
+    def __init__(self, state: Dict[str, Any], slot_holders=None):
+        self.state = state
+        self.slot_holders = slot_holders  # () -> SlotHolders of the state, built on first use
+
+    def load_entry(self, key):
+        return copy.deepcopy(self.state.get(key))
+
+    def entry_keys(self):
+        return [k for k in self.state if k != CLIENT_MEMORY_KEY]
+
+    def load_client(self, client_id):
+        hours = self.state.get(CLIENT_MEMORY_KEY, {}).get(client_id)
+        return dict(hours) if hours is not None else None
+
+    def client_ids(self):
+        return self.state.get(CLIENT_MEMORY_KEY, {}).keys()
+
+    def load_holders(self, date_str):
+        if self.slot_holders is None:
+            return SlotHolders(self.state.get(CLIENT_MEMORY_KEY)).on(date_str)
+        return self.slot_holders().on(date_str)
+
+
+class JsonReservationStore(ReservationStore):
+    """schedule_reservations.json as a snapshot plus an append-only journal.
+
+    - Each session appends one line to `<file>.journal` holding the new absolute value of
+      every key it touched (O(touched), fsynced), instead of rewriting the whole file.
+    - The journal's first line names the SHA-256 of the snapshot it applies to, so a
+      journal left over from before a compaction (crash between the two steps) is ignored.
+    - State is rebuilt from snapshot + journal; afterwards each session only replays the
+      journal tail appended by other processes.
+    - Past JOURNAL_COMPACT_BYTES a background thread writes a fresh snapshot (temp file +
+      os.replace) and starts an empty journal.
+
+    The whole read-modify-write holds a cross-process lock, so concurrent renders never
+    lose each other's slots. The snapshot keeps the layout it has: legacy, or run-length
+    client memory once converted with compact(layout='runs'). Encoded clients are only
+    decoded when a session reads them; the journal always holds legacy values.
+    """
+
+    def __init__(self, path, compact_bytes: int = JOURNAL_COMPACT_BYTES, layout: Optional[str] = None):
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + '.journal')
+        self.lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+        self.compact_bytes = compact_bytes
+        self.layout = layout  # None: keep the snapshot's own layout
+        self._snapshot_layout = 'legacy'
+        self._state: Optional[Dict[str, Any]] = None
+        self._holders: Optional[SlotHolders] = None
+        self._snapshot_hash: Optional[str] = None
+        self._files_key = None
+        self._journal_pos = 0
+        self._journal_valid = False
+        self._snapshot_dirty = False
+        self._compactor: Optional[threading.Thread] = None
+
+    # --- files -----------------------------------------------------------
+
+    def _stat_key(self):
+        keys = []
+        for path in (self.path, self.journal_path):
+            try:
+                st = os.stat(path)
+                keys.append((st.st_ino, st.st_mtime_ns, st.st_size) if path == self.path else st.st_ino)
+            except FileNotFoundError:
+                keys.append(None)
+        return tuple(keys)
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        try:
+            raw = self.path.read_bytes()
+        except FileNotFoundError:
+            raw = b''
+        self._snapshot_hash = hashlib.sha256(raw).hexdigest()
+        self._snapshot_layout = 'legacy'
+        if not raw:
+            return {}
+        try:
+            data = json.loads(raw.decode('utf-8'))
+        except Exception:
+            return {}
+        self._snapshot_layout = 'runs' if is_runs_layout(data) else 'legacy'
+        return load_runs_layout(data) if self._snapshot_layout == 'runs' else data
+
+    def _write_snapshot(self, state: Dict[str, Any]):
+        layout = self.layout or self._snapshot_layout
+        if layout == 'runs':
+            raw = dump_reservations(encode_reservations(state), indent=None)
+        elif isinstance(state.get(CLIENT_MEMORY_KEY, {}), dict):
+            raw = dump_reservations(state)
+        else:
+            raw = dump_reservations(legacy_copy(state))
+        self._snapshot_layout = layout
+        atomic_write_bytes(self.path, raw)
+        self._snapshot_hash = hashlib.sha256(raw).hexdigest()
+        self._snapshot_dirty = False
+        self._reset_journal()
+
+    def _reset_journal(self):
+        header = (json.dumps({'snapshot': self._snapshot_hash}) + '\n').encode('utf-8')
+        atomic_write_bytes(self.journal_path, header)
+        self._journal_pos = len(header)
+        self._journal_valid = True
+        self._files_key = self._stat_key()
+
+    def _replay_journal(self):
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            self._journal_pos = 0
+            self._journal_valid = False
+            return
+        with f:
+            f.seek(self._journal_pos)
+            pos = self._journal_pos
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # torn tail of a crashed append; cut off before the next one
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                pos += len(line)
+                if 'snapshot' in record:
+                    self._journal_valid = record['snapshot'] == self._snapshot_hash
+                elif self._journal_valid:
+                    self._apply(record)
+            self._journal_pos = pos
+
+    def _refresh(self):
+        """Bring the in-memory state up to date (lock held)."""
+        files_key = self._stat_key()
+        if self._state is not None and files_key[0] == self._files_key[0] and files_key[1] == self._files_key[1]:
+            self._replay_journal()
+            return
+
+        # First load, or another process compacted / replaced the files: full rebuild
+        self._state = self._read_snapshot()
+        self._holders = None
+        self._journal_pos = 0
+        self._journal_valid = False
+        self._files_key = files_key
+        self._replay_journal()
+
+        # Legacy hour formats still in the snapshot: clean in memory now, persist the
+        # cleaned snapshot on the next write session (never rewrite on a plain read)
+        cleaned = clean_reservation_formats(self._state)
+        self._snapshot_dirty = cleaned != self._state
+        self._state = cleaned
+
+    def _apply(self, record: Dict[str, Any]):
+        state = self._state
+        for key, value in record.get('entries', {}).items():
+            if value is None:
+                state.pop(key, None)
+            else:
+                state[key] = value
+        clients = record.get('clients')
+        if clients:
+            memory = state.setdefault(CLIENT_MEMORY_KEY, {})
+            holders = self._holders
+            for client_id, hours in clients.items():
+                if holders is not None:
+                    holders.remove(client_id, memory.get(client_id) or {})
+                    holders.add(client_id, hours or {})
+                if hours is None:
+                    memory.pop(client_id, None)
+                else:
+                    memory[client_id] = hours
+
+    def _slot_holders(self) -> SlotHolders:
+        """Reverse index of the state: built once per load, then kept current by _apply."""
+        if self._holders is None:
+            self._holders = SlotHolders(self._state.get(CLIENT_MEMORY_KEY))
+        return self._holders
+
+    def _append(self, record: Dict[str, Any]):
+        if not self._journal_valid:
+            self._reset_journal()
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            if f.tell() != self._journal_pos:
+                f.truncate(self._journal_pos)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_pos += len(line)
+
+    # --- store API -------------------------------------------------------
+
+    def load_all(self) -> Dict[str, Any]:
+        with self.lock:
+            self._refresh()
+            return legacy_copy(self._state)
+
+    def replace_all(self, reservations: Dict[str, Any]):
+        try:
+            # Validate and clean all hour formats before saving
+            cleaned_reservations = clean_reservation_formats(reservations)
+            with self.lock:
+                self._write_snapshot(cleaned_reservations)
+                self._state = copy.deepcopy(cleaned_reservations)
+                self._holders = None
+        except Exception as e:
+            print(f"[WARN] Failed to save reservations: {e}")
+
+    @contextlib.contextmanager
+    def session(self, commit: bool = True):
+        with self.lock:
+            self._refresh()
+            view = _ReservationsView(_StateSource(self._state, self._slot_holders))
+            yield view
+            if not commit:
+                # A dry run writes nothing: a pending snapshot rewrite waits for the next commit
+                return
+            entries, clients = view.changes()
+            if entries or clients:
+                record = {'ts': round(time.time(), 3), 'entries': entries, 'clients': clients}
+                self._append(record)
+                self._apply(record)
+            if self._snapshot_dirty:
+                self._write_snapshot(self._state)
+        self._maybe_compact()
+
+    def compact(self, layout: Optional[str] = None):
+        """Fold the journal into a fresh snapshot (converted to `layout` when given)."""
+        if layout is not None:
+            self.layout = layout
+        with self.lock:
+            self._refresh()
+            self._write_snapshot(self._state)
+
+    def _maybe_compact(self):
+        if self._journal_pos < self.compact_bytes:
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        # Not a daemon: a short CLI run finishes the compaction before exiting
+        self._compactor = threading.Thread(target=self._compact_quietly, name='reservations-compact')
+        self._compactor.start()
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception as e:
+            safe_print(f"[WARN] Reservation journal compaction failed: {e}")
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+
+
+# -----------------------------
+# SQLite backend
+# -----------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS date_slots (
+    date TEXT NOT NULL,
+    pos  INTEGER NOT NULL,
+    slot TEXT NOT NULL,
+    PRIMARY KEY (date, pos)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS client_hours (
+    client_id TEXT NOT NULL,
+    date      TEXT NOT NULL,
+    hour      TEXT NOT NULL,
+    pos       INTEGER NOT NULL,
+    PRIMARY KEY (client_id, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_client_hours_date ON client_hours (date, hour);
+CREATE TABLE IF NOT EXISTS extra (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class _SqliteSource:
+    """View source reading rows inside the current transaction."""
+
+    def __init__(self, conn: 'sqlite3.Connection'):
+        self.conn = conn
+
+    def load_entry(self, key):
+        rows = self.conn.execute('SELECT slot FROM date_slots WHERE date = ? ORDER BY pos', (key,)).fetchall()
+        if rows:
+            return [r[0] for r in rows]
+        row = self.conn.execute('SELECT value FROM extra WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def entry_keys(self):
+        keys = [r[0] for r in self.conn.execute('SELECT DISTINCT date FROM date_slots')]
+        return keys + [r[0] for r in self.conn.execute('SELECT key FROM extra')]
+
+    def load_client(self, client_id):
+        rows = self.conn.execute(
+            'SELECT date, hour FROM client_hours WHERE client_id = ? ORDER BY pos', (client_id,)
+        ).fetchall()
+        return {d: h for d, h in rows} if rows else None
+
+    def client_ids(self):
+        return [r[0] for r in self.conn.execute('SELECT DISTINCT client_id FROM client_hours')]
+
+    def load_holders(self, date_str):
+        held = {}
+        for hour, client_id in self.conn.execute(
+                'SELECT hour, client_id FROM client_hours WHERE date = ?', (date_str,)):  # idx_client_hours_date
+            if hour != FULL_MARKER:
+                held.setdefault(hour, client_id)
+        return held
+
+
+class SqliteReservationStore(ReservationStore):
+    """Indexed SQLite store in WAL mode; one transaction per session."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        import sqlite3  # only the .db backend needs it
+
+        # isolation_level=None: transactions are managed explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def _write_changes(self, entries: Dict[str, Any], clients: Dict[str, Any]):
+        for key, value in entries.items():
+            self.conn.execute('DELETE FROM date_slots WHERE date = ?', (key,))
+            self.conn.execute('DELETE FROM extra WHERE key = ?', (key,))
+            if value is None:
+                continue
+            if isinstance(value, list):
+                self.conn.executemany(
+                    'INSERT INTO date_slots (date, pos, slot) VALUES (?, ?, ?)',
+                    [(key, i, slot) for i, slot in enumerate(value)]
+                )
+            else:
+                self.conn.execute('INSERT INTO extra (key, value) VALUES (?, ?)',
+                                  (key, json.dumps(value, ensure_ascii=False)))
+        for client_id, hours in clients.items():
+            self.conn.execute('DELETE FROM client_hours WHERE client_id = ?', (client_id,))
+            if hours:
+                self.conn.executemany(
+                    'INSERT INTO client_hours (client_id, date, hour, pos) VALUES (?, ?, ?, ?)',
+                    [(client_id, d, h, i) for i, (d, h) in enumerate(hours.items())]
+                )
+
+    @contextlib.contextmanager
+    def session(self, commit: bool = True):
+        # BEGIN IMMEDIATE takes SQLite's write lock up front: concurrent sessions from
+        # other processes wait (busy timeout) instead of allocating from stale reads.
+        # A dry run only reads, so it does not hold the write lock.
+        self.conn.execute('BEGIN IMMEDIATE' if commit else 'BEGIN')
+        view = _ReservationsView(_SqliteSource(self.conn))
+        try:
+            yield view
+            if commit:
+                self._write_changes(*view.changes())
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT' if commit else 'ROLLBACK')
+
+    def load_all(self) -> Dict[str, Any]:
+        reservations: Dict[str, Any] = {CLIENT_MEMORY_KEY: {}}
+        memory = reservations[CLIENT_MEMORY_KEY]
+        for client_id, date, hour in self.conn.execute(
+                'SELECT client_id, date, hour FROM client_hours ORDER BY client_id, pos'):
+            memory.setdefault(client_id, {})[date] = hour
+        for date, slot in self.conn.execute('SELECT date, slot FROM date_slots ORDER BY date, pos'):
+            reservations.setdefault(date, []).append(slot)
+        for key, value in self.conn.execute('SELECT key, value FROM extra'):
+            reservations[key] = json.loads(value)
+        return reservations
+
+    def replace_all(self, reservations: Dict[str, Any]):
+        cleaned = clean_reservation_formats(reservations)
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute('DELETE FROM date_slots')
+            self.conn.execute('DELETE FROM client_hours')
+            self.conn.execute('DELETE FROM extra')
+            for key, value in cleaned.items():
+                if key == CLIENT_MEMORY_KEY:
+                    self.conn.executemany(
+                        'INSERT INTO client_hours (client_id, date, hour, pos) VALUES (?, ?, ?, ?)',
+                        [(client_id, d, h, i)
+                         for client_id, hours in value.items()
+                         for i, (d, h) in enumerate(hours.items())]
+                    )
+                elif isinstance(value, list):
+                    self.conn.executemany(
+                        'INSERT INTO date_slots (date, pos, slot) VALUES (?, ?, ?)',
+                        [(key, i, slot) for i, slot in enumerate(value)]
+                    )
+                else:
+                    self.conn.execute('INSERT INTO extra (key, value) VALUES (?, ?)',
+                                      (key, json.dumps(value, ensure_ascii=False)))
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def close(self):
+        self.conn.close()
+
+
+# -----------------------------
+# Store selection
+# -----------------------------
+
+_stores: Dict[str, ReservationStore] = {}
+
+
+def open_reservation_store(path=None) -> ReservationStore:
+    """Open (and cache per process) the store for `path`.
+
+    The backend is chosen from the file suffix: .db/.sqlite/.sqlite3 -> SQLite, otherwise JSON.
+    Defaults to $HYPERDRIVE_RESERVATIONS, then schedule_reservations.json.
+    """
+    path = Path(path or os.environ.get('HYPERDRIVE_RESERVATIONS') or 'schedule_reservations.json')
+    key = str(path.resolve())
+    store = _stores.get(key)
+    if store is None:
+        if path.suffix.lower() in SQLITE_SUFFIXES:
+            store = SqliteReservationStore(path)
+        else:
+            store = JsonReservationStore(path)
+        _stores[key] = store
+    return store
+
+
+def import_json(json_path, db_path) -> Dict[str, int]:
+    """One-shot import of the legacy JSON layout into a SQLite store."""
+    source = JsonReservationStore(json_path).load_all()
+    target = SqliteReservationStore(db_path)
+    try:
+        target.replace_all(source)
+        return {
+            'dates': len([k for k, v in source.items() if isinstance(v, list)]),
+            'clients': len(source.get(CLIENT_MEMORY_KEY, {})),
+        }
+    finally:
+        target.close()
+
+
+def export_json(store_path, json_path):
+    """Write any store (SQLite, or JSON snapshot + journal) out as one legacy JSON file."""
+    data = open_reservation_store(store_path).load_all()
+    atomic_write_bytes(Path(json_path), dump_reservations(data))
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Reservation store maintenance.')
+    sub = p.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help='استيراد schedule_reservations.json إلى قاعدة SQLite.')
+    imp.add_argument('json_path')
+    imp.add_argument('db_path')
+    exp = sub.add_parser('export', help='تصدير مخزن (SQLite أو JSON + سجل) إلى ملف JSON واحد بالشكل القديم.')
+    exp.add_argument('store_path')
+    exp.add_argument('json_path')
+    comp = sub.add_parser('compact', help='دمج سجل الحجوزات (journal) في لقطة JSON جديدة.')
+    comp.add_argument('json_path')
+    comp.add_argument('--layout', choices=SNAPSHOT_LAYOUTS,
+                      help='تحويل اللقطة: legacy (الشكل القديم) أو runs (ذاكرة العملاء بترميز طول التتابع).')
+    rel = sub.add_parser('release', help='تحرير كل ساعات عميل (محذوف، مؤرشف أو منقول) ونسيانها.')
+    rel.add_argument('store_path')
+    rel.add_argument('client_id')
+    hold = sub.add_parser('holders', help='الفتحات المحجوزة في تاريخ ومن يحجزها (JSON {الفتحة: العميل}).')
+    hold.add_argument('store_path')
+    hold.add_argument('date', help='التاريخ كما في المخزن (dd/mm/yyyy).')
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'import':
+        counts = import_json(args.json_path, args.db_path)
+        safe_print(f"[OK] Imported {counts['dates']} dates and {counts['clients']} clients into {args.db_path}")
+    elif args.command == 'export':
+        export_json(args.store_path, args.json_path)
+        safe_print(f"[OK] Exported {args.store_path} to {args.json_path}")
+    elif args.command == 'compact':
+        JsonReservationStore(args.json_path).compact(args.layout)
+        layout = f" ({args.layout} layout)" if args.layout else ''
+        safe_print(f"[OK] Compacted {args.json_path}{layout}")
+    elif args.command == 'release':
+        store = open_reservation_store(args.store_path)
+        released = store.release(args.client_id)
+        store.close()
+        if released:
+            safe_print(f"[OK] Released {len(released)} lesson hours of {args.client_id}")
+        else:
+            safe_print(f"[WARN] No reserved hours for {args.client_id}")
+    elif args.command == 'holders':
+        print(json.dumps(open_reservation_store(args.store_path).holders(args.date), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
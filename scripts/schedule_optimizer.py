@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+مُحسِّن جدولة الساعات على مستوى الدفعة (cohort schedule optimiser).
+
+المخصص العادي يعطي الساعات عميلاً بعد عميل بترتيب الطباعة، فيحصل العملاء المتأخرون
+غالباً على ساعات مختلطة أو 'FULL'. هنا تُخطَّط الدفعة كاملة دفعة واحدة فوق مصفوفة
+إشغال (تاريخ × فتحة) باستخدام NumPy:
+
+- لكل عميل تُحسب، دفعة واحدة لكل تواريخه، عدد التواريخ التي تكون فيها كل ساعة حرة.
+- يُخدم أولاً العميل الأكثر تقييداً (أقل عدد من الساعات المتاحة في كل تواريخه).
+- تُختار له الساعة المتاحة في كل تواريخه التي يقل عليها طلب بقية العملاء في نفس التواريخ.
+- إن لم توجد ساعة ثابتة ممكنة: الساعة التي تغطي أكبر عدد من التواريخ، وفي الباقي
+  أقرب فتحة حرة، وإلا 'FULL'.
+
+النتيجة تُكتب في الحجوزات بنفس الشكل القديم (قائمة لكل تاريخ + _client_memory).
+
+الاستخدام من الكود:
+    from schedule_optimizer import plan_cohort
+    hours = plan_cohort([(client_id, dates), ...], reservations, SLOT_ALLOCATOR)
+"""
+from __future__ import annotations
+import importlib.util
+from typing import Any, Dict, List, MutableMapping, Sequence, Tuple
+
+from slot_allocator import FULL_MARKER, SlotAllocator
+
+CLIENT_MEMORY_KEY = '_client_memory'
+
+
+def numpy_available() -> bool:
+    """numpy is installed (checked without importing it; the functions below import it)."""
+    return importlib.util.find_spec('numpy') is not None
+
+
+def occupancy_matrix(dates: Sequence[str], reservations: MutableMapping[str, Any], allocator: SlotAllocator):
+    """Boolean (dates x slots) matrix of the slots already taken in `reservations`."""
+    import numpy as np
+
+    bits = np.arange(len(allocator.labels))
+    masks = np.array([allocator.mask_of(reservations.get(d, [])) for d in dates], dtype=np.int64)
+    return ((masks[:, None] >> bits) & 1).astype(bool)
+
+
+def plan_cohort(cohort: Sequence[Tuple[str, Sequence[str]]], reservations: MutableMapping[str, Any],
+                allocator: SlotAllocator) -> Dict[str, List[str]]:
+    """Assign hours to a cohort of new clients at once and record them in `reservations`.
+
+    `cohort` is a list of (client_id, dates). Returns {client_id: hours aligned with dates}.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('schedule_optimizer needs numpy: pip install numpy')
+    if not cohort:
+        return {}
+
+    # Date x slot occupancy over the union of the cohort's dates
+    all_dates = list(dict.fromkeys(d for _, dates in cohort for d in dates))
+    date_index = {d: i for i, d in enumerate(all_dates)}
+    occ = occupancy_matrix(all_dates, reservations, allocator)
+    n_slots = occ.shape[1]
+
+    # Padded (clients x lessons) date index matrix; padding points at a sentinel full row
+    n_clients = len(cohort)
+    max_lessons = max(len(dates) for _, dates in cohort)
+    sentinel = len(all_dates)
+    idx = np.full((n_clients, max_lessons), sentinel, dtype=np.int64)
+    for c, (_, dates) in enumerate(cohort):
+        idx[c, :len(dates)] = [date_index[d] for d in dates]
+    valid = idx != sentinel
+    lessons = valid.sum(axis=1)
+    occ = np.vstack([occ, np.ones((1, n_slots), dtype=bool)])
+
+    assigned: Dict[int, np.ndarray] = {}
+    remaining = np.ones(n_clients, dtype=bool)
+
+    while remaining.any():
+        rem = np.flatnonzero(remaining)
+        free = ~occ[idx[rem]]                       # (clients, lessons, slots)
+        coverage = free.sum(axis=1)                 # dates each hour is free on
+        full_options = coverage == lessons[rem, None]
+        n_options = full_options.sum(axis=1)
+
+        # Demand of the other clients on every (date, slot) they could take as a fixed hour
+        demand = np.zeros_like(occ, dtype=np.int64)
+        np.add.at(demand, idx[rem], np.broadcast_to(full_options[:, None, :], free.shape).astype(np.int64))
+
+        # Most constrained first: fewest consistent hours (clients with none go last),
+        # then the fewest free (date, slot) cells overall, then cohort order
+        order_key = np.where(n_options > 0, n_options, n_slots + 1)
+        pick = np.lexsort((rem, free.sum(axis=(1, 2)), order_key))[0]
+        c = rem[pick]
+        rows = idx[c, valid[c]]
+
+        cost = demand[rows].sum(axis=0) - full_options[pick] * len(rows)  # minus the client's own demand
+        if n_options[pick]:
+            candidates = np.flatnonzero(full_options[pick])
+        else:
+            candidates = np.flatnonzero(coverage[pick] == coverage[pick].max())
+        hour = candidates[np.argmin(cost[candidates])]
+
+        # Fixed hour where free; elsewhere the nearest free slot (earlier wins ties)
+        chosen = np.full(len(rows), -1, dtype=np.int64)
+        for k, r in enumerate(rows):
+            if not occ[r, hour]:
+                chosen[k] = hour
+                continue
+            free_slots = np.flatnonzero(~occ[r])
+            if free_slots.size:
+                chosen[k] = free_slots[np.argmin(np.abs(free_slots - hour) * 2 + (free_slots > hour))]
+        taken = chosen >= 0
+        occ[rows[taken], chosen[taken]] = True
+        assigned[c] = chosen
+        remaining[c] = False
+
+    # Record in the legacy layout, in cohort order
+    client_memory = reservations.get(CLIENT_MEMORY_KEY)
+    if client_memory is None:
+        reservations[CLIENT_MEMORY_KEY] = {}
+        client_memory = reservations[CLIENT_MEMORY_KEY]
+    result: Dict[str, List[str]] = {}
+    for c, (client_id, dates) in enumerate(cohort):
+        hours = []
+        for date_str, slot in zip(dates, assigned[c]):
+            if slot < 0:
+                hours.append(FULL_MARKER)
+                continue
+            label = allocator.label(int(slot))
+            date_reservations = reservations.get(date_str, [])
+            date_reservations.append(label)
+            reservations[date_str] = date_reservations
+            hours.append(label)
+        client_memory[client_id] = dict(zip(dates, hours))
+        result[client_id] = hours
+    return result
+
+
+def schedule_stats(hours_by_client: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Consistency summary: clients on one fixed hour, clients with mixed hours, FULL lessons."""
+    consistent = mixed = full = distinct_total = 0
+    for hours in hours_by_client.values():
+        full += hours.count(FULL_MARKER)
+        distinct = set(h for h in hours if h != FULL_MARKER)
+        distinct_total += len(distinct)
+        if len(distinct) <= 1 and FULL_MARKER not in hours:
+            consistent += 1
+        else:
+            mixed += 1
+    clients = len(hours_by_client)
+    return {
+        'clients': clients,
+        'consistent': consistent,
+        'mixed': mixed,
+        'full_lessons': full,
+        'avg_distinct_hours': round(distinct_total / clients, 2) if clients else 0,
+    }
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+مخصِّص فتحات الساعات بأقنعة البتات (bitmask hour-slot allocator).
+
+كل تاريخ يُمثَّل بعدد صحيح صغير: البت رقم i يعني أن الفتحة i من نافذة العمل
+(07-08 هي البت 0، 08-09 البت 1، ... 16-17 البت 9) محجوزة.
+- إيجاد أول فتحة حرة: free = ~mask & full ثم free & -free (أدنى بت مضبوط).
+- التحويل إلى نص العرض "07-08" يحدث فقط عند الحافة (label).
+
+النتائج مطابقة تماماً لمنطق القوائم القديم: الفتحات غير المعروفة في القائمة
+(صيغ قديمة مثل "07:00-08:00") لا تحجز أي بت، تماماً كما أن `slot not in list`
+لم يكن يتأثر بها.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, MutableMapping, Optional
+
+FULL_MARKER = 'FULL'
+
+
+class SlotAllocator:
+    """Slot labels and bit tricks for one working-hours window."""
+
+    def __init__(self, start: int = 7, end: int = 17, format_template: str = '{start:02d}-{end:02d}'):
+        self.start = start
+        self.end = end
+        self.labels: List[str] = [format_template.format(start=h, end=h + 1) for h in range(start, end)]
+        self.bits: Dict[str, int] = {label: i for i, label in enumerate(self.labels)}
+        self.full_mask = (1 << len(self.labels)) - 1
+
+    @classmethod
+    def from_working_hours(cls, working_hours: Dict[str, Any]) -> 'SlotAllocator':
+        return cls(working_hours['start'], working_hours['end'], working_hours['format_template'])
+
+    def mask_of(self, slots: Iterable[str]) -> int:
+        """Occupancy mask of a legacy per-date slot list."""
+        mask = 0
+        bits = self.bits
+        for slot in slots:
+            bit = bits.get(slot)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def first_free(self, mask: int) -> Optional[int]:
+        """Index of the lowest free slot, or None when the day is full."""
+        free = ~mask & self.full_mask
+        if not free:
+            return None
+        return (free & -free).bit_length() - 1
+
+    def free_count(self, mask: int) -> int:
+        return bin(~mask & self.full_mask).count('1')
+
+    def label(self, bit: int) -> str:
+        return self.labels[bit]
+
+
+class DateOccupancy:
+    """Bitmask view over a reservations mapping (legacy layout) for one allocation session.
+
+    Masks are built lazily from each date's slot list on first touch; every reservation
+    updates both the mask and the list so the stored layout stays unchanged.
+    """
+
+    def __init__(self, allocator: SlotAllocator, reservations: MutableMapping[str, Any]):
+        self.allocator = allocator
+        self.reservations = reservations
+        self._masks: Dict[str, int] = {}
+
+    def mask(self, date_str: str) -> int:
+        mask = self._masks.get(date_str)
+        if mask is None:
+            mask = self.allocator.mask_of(self.reservations.get(date_str, []))
+            self._masks[date_str] = mask
+        return mask
+
+    def take_first_free(self, date_str: str) -> str:
+        """Reserve the lowest free slot on `date_str` and return its label (or 'FULL')."""
+        bit = self.allocator.first_free(self.mask(date_str))
+        if bit is None:
+            return FULL_MARKER
+        slot = self.allocator.label(bit)
+        date_reservations = self.reservations.get(date_str, [])
+        date_reservations.append(slot)
+        self.reservations[date_str] = date_reservations
+        self._masks[date_str] |= 1 << bit
+        return slot
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+اختبار ضغط لتخصيص الساعات المتزامن بين عدة عمليات.
+
+يشغّل N عملية متوازية، كل منها تخصص ساعات لعدد من العملاء عبر
+reserve_hours_for_dates الحقيقية (نفس مسار بطاقة المتابعة) على نفس ملف الحجوزات،
+ثم يتحقق من الملف النهائي:
+- لا توجد فتحة (تاريخ، ساعة) أُعطيت لعميلين مختلفين.
+- لا توجد فتحة مكررة في قائمة أي تاريخ.
+- كل عميل موجود في _client_memory وكل ساعاته مسجلة في قوائم التواريخ (لا كتابة مفقودة).
+
+--layout runs يبدأ من لقطة JSON بالشكل المضغوط (client_runs.py) بدل الشكل القديم.
+--unsafe يعيد إنتاج السلوك القديم (تحميل ثم حفظ بدون قفل) لإثبات أن الاختبار يكشف الحجز المزدوج.
+
+الاستخدام:
+    python scripts/stress_reservations.py --processes 8 --clients 25
+    python scripts/stress_reservations.py --reservations /tmp/stress.db
+    python scripts/stress_reservations.py --layout runs
+    python scripts/stress_reservations.py --unsafe
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from reservation_store import CLIENT_MEMORY_KEY, JsonReservationStore, open_reservation_store  # noqa: E402
+from slot_allocator import FULL_MARKER  # noqa: E402
+from working_calendar import get_calendar  # noqa: E402
+
+
+def working_dates(start: date, count: int = 30) -> List[str]:
+    calendar = get_calendar()
+    return calendar.format_days(calendar.working_days(start, count), '%d/%m/%Y')
+
+
+def worker(job) -> int:
+    """Allocate hours for this process's clients, one store session per client."""
+    path, worker_id, clients, seed, window, unsafe = job
+    import fill_candidate_follow_up_card as card
+
+    card._reservations_path = path
+    rng = random.Random(seed * 1000 + worker_id)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(clients):
+            client_id = f'w{worker_id}_c{n}'
+            dates = working_dates(date(2025, 9, 1) + timedelta(days=rng.randrange(window)))
+            if unsafe:
+                # The pre-locking behaviour: unguarded load, allocate, whole-file write
+                store = card.get_reservation_store()
+                reservations = store.load_all()
+                card.reserve_hours_for_dates(dates, client_id, reservations)
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(reservations, f, ensure_ascii=False)
+            else:
+                card.reserve_hours_for_dates(dates, client_id)
+    return clients
+
+
+def verify(reservations: Dict[str, Any], expected_clients: List[str]) -> Dict[str, Any]:
+    memory = reservations.get(CLIENT_MEMORY_KEY, {})
+    owners: Dict[tuple, str] = {}
+    double_booked = []
+    for client_id, hours in memory.items():
+        for date_str, hour in hours.items():
+            if hour == FULL_MARKER:
+                continue
+            other = owners.setdefault((date_str, hour), client_id)
+            if other != client_id:
+                double_booked.append([date_str, hour, other, client_id])
+
+    duplicate_slots = []
+    date_slots = defaultdict(set)
+    for key, value in reservations.items():
+        if key == CLIENT_MEMORY_KEY or not isinstance(value, list):
+            continue
+        if len(set(value)) != len(value):
+            duplicate_slots.append(key)
+        date_slots[key] = set(value)
+
+    missing_clients = [c for c in expected_clients if c not in memory]
+    lost_slots = [
+        [d, h, c] for (d, h), c in owners.items()
+        if c in expected_clients and h not in date_slots.get(d, ())
+    ]
+    return {
+        'double_booked': double_booked,
+        'duplicate_slots': duplicate_slots,
+        'missing_clients': missing_clients,
+        'lost_slots': lost_slots,
+    }
+
+
+def run(path: str, processes: int, clients: int, seed: int, window: int, unsafe: bool,
+        layout: str = 'legacy') -> Dict[str, Any]:
+    for suffix in ('', '-wal', '-shm', '.journal'):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path + suffix)
+    if layout != 'legacy':
+        # An empty snapshot in that layout; every later compaction keeps it
+        JsonReservationStore(path).compact(layout)
+
+    jobs = [(path, w, clients, seed, window, unsafe) for w in range(processes)]
+    t = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        done = sum(pool.map(worker, jobs))
+    elapsed = time.perf_counter() - t
+
+    reservations = open_reservation_store(path).load_all()
+    expected = [f'w{w}_c{n}' for w in range(processes) for n in range(clients)]
+    problems = verify(reservations, expected)
+    return {
+        'reservations': path,
+        'processes': processes,
+        'layout': layout,
+        'allocations': done,
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'ok': not any(problems.values()),
+        **{k: len(v) for k, v in problems.items()},
+        'examples': {k: v[:3] for k, v in problems.items() if v},
+    }
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Parallel reservation stress test (no slot may be given twice).')
+    p.add_argument('--processes', type=int, default=8, help='عدد العمليات المتوازية.')
+    p.add_argument('--clients', type=int, default=25, help='عدد العملاء لكل عملية.')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--window', type=int, default=60, help='نطاق تواريخ البداية بالأيام (أصغر = تزاحم أكبر).')
+    p.add_argument('--reservations', default=None,
+                   help='ملف الحجوزات (.json أو .db). الافتراضي ملف JSON مؤقت.')
+    p.add_argument('--layout', choices=('legacy', 'runs'), default='legacy',
+                   help='شكل لقطة JSON في البداية: legacy أو runs (ذاكرة العملاء المضغوطة).')
+    p.add_argument('--unsafe', action='store_true', help='بدون قفل (السلوك القديم) لإظهار الحجز المزدوج.')
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    path = args.reservations or os.path.join(tempfile.mkdtemp(prefix='stress_reservations_'), 'reservations.json')
+    if args.unsafe and Path(path).suffix.lower() != '.json':
+        print('[ERROR] --unsafe only applies to the JSON store', file=sys.stderr)
+        sys.exit(2)
+    if args.layout != 'legacy' and Path(path).suffix.lower() != '.json':
+        print('[ERROR] --layout only applies to the JSON store', file=sys.stderr)
+        sys.exit(2)
+
+    result = run(path, args.processes, args.clients, args.seed, args.window, args.unsafe, args.layout)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if not result['ok']:
+        print('[ERROR] Concurrent allocation produced conflicting reservations', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+طبقة تعبئة جداول الحصص: تحديد خلايا w:tc المستهدفة في الجدول مرة واحدة.
+
+في python-docx يعيد table.rows[i] و row.cells[j] بناء شبكة خلايا الصف عند كل
+استدعاء، ومع vMerge يبحث عن الخلية الأعلى صفاً بعد صف. لذلك كانت تعبئة 30 صفاً
+تمر على الجدول أكثر من 30 مرة. هنا:
+
+- table_layout(tbl): مرور واحد على صفوف الجدول يعطي لكل صف مواضع الخلايا
+  (رقم w:tr، رقم w:tc) بنفس دلالات row.cells:
+  - gridSpan يكرر الخلية نفسها لكل عمود تغطيه؛
+  - vMerge="continue" يشير إلى الخلية الجذر في الصف الأعلى؛
+  - gridBefore يُحسب في موضع الخلية داخل الشبكة، لكنه لا يضيف عناصر للصف.
+- التخطيط يُحسب من القالب الأصلي ويُخزن في template_cache لكل قالب وجدول
+  (TemplateCache.table_layout). المستندات غير المأخوذة من الذاكرة المؤقتة يُحسب
+  تخطيطها مباشرة.
+- TableCells: وصول مباشر إلى w:tc والصف w:tr لمستند معين بالفهرس (r, c).
+
+الاستخدام من الكود:
+    from table_fill import table_cells
+    cells = table_cells(doc, 2)
+    for r in range(2, len(cells)):
+        format_cell(cells.cell(r, 1), value)
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+# Per row, one (tr index, tc index) per layout-grid cell, as row.cells returns them
+TableLayout = Tuple[Tuple[Tuple[int, int], ...], ...]
+
+
+def table_layout(tbl) -> TableLayout:
+    """Grid positions of every row of `tbl` in one pass (see module docstring)."""
+    rows = []
+    above: Dict[int, Tuple[Tuple[int, int], int]] = {}  # grid offset -> (root position, root span)
+    for tr_idx, tr in enumerate(tbl.tr_lst):
+        offset = tr.grid_before
+        starts: Dict[int, Tuple[Tuple[int, int], int]] = {}
+        cells: List[Tuple[int, int]] = []
+        for tc_idx, tc in enumerate(tr.tc_lst):
+            span = tc.grid_span
+            root = above.get(offset) if tc.vMerge == 'continue' else None
+            if root is None:
+                # Restart, no merge, or a continuation with no cell above (treated as its own cell)
+                root = ((tr_idx, tc_idx), span)
+            starts[offset] = root
+            cells.extend([root[0]] * root[1])
+            offset += span
+        rows.append(tuple(cells))
+        above = starts
+    return tuple(rows)
+
+
+class TableCells:
+    """Resolved cells of one python-docx Table: tc(r, c) is row.cells[c]._tc of table.rows[r]."""
+
+    def __init__(self, table, layout: Optional[TableLayout] = None):
+        self.table = table
+        self._trs = table._tbl.tr_lst
+        if layout is None or len(layout) != len(self._trs):
+            layout = table_layout(table._tbl)
+        self.layout = layout
+        self._tcs: Dict[int, List] = {}
+
+    def __len__(self) -> int:
+        return len(self.layout)
+
+    def width(self, r: int) -> int:
+        """len(table.rows[r].cells)."""
+        return len(self.layout[r])
+
+    def tr(self, r: int):
+        return self._trs[r]
+
+    def row(self, r: int) -> '_Row':
+        from docx.table import _Row
+
+        return _Row(self._trs[r], self.table)
+
+    def tc(self, r: int, c: int):
+        return self._at(*self.layout[r][c])
+
+    def cell(self, r: int, c: int) -> '_Cell':
+        from docx.table import _Cell
+
+        return _Cell(self.tc(r, c), self.table)
+
+    def _at(self, tr_idx: int, tc_idx: int):
+        tcs = self._tcs.get(tr_idx)
+        if tcs is None:
+            tcs = self._tcs[tr_idx] = self._trs[tr_idx].tc_lst
+        return tcs[tc_idx]
+
+
+def table_cells(doc, index: int) -> TableCells:
+    """TableCells for doc.tables[index], with the layout cached per template when `doc`
+    was checked out from template_cache."""
+    from template_cache import default_cache
+
+    return TableCells(doc.tables[index], default_cache.table_layout(doc, index))
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+ذاكرة مؤقتة للقوالب المحلَّلة (parsed template cache).
+
+كل عملية توليد كانت تستدعي Document(path) أو DocxTemplate(path) لفك ضغط القالب
+وتحليل XML من جديد. هنا يُحمَّل القالب مرة واحدة لكل (مسار + بصمة المحتوى)،
+وتحصل كل عملية توليد على نسخة خاصة رخيصة: نسخ أشجار XML المحلَّلة (deepcopy)
+بدلاً من إعادة قراءة ملف zip.
+
+- المفتاح: المسار المطلق + SHA-256 لمحتوى الملف.
+- عند تغيّر الملف على القرص (mtime/الحجم) يُعاد حساب البصمة، وإن اختلفت يُعاد التحميل.
+- بنية الحزمة (العلاقات rels، قائمة الصور، محتوى الأجزاء الثنائية) تُعاد إلى حالة القالب
+  مع كل نسخة: توليد يضيف صورة أو subdoc أو علاقة لا يترك أثراً في التوليد التالي.
+- النسخة المعادة صالحة حتى الطلب التالي لنفس القالب (التوليد يتم بالتتابع داخل
+  العملية الواحدة؛ العمليات المتوازية لكل منها ذاكرتها الخاصة).
+"""
+from __future__ import annotations
+import copy
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from docx_writer import package_items
+from table_fill import TableLayout, table_layout
+
+# Lazy attributes python-docx caches on the main document part; they point at the
+# previous XML tree and must be dropped after swapping in a fresh copy.
+_DOCUMENT_PART_LAZY_ATTRS = ('document', 'inline_shapes', 'numbering_part')
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _Entry:
+    def __init__(self, path: Path, digest: str, stat_key: Tuple[int, int]):
+        from docx import Document
+        from docx.opc.part import XmlPart
+
+        self.path = path
+        self.digest = digest
+        self.stat_key = stat_key
+        self.document = Document(str(path))
+        self.pristine_element = self.document.part._element
+        package = self.document.part.package
+        parts = list(package.iter_parts())
+        # Pristine XML trees of every XML part; never handed out, only copied
+        self.pristine: List[Tuple[Any, Any]] = [
+            (part, part._element) for part in parts if isinstance(part, XmlPart)
+        ]
+        # The package graph is shared by every checkout and edited in place by renders that
+        # add an image, subdocument or relationship: keep what to restore it to
+        self.pristine_rels = [
+            (rels, dict(rels), dict(rels._target_parts_by_rId))
+            for rels in [package.rels] + [part.rels for part in parts]
+        ]
+        self.pristine_blobs = [(part, part._blob) for part in parts if not isinstance(part, XmlPart)]
+        self.image_parts = package.image_parts._image_parts
+        self.pristine_image_parts = list(self.image_parts)
+        # Serialized package entries before any render touched them (see docx_writer.save_docx)
+        self.pristine_items: Dict[str, bytes] = package_items(self.document)
+        self.table_layouts: Dict[int, TableLayout] = {}
+
+    def checkout(self):
+        """Return a Document backed by private copies of the parsed XML parts, with the
+        package relationships, image list and binary parts of the template."""
+        for rels, by_rid, target_parts in self.pristine_rels:
+            rels.clear()
+            rels.update(by_rid)
+            rels._target_parts_by_rId.clear()
+            rels._target_parts_by_rId.update(target_parts)
+        for part, blob in self.pristine_blobs:
+            part._blob = blob
+        self.image_parts[:] = self.pristine_image_parts
+        for part, pristine in self.pristine:
+            part._element = copy.deepcopy(pristine)
+        doc_part = self.document.part
+        for name in _DOCUMENT_PART_LAZY_ATTRS:
+            doc_part.__dict__.pop(name, None)
+        return doc_part.document
+
+    def table_layout(self, index: int) -> Optional[TableLayout]:
+        layout = self.table_layouts.get(index)
+        if layout is None:
+            tbls = self.pristine_element.body.tbl_lst
+            if not 0 <= index < len(tbls):
+                return None
+            layout = self.table_layouts[index] = table_layout(tbls[index])
+        return layout
+
+
+class TemplateCache:
+    """Parsed .docx templates keyed by path + content hash."""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, path) -> _Entry:
+        path = Path(path).resolve()
+        key = str(path)
+        st = path.stat()
+        stat_key = (st.st_mtime_ns, st.st_size)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.stat_key != stat_key:
+            # File touched on disk: only reload if the content really changed
+            digest = file_digest(path)
+            if digest == entry.digest:
+                entry.stat_key = stat_key
+            else:
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            entry = _Entry(path, file_digest(path), stat_key)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_document(self, path):
+        """python-docx Document for `path`, cloned from the cached parse."""
+        return self._entry(path).checkout()
+
+    def get_docx_template(self, path):
+        """docxtpl DocxTemplate for `path` whose docx is a cached clone."""
+        from docxtpl import DocxTemplate
+
+        tpl = DocxTemplate(str(path))
+        tpl.docx = self.get_document(path)
+        return tpl
+
+    def pristine_items(self, path) -> Dict[str, bytes]:
+        """The template's package entries as python-docx serializes them, unmodified."""
+        return self._entry(path).pristine_items
+
+    def table_layout(self, doc, index: int) -> Optional[TableLayout]:
+        """Cell layout of table `index` (table_fill.table_layout) computed once per template,
+        or None when `doc` was not checked out from this cache."""
+        for entry in self._entries.values():
+            if entry.document.part is doc.part:
+                return entry.table_layout(index)
+        return None
+
+    def digest(self, path) -> str:
+        """Content hash of the cached template (loads it if needed)."""
+        return self._entry(path).digest
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Process-wide cache shared by the generator scripts and the render worker
+default_cache = TemplateCache()
+
+
+def get_document(path):
+    return default_cache.get_document(path)
+
+
+def get_docx_template(path):
+    return default_cache.get_docx_template(path)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+تقويم أيام العمل المشترك (working-day calendar).
+
+تُحسب أيام العمل (بدون الجمعة والسبت وبدون العطل الرسمية) مرة واحدة في مصفوفة
+أرقام ترتيبية (ordinals) لكل سنة مغطاة، مع مصفوفة فهرس لكل يوم تقويمي:
+- "N يوم عمل ابتداءً من D"  = شريحة من المصفوفة انطلاقاً من فهرس D.
+- "يوم العمل رقم N بعد D"   = عملية حسابية على الفهرس.
+- مسار NumPy (busday_offset) لحساب تواريخ دفعة كاملة من العملاء دفعة واحدة.
+
+العطل الرسمية: ملف JSON (افتراضي holidays.json في مجلد العمل، أو $HYPERDRIVE_HOLIDAYS،
+أو --holidays في السكربتات). الصيغ المقبولة:
+    ["2025-11-01", "2026-01-01"]
+    {"2025-11-01": "عيد الثورة", "2026-01-01": "رأس السنة"}
+    {"holidays": ["2025-11-01", ...]}
+
+الاستخدام من الكود:
+    from working_calendar import get_calendar
+    cal = get_calendar()
+    days = cal.working_days(date(2025, 9, 20), 30)
+"""
+from __future__ import annotations
+import json
+import os
+from array import array
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+WEEKEND_DAYS = frozenset({4, 5})  # الجمعة=4, السبت=5
+
+# working_days_many() only vectorises (and imports numpy) from this many start dates
+NUMPY_MIN_STARTS = 16
+
+DEFAULT_HOLIDAYS_FILE = Path('holidays.json')
+HOLIDAY_DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y')
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str, formats: Tuple[str, ...]) -> Optional[date]:
+    """First format in `formats` that parses `value`, or None."""
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class WorkingCalendar:
+    """Working days precomputed per covered year; queries are index arithmetic."""
+
+    def __init__(self, holidays: Iterable[date] = (), weekend: Iterable[int] = WEEKEND_DAYS):
+        self.weekend = frozenset(weekend)
+        self.holidays = frozenset(holidays)
+        self._holiday_ordinals = frozenset(d.toordinal() for d in self.holidays)
+        self._first_year = self._last_year = None
+        self._base = 0
+        self._ordinals = array('l')  # working-day ordinals, ascending
+        self._index = array('l')     # per covered calendar day: index of the first working day on/after it
+        self._formatted: Dict[Tuple[int, str], str] = {}
+        self._busdaycal = None
+
+    # -----------------------------
+    # Precomputation
+    # -----------------------------
+
+    def _build(self, first_year: int, last_year: int):
+        base = date(first_year, 1, 1).toordinal()
+        end = date(last_year + 1, 1, 1).toordinal()
+        weekend = self.weekend
+        holidays = self._holiday_ordinals
+        ordinals = array('l')
+        index = array('l')
+        for o in range(base, end):
+            index.append(len(ordinals))
+            # date.fromordinal(o).weekday() == (o + 6) % 7
+            if (o + 6) % 7 not in weekend and o not in holidays:
+                ordinals.append(o)
+        self._first_year, self._last_year = first_year, last_year
+        self._base, self._ordinals, self._index = base, ordinals, index
+
+    def _cover(self, first_ordinal: int, last_ordinal: int):
+        first_year = date.fromordinal(first_ordinal).year
+        last_year = date.fromordinal(last_ordinal).year
+        if self._first_year is None:
+            self._build(first_year - 1, last_year + 2)
+        elif first_year < self._first_year or last_year > self._last_year:
+            self._build(min(first_year - 1, self._first_year), max(last_year + 2, self._last_year))
+
+    def _index_of(self, ordinal: int) -> int:
+        self._cover(ordinal, ordinal)
+        return self._index[ordinal - self._base]
+
+    def _ensure_count(self, end_index: int):
+        while len(self._ordinals) < end_index:
+            self._build(self._first_year, self._last_year + 2)
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+
+    def is_working_day(self, day: date) -> bool:
+        return day.weekday() not in self.weekend and day.toordinal() not in self._holiday_ordinals
+
+    def working_days(self, start: date, count: int) -> List[date]:
+        """`count` working days starting at `start` (or the next working day)."""
+        i = self._index_of(start.toordinal())
+        self._ensure_count(i + count)
+        return [date.fromordinal(o) for o in self._ordinals[i:i + count]]
+
+    def nth_working_day_after(self, day: date, n: int) -> date:
+        """The n-th working day strictly after `day` (n >= 1)."""
+        i = self._index_of(day.toordinal() + 1) + n - 1
+        self._ensure_count(i + 1)
+        return date.fromordinal(self._ordinals[i])
+
+    def working_days_between(self, start: date, end: date) -> List[date]:
+        """Working days in [start, end]."""
+        if end < start:
+            return []
+        self._cover(start.toordinal(), end.toordinal() + 1)
+        i = self._index[start.toordinal() - self._base]
+        j = self._index[end.toordinal() + 1 - self._base]
+        return [date.fromordinal(o) for o in self._ordinals[i:j]]
+
+    def iter_working_days(self, start: date):
+        """Working days from `start` onwards (unbounded)."""
+        i = self._index_of(start.toordinal())
+        while True:
+            self._ensure_count(i + 1)
+            yield date.fromordinal(self._ordinals[i])
+            i += 1
+
+    def working_days_many(self, starts: Sequence[date], count: int) -> List[List[date]]:
+        """`count` working days for each start date; vectorised with numpy.busday_offset when available.
+
+        Below NUMPY_MIN_STARTS start dates the cached ordinal walk is cheaper than importing numpy."""
+        if len(starts) < NUMPY_MIN_STARTS:
+            return [self.working_days(start, count) for start in starts]
+        try:
+            import numpy as np
+        except ImportError:
+            return [self.working_days(start, count) for start in starts]
+        if self._busdaycal is None:
+            weekmask = [0 if d in self.weekend else 1 for d in range(7)]
+            self._busdaycal = np.busdaycalendar(
+                weekmask=weekmask,
+                holidays=np.array(sorted(self.holidays), dtype='datetime64[D]'),
+            )
+        first = np.busday_offset(np.array(starts, dtype='datetime64[D]'), 0, roll='forward',
+                                 busdaycal=self._busdaycal)
+        grid = np.busday_offset(first[:, None], np.arange(count)[None, :], roll='forward',
+                                busdaycal=self._busdaycal)
+        return grid.astype(object).tolist()
+
+    def format_day(self, day: date, fmt: str, fallback: str = '%d/%m/%Y') -> str:
+        """strftime with a per-(day, format) cache; `fallback` when `fmt` cannot be applied."""
+        key = (day.toordinal(), fmt)
+        text = self._formatted.get(key)
+        if text is None:
+            try:
+                text = day.strftime(fmt)
+            except Exception:
+                text = day.strftime(fallback)
+            self._formatted[key] = text
+        return text
+
+    def format_days(self, days: Iterable[date], fmt: str, fallback: str = '%d/%m/%Y') -> List[str]:
+        return [self.format_day(day, fmt, fallback) for day in days]
+
+
+# -----------------------------
+# Holidays and the shared calendar
+# -----------------------------
+
+def load_holidays(path) -> List[date]:
+    """Holiday dates from a JSON list, a {date: name} object or {"holidays": [...]}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ValueError(f'Invalid JSON in {path}: {e}') from e
+    if isinstance(data, dict):
+        data = data.get('holidays', data)
+    if not isinstance(data, (dict, list)):
+        raise ValueError(f'Expected a list of holiday dates in {path}')
+    values = data.keys() if isinstance(data, dict) else data
+    holidays = []
+    for value in values:
+        day = parse_date(str(value), HOLIDAY_DATE_FORMATS)
+        if day is None:
+            raise ValueError(f'Invalid holiday date in {path}: {value}')
+        holidays.append(day)
+    return holidays
+
+
+_holidays_path = None
+_calendar: Optional[WorkingCalendar] = None
+_calendar_key = None
+
+
+def configure_holidays(path=None) -> WorkingCalendar:
+    """Use `path` as the holidays file for get_calendar() (None: env / default file).
+
+    The file is loaded right away, so a missing or malformed one fails here (OSError /
+    ValueError) rather than in the middle of a render."""
+    global _holidays_path
+    _holidays_path = path
+    return get_calendar()
+
+
+def get_calendar() -> WorkingCalendar:
+    """Process-wide calendar; rebuilt only when the holidays file (or its mtime) changes."""
+    global _calendar, _calendar_key
+    path = _holidays_path or os.environ.get('HYPERDRIVE_HOLIDAYS')
+    if path is None and DEFAULT_HOLIDAYS_FILE.exists():
+        path = DEFAULT_HOLIDAYS_FILE
+    key = None
+    if path is not None:
+        path = Path(path)
+        key = (str(path.resolve()), path.stat().st_mtime_ns)
+    if _calendar is None or key != _calendar_key:
+        _calendar = WorkingCalendar(load_holidays(path) if path is not None else ())
+        _calendar_key = key
+    return _calendar
@@ -3,6 +3,7 @@ import { join } from 'path'
 import { electronApp, optimizer, is } from '@electron-toolkit/utils'
 import { existsSync, mkdirSync, writeFileSync, appendFileSync } from 'fs'
 import { registerIpcHandlers } from './ipcHandlers'
+import { stopRenderWorker } from './pdfHandler/utils/pythonScriptRunner.js'
 
 // Determine the correct directory based on dev or production mode
 const appDirectory = is.dev ? join(__dirname, '../') : process.cwd() // ../ in dev, ./ in build
@@ -153,6 +154,11 @@ app.on('window-all-closed', () => {
   }
 })
 
+// Stop the shared Python render worker with the app
+app.on('will-quit', () => {
+  stopRenderWorker()
+})
+
 // Global error handling for uncaught exceptions
 process.on('uncaughtException', (error) => {
   logErrorToFile(error)
@@ -1,5 +1,4 @@
 import { ipcMain, shell, app } from 'electron'
-import { spawn } from 'child_process'
 import path from 'path'
 import fs from 'fs'
 import {
@@ -22,6 +21,7 @@ import {
   invalidateCache // FAST cache management
 } from './crud'
 import { generatePDFByTemplateName } from './templateManager'
+import { runPythonWithWorker } from './pdfHandler/utils/pythonScriptRunner.js'
 
 // Register IPC handlers for CRUD operations with proper error handling
 export function registerIpcHandlers() {
@@ -310,7 +310,6 @@ export function registerIpcHandlers() {
         }
 
         const args = [
-          scriptPath,
           '--template',
           resolvedTemplate,
           '--output',
@@ -352,59 +351,40 @@ export function registerIpcHandlers() {
           }
         }
 
-        const child = spawn(pythonPath, args, {
-          stdio: ['ignore', 'pipe', 'pipe'],
-          cwd: process.cwd(),
-          env: {
-            ...process.env,
-            PYTHONIOENCODING: 'utf-8'
-          }
-        })
-        let stdoutData = ''
-        let stderrData = ''
-
-        child.stdout.on('data', (d) => {
-          stdoutData += d.toString()
-        })
-        child.stderr.on('data', (d) => {
-          stderrData += d.toString()
-        })
-
-        child.on('error', (err) => {
-          reject(new Error(`Failed to start Python process: ${err.message}`))
-        })
-
-        child.on('close', (code) => {
-          if (code === 0) {
-            // استخراج مسار PDF إن وُجد
-            let pdfPath = null
-            const pdfMatch = stdoutData.match(/PDF_PATH=([^\r\n]+)/)
-            if (pdfMatch && pdfMatch[1].trim()) {
-              pdfPath = pdfMatch[1].trim()
+        // A job of the shared render worker (a new process only if the worker cannot run it)
+        runPythonWithWorker(scriptPath, args, { pythonPath, cwd })
+          .then(({ code, stdout: stdoutData, stderr: stderrData }) => {
+            if (code === 0) {
+              // استخراج مسار PDF إن وُجد
+              let pdfPath = null
+              const pdfMatch = stdoutData.match(/PDF_PATH=([^\r\n]+)/)
+              if (pdfMatch && pdfMatch[1].trim()) {
+                pdfPath = pdfMatch[1].trim()
+              }
+              const docxExists = fs.existsSync(finalOutput)
+              resolve({
+                success: true,
+                outputPath: pdfPath || finalOutput,
+                docxPath: docxExists ? finalOutput : null,
+                pdfPath,
+                pdfOnlyRequested: pdfOnly,
+                cached: stdoutData.includes('[SKIP]'),
+                log: stdoutData.trim()
+              })
+            } else {
+              // Filter out Python warnings from stderr
+              const filteredStderr = stderrData
+                .split('\n')
+                .filter((line) => !line.includes('UserWarning') && !line.includes('pkg_resources'))
+                .filter((line) => line.trim().length > 0)
+                .join('\n')
+
+              reject(
+                new Error(`Python script exited with code ${code}: ${filteredStderr || stdoutData}`)
+              )
             }
-            const docxExists = fs.existsSync(finalOutput)
-            resolve({
-              success: true,
-              outputPath: pdfPath || finalOutput,
-              docxPath: docxExists ? finalOutput : null,
-              pdfPath,
-              pdfOnlyRequested: pdfOnly,
-              cached: stdoutData.includes('[SKIP]'),
-              log: stdoutData.trim()
-            })
-          } else {
-            // Filter out Python warnings from stderr
-            const filteredStderr = stderrData
-              .split('\n')
-              .filter((line) => !line.includes('UserWarning') && !line.includes('pkg_resources'))
-              .filter((line) => line.trim().length > 0)
-              .join('\n')
-
-            reject(
-              new Error(`Python script exited with code ${code}: ${filteredStderr || stdoutData}`)
-            )
-          }
-        })
+          })
+          .catch((err) => reject(new Error(`Failed to start Python process: ${err.message}`)))
       } catch (error) {
         reject(new Error(`Failed to run Python script: ${error.message}`))
       }
@@ -457,7 +437,6 @@ export function registerIpcHandlers() {
         }
 
         const args = [
-          scriptPath,
           '--input',
           resolvedInput,
           '--output',
@@ -473,47 +452,32 @@ export function registerIpcHandlers() {
         if (pdf) args.push('--pdf')
         if (pdfOnly) args.push('--pdf-only')
 
-        const child = spawn(pythonPath, args, {
-          stdio: ['ignore', 'pipe', 'pipe'],
-          cwd: process.cwd(),
-          env: {
-            ...process.env,
-            PYTHONIOENCODING: 'utf-8'
-          }
-        })
-
-        let stdoutData = ''
-        let stderrData = ''
-        child.stdout.on('data', (d) => {
-          stdoutData += d.toString()
-        })
-        child.stderr.on('data', (d) => {
-          stderrData += d.toString()
-        })
-        child.on('error', (err) =>
-          reject(new Error(`Failed to start Python process: ${err.message}`))
-        )
-        child.on('close', (code) => {
-          if (code === 0) {
-            // استخراج مسار PDF إن وُجد
-            let pdfPath = null
-            const pdfMatch = stdoutData.match(/PDF_PATH=([^\r\n]+)/)
-            if (pdfMatch && pdfMatch[1].trim()) {
-              pdfPath = pdfMatch[1].trim()
+        // A job of the shared render worker (a new process only if the worker cannot run it)
+        runPythonWithWorker(scriptPath, args, { pythonPath, cwd })
+          .then(({ code, stdout: stdoutData, stderr: stderrData }) => {
+            if (code === 0) {
+              // استخراج مسار PDF إن وُجد
+              let pdfPath = null
+              const pdfMatch = stdoutData.match(/PDF_PATH=([^\r\n]+)/)
+              if (pdfMatch && pdfMatch[1].trim()) {
+                pdfPath = pdfMatch[1].trim()
+              }
+              const docxExists = fs.existsSync(resolvedOutput)
+              resolve({
+                success: true,
+                outputPath: pdfPath || resolvedOutput,
+                docxPath: docxExists ? resolvedOutput : null,
+                pdfPath,
+                pdfOnlyRequested: pdfOnly,
+                log: stdoutData.trim()
+              })
+            } else {
+              reject(
+                new Error(`Python script exited with code ${code}: ${stderrData || stdoutData}`)
+              )
             }
-            const docxExists = fs.existsSync(resolvedOutput)
-            resolve({
-              success: true,
-              outputPath: pdfPath || resolvedOutput,
-              docxPath: docxExists ? resolvedOutput : null,
-              pdfPath,
-              pdfOnlyRequested: pdfOnly,
-              log: stdoutData.trim()
-            })
-          } else {
-            reject(new Error(`Python script exited with code ${code}: ${stderrData || stdoutData}`))
-          }
-        })
+          })
+          .catch((err) => reject(new Error(`Failed to start Python process: ${err.message}`)))
       } catch (error) {
         reject(new Error(`Failed to run fill-traffic-law-card script: ${error.message}`))
       }
@@ -587,7 +551,6 @@ export function registerIpcHandlers() {
         }
 
         const args = [
-          scriptPath,
           '--input',
           resolvedInput,
           '--output',
@@ -607,56 +570,41 @@ export function registerIpcHandlers() {
         if (pdf) args.push('--pdf')
         if (pdfOnly) args.push('--pdf-only')
 
-        const child = spawn(pythonPath, args, {
-          stdio: ['ignore', 'pipe', 'pipe'],
-          cwd: process.cwd(),
-          env: {
-            ...process.env,
-            PYTHONIOENCODING: 'utf-8'
-          }
-        })
-
-        let stdoutData = ''
-        let stderrData = ''
-        child.stdout.on('data', (d) => {
-          stdoutData += d.toString()
-        })
-        child.stderr.on('data', (d) => {
-          stderrData += d.toString()
-        })
-        child.on('error', (err) =>
-          reject(new Error(`Failed to start Python process: ${err.message}`))
-        )
-        child.on('close', (code) => {
-          // تنظيف ملف البيانات المؤقت
-          if (dataJsonPath && fs.existsSync(dataJsonPath)) {
-            try {
-              fs.unlinkSync(dataJsonPath)
-            } catch (e) {
-              console.warn(`Warning: Could not delete temp data file: ${e.message}`)
+        // A job of the shared render worker (a new process only if the worker cannot run it)
+        runPythonWithWorker(scriptPath, args, { pythonPath, cwd })
+          .then(({ code, stdout: stdoutData, stderr: stderrData }) => {
+            // تنظيف ملف البيانات المؤقت
+            if (dataJsonPath && fs.existsSync(dataJsonPath)) {
+              try {
+                fs.unlinkSync(dataJsonPath)
+              } catch (e) {
+                console.warn(`Warning: Could not delete temp data file: ${e.message}`)
+              }
             }
-          }
 
-          if (code === 0) {
-            // استخراج مسار PDF إن وُجد
-            let pdfPath = null
-            const pdfMatch = stdoutData.match(/PDF_PATH=([^\r\n]+)/)
-            if (pdfMatch && pdfMatch[1].trim()) {
-              pdfPath = pdfMatch[1].trim()
+            if (code === 0) {
+              // استخراج مسار PDF إن وُجد
+              let pdfPath = null
+              const pdfMatch = stdoutData.match(/PDF_PATH=([^\r\n]+)/)
+              if (pdfMatch && pdfMatch[1].trim()) {
+                pdfPath = pdfMatch[1].trim()
+              }
+              const docxExists = fs.existsSync(resolvedOutput)
+              resolve({
+                success: true,
+                outputPath: pdfPath || resolvedOutput,
+                docxPath: docxExists ? resolvedOutput : null,
+                pdfPath,
+                pdfOnlyRequested: pdfOnly,
+                log: stdoutData.trim()
+              })
+            } else {
+              reject(
+                new Error(`Python script exited with code ${code}: ${stderrData || stdoutData}`)
+              )
             }
-            const docxExists = fs.existsSync(resolvedOutput)
-            resolve({
-              success: true,
-              outputPath: pdfPath || resolvedOutput,
-              docxPath: docxExists ? resolvedOutput : null,
-              pdfPath,
-              pdfOnlyRequested: pdfOnly,
-              log: stdoutData.trim()
-            })
-          } else {
-            reject(new Error(`Python script exited with code ${code}: ${stderrData || stdoutData}`))
-          }
-        })
+          })
+          .catch((err) => reject(new Error(`Failed to start Python process: ${err.message}`)))
       } catch (error) {
         reject(new Error(`Failed to run fill-candidate-follow-up-card script: ${error.message}`))
       }
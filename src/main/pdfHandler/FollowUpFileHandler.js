@@ -3,7 +3,7 @@
 import path from 'path'
 import fs from 'fs'
 import { app } from 'electron'
-import { runPythonForPDF, buildUserDataOutput } from './utils/pythonScriptRunner.js'
+import { runPythonWithWorker, buildUserDataOutput } from './utils/pythonScriptRunner.js'
 
 const PY_SCRIPT = path.join(process.cwd(), 'scripts', 'fill_candidate_follow_up_card.py')
 
@@ -101,7 +101,7 @@ async function generateFollowUpFilePDF(clientData) {
     '--pdf'
   ]
 
-  const { code, stdout, stderr, pdfPath } = await runPythonForPDF(PY_SCRIPT, args, {
+  const { code, stdout, stderr, pdfPath } = await runPythonWithWorker(PY_SCRIPT, args, {
     cwd: process.cwd()
   })
 
@@ -1,7 +1,7 @@
 import path from 'path'
 import fs from 'fs'
 import { app } from 'electron'
-import { runPythonForPDF, buildUserDataOutput } from './utils/pythonScriptRunner.js'
+import { runPythonWithWorker, buildUserDataOutput } from './utils/pythonScriptRunner.js'
 
 const PY_SCRIPT = path.join(process.cwd(), 'scripts', 'fill_traffic_law_lessons_card.py')
 
@@ -73,7 +73,7 @@ export default async function generateTrafficLawLessonsCard(clientData) {
     outputPdf,
     '--start-date',
     startDate,
-    '--client-data', // This gets converted to --data with temp file by pythonScriptRunner.js
+    '--client-data', // JSON job for the worker; the spawn fallback passes it via a temp file
     jsonData,
     '--sessions',
     '30',
@@ -81,7 +81,7 @@ export default async function generateTrafficLawLessonsCard(clientData) {
     // Script now generates PDF by default
   ]
 
-  const { code, stdout, stderr } = await runPythonForPDF(PY_SCRIPT, args, {
+  const { code, stdout, stderr } = await runPythonWithWorker(PY_SCRIPT, args, {
     cwd: process.cwd()
   })
   if (code !== 0) {
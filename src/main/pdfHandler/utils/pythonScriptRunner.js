@@ -49,10 +49,14 @@ export function runPython(scriptPath, args = [], options = {}) {
       }
     })
 
+    // Decode the streams as a whole: a multi-byte character may span two chunks
+    proc.stdout.setEncoding('utf8')
+    proc.stderr.setEncoding('utf8')
+
     let stdout = ''
     let stderr = ''
-    proc.stdout.on('data', (d) => (stdout += d.toString()))
-    proc.stderr.on('data', (d) => (stderr += d.toString()))
+    proc.stdout.on('data', (d) => (stdout += d))
+    proc.stderr.on('data', (d) => (stderr += d))
 
     proc.on('error', (err) => reject(err))
     proc.on('close', (code) => {
@@ -97,3 +101,167 @@ export function buildUserDataOutput(app, segments = []) {
   const base = app.getPath('userData')
   return path.join(base, ...segments)
 }
+
+/**
+ * Long-lived client for scripts/render_worker.py.
+ * Keeps one Python process warm and sends it JSON-lines render jobs, so each
+ * card no longer pays for interpreter startup and python-docx/docxtpl imports.
+ *
+ * run() resolves with the same shape as runPythonForPDF:
+ *   { code, stdout, stderr, pdfPath, result }
+ */
+export class PythonRenderWorker {
+  constructor(options = {}) {
+    this.options = options
+    this.proc = null
+    this.ready = null
+    this.pending = new Map()
+    this.nextId = 1
+    this.buffer = ''
+  }
+
+  start() {
+    if (this.ready) return this.ready
+    const pyExecutable = this.options.pythonPath || 'python'
+    const workerPath =
+      this.options.workerPath || path.join(process.cwd(), 'scripts', 'render_worker.py')
+
+    this.proc = spawn(pyExecutable, [workerPath], {
+      cwd: this.options.cwd || process.cwd(),
+      env: {
+        ...process.env,
+        PYTHONUTF8: '1',
+        PYTHONIOENCODING: 'utf-8',
+        ...this.options.env
+      }
+    })
+
+    // The worker prints Arabic JSON unescaped: decode UTF-8 across chunk boundaries
+    this.proc.stdout.setEncoding('utf8')
+    this.buffer = ''
+
+    this.ready = new Promise((resolve, reject) => {
+      this.proc.on('error', (err) => {
+        this._failAll(err)
+        this.proc = null
+        this.ready = null
+        reject(err)
+      })
+      this.proc.on('close', (code) => {
+        const err = new Error(`Render worker exited with code ${code}`)
+        this._failAll(err)
+        this.proc = null
+        this.ready = null
+        reject(err) // no-op once the worker was ready
+      })
+      this.proc.stderr.on('data', () => {
+        // Worker diagnostics are also returned per job; nothing to do here
+      })
+      this.proc.stdout.on('data', (d) => {
+        this.buffer += d
+        let idx
+        while ((idx = this.buffer.indexOf('\n')) >= 0) {
+          const line = this.buffer.slice(0, idx).trim()
+          this.buffer = this.buffer.slice(idx + 1)
+          if (!line) continue
+          let msg
+          try {
+            msg = JSON.parse(line)
+          } catch (e) {
+            continue
+          }
+          if (msg.ready) {
+            resolve(msg)
+            continue
+          }
+          const entry = this.pending.get(String(msg.id))
+          if (entry) {
+            this.pending.delete(String(msg.id))
+            entry.resolve(msg)
+          }
+        }
+      })
+    })
+    return this.ready
+  }
+
+  async run(script, args = []) {
+    await this.start()
+    const id = String(this.nextId++)
+    const msg = await new Promise((resolve, reject) => {
+      this.pending.set(id, { resolve, reject })
+      this.proc.stdin.write(JSON.stringify({ id, script, args: args.map(String) }) + '\n')
+    })
+    let pdfPath = null
+    const match = (msg.stdout || '').match(/PDF_PATH=([^\r\n]+)/)
+    if (match) {
+      pdfPath = match[1].trim()
+    }
+    return {
+      code: msg.exit_code,
+      stdout: msg.stdout || '',
+      stderr: msg.stderr || '',
+      pdfPath,
+      result: msg
+    }
+  }
+
+  stop() {
+    if (this.proc) {
+      this.proc.stdin.write(JSON.stringify({ cmd: 'shutdown' }) + '\n')
+      this.proc.stdin.end()
+    }
+  }
+
+  _failAll(err) {
+    for (const entry of this.pending.values()) {
+      entry.reject(err)
+    }
+    this.pending.clear()
+  }
+}
+
+let sharedWorker = null
+
+/**
+ * The render worker shared by the card handlers (one Python process per app, started on first use).
+ */
+export function getRenderWorker(options = {}) {
+  if (!sharedWorker) {
+    sharedWorker = new PythonRenderWorker(options)
+  }
+  return sharedWorker
+}
+
+// Exit code of an argparse usage error: the job's arguments did not reach the script
+const USAGE_ERROR_CODE = 2
+
+/**
+ * Run a generator script as a job of the shared render worker. If the worker cannot start, dies
+ * during the job or rejects its arguments (usage error), the script runs in its own process
+ * instead (runPythonForPDF, which also turns --client-data into a --data temp file).
+ * Resolves with { code, stdout, stderr, pdfPath }.
+ */
+export async function runPythonWithWorker(scriptPath, args = [], options = {}) {
+  const script = path.basename(scriptPath)
+  let reason
+  try {
+    const result = await getRenderWorker(options).run(script, args)
+    if (result.code !== USAGE_ERROR_CODE) return result
+    reason = result.result.error || `exit code ${result.code}`
+  } catch (err) {
+    reason = err.message
+  }
+  console.warn(`[WARN] Render worker could not run ${script}, using a new process: ${reason}`)
+  return runPythonForPDF(scriptPath, args, options)
+}
+
+/**
+ * Shut the shared render worker down (app quit).
+ */
+export function stopRenderWorker() {
+  if (sharedWorker) {
+    sharedWorker.stop()
+    sharedWorker = null
+  }
+}
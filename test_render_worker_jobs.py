@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script: send the app handlers' exact argv through scripts/render_worker.py
+
+The app (src/main/pdfHandler/*Handler.js and src/main/ipcHandlers.js, runPythonWithWorker) posts the same arguments it
+used to pass on the command line as worker jobs. A job whose arguments the script rejects
+(argparse exit code 2) means every card of that kind fails in the app.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+WORKER = ROOT / 'scripts' / 'render_worker.py'
+
+CLIENT = {
+    'first_name_ar': 'أحمد',
+    'last_name_ar': 'بن صالح',
+    'birth_date': '2000-05-12',
+    'birth_place': '',
+    'birth_municipality': 'المسيلة',
+    'birth_state': 'المسيلة',
+    'current_address': 'حي النصر',
+    'current_municipality': 'المسيلة',
+    'current_state': 'المسيلة',
+    'phone_number': '0550000000',
+    'register_date': '2025-01-12',
+    'subPrice': '6000',
+    'tests': {'trafficLawTest': {'passed': True, 'lastAttemptDate': '2025-02-01'}},
+}
+
+# Machines without Word or LibreOffice cannot convert to PDF; that failure is not what is tested here
+NO_PDF_ENGINE = ('No PDF backend available', 'لا يوجد محرك PDF متاح')
+
+
+def follow_up_args(out_dir):
+    """FollowUpFileHandler.js generateFollowUpFilePDF()."""
+    return [
+        '--input', 'resources/templates/بطاقة المتابعة للمترشح.docx',
+        '--output', str(out_dir / 'candidate_follow_up_1.docx'),
+        '--start-date', '2025-02-02',
+        '--client-data', json.dumps(CLIENT, ensure_ascii=False),
+        '--client-id', 'test_client',
+        '--table1-dates', '30',
+        '--table2-dates', '30',
+        '--pdf',
+    ]
+
+
+def traffic_law_args(out_dir):
+    """TrafficLawLessonsCardHandler.js generateTrafficLawLessonsCard(), after normalize()."""
+    normalized = {
+        'fullName': 'أحمد بن صالح',
+        'birthDate': '2000/05/12',
+        'birthPlace': 'المسيلة, المسيلة',
+        'address': 'حي النصر',
+        'registrationDate': '2025-01-12',
+    }
+    return [
+        '--input', 'resources/templates/بطاقة خاصة بدروس قانون المرور .docx',
+        '--output', str(out_dir / 'بطاقة_قانون_المرور.pdf'),
+        '--start-date', '2025-01-12',
+        '--client-data', json.dumps(normalized),
+        '--sessions', '30',
+        '--has-header',
+    ]
+
+
+def deposit_args(out_dir):
+    """ipcHandlers.js 'generate-deposit-docx' with a candidates list (cache on, no PDF)."""
+    candidates = out_dir / 'candidates-1.json'
+    candidates.write_text(json.dumps([{'first_name': 'أحمد', 'last_name': 'بن صالح'}], ensure_ascii=False,
+                                     indent=2), encoding='utf-8')
+    return [
+        '--template', str(ROOT / 'resources' / 'templates' / 'ملف الإيداع.docx'),
+        '--output', str(out_dir / 'ملف الإيداع-0123456789.docx'),
+        '--width', '70',
+        '--mode', 'flat',
+        '--skip-if-exists',
+        '--json', str(candidates),
+    ]
+
+
+def run_jobs(jobs, work_dir):
+    """Run the jobs in one worker started like the app does (cwd = repo root)."""
+    env = dict(os.environ,
+               PYTHONUTF8='1', PYTHONIOENCODING='utf-8',
+               HYPERDRIVE_RESERVATIONS=str(work_dir / 'reservations.json'),
+               RENDER_CACHE_DIR=str(work_dir / 'cache'))
+    lines = [json.dumps(job, ensure_ascii=False) for job in jobs] + [json.dumps({'cmd': 'shutdown'})]
+    proc = subprocess.run([sys.executable, str(WORKER)], input='\n'.join(lines) + '\n', cwd=ROOT, env=env,
+                          capture_output=True, text=True, encoding='utf-8', timeout=300)
+    results = {}
+    for line in proc.stdout.splitlines():
+        msg = json.loads(line)
+        if msg.get('id') is not None and not msg.get('shutdown'):
+            results[msg['id']] = msg
+    return results
+
+
+def check(name, result):
+    """True when the script accepted the handler's arguments and read the client data."""
+    print(f"🔍 {name}: exit_code={result['exit_code']} error={result['error']}")
+    if result['exit_code'] == 2 or 'unrecognized arguments' in result['stderr']:
+        print(f"  ❌ arguments rejected: {result['error']}")
+        return False
+    if 'Failed to read client-data JSON' in result['stdout'] or 'تعذر قراءة JSON' in result['stdout']:
+        print('  ❌ client data not read')
+        return False
+    if not result['ok'] and not any(text in (result['error'] or '') for text in NO_PDF_ENGINE):
+        print(f"  ❌ job failed: {result['error']}")
+        return False
+    print('  ✅ arguments accepted')
+    return True
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        jobs = {
+            'follow_up': {'id': 'follow_up', 'script': 'fill_candidate_follow_up_card.py',
+                          'args': follow_up_args(work_dir)},
+            'traffic_law': {'id': 'traffic_law', 'script': 'fill_traffic_law_lessons_card.py',
+                            'args': traffic_law_args(work_dir)},
+            'deposit': {'id': 'deposit', 'script': 'generate_deposit_docx.py', 'args': deposit_args(work_dir)},
+        }
+        results = run_jobs(list(jobs.values()), work_dir)
+        success = True
+        for name in jobs:
+            if name not in results:
+                print(f"❌ {name}: no result from the worker")
+                success = False
+                continue
+            success = check(name, results[name]) and success
+
+    print(f"\n{'🎉 All handler jobs ran through the worker' if success else '🚨 Some handler jobs failed'}")
+    sys.exit(0 if success else 1)